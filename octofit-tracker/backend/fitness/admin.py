@@ -1,14 +1,119 @@
-from django.contrib import admin
+from datetime import date, timedelta
+
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models import Q
+from django.utils.crypto import md5
+from django.utils.functional import cached_property
+from . import jobs, snapshots
 from .models import (
     Student, Teacher, WorkoutPlan, Exercise, WorkoutPlanExercise,
-    StudentWorkoutPlan, ActivityLog, PerformanceMetric
+    StudentWorkoutPlan, ActivityLog, ArchivedActivityLog, PerformanceMetric, ActivityRollup, MetricRollup,
+    Job
 )
 
+# Below this many rows an exact COUNT(*) is cheap enough for every changelist page
+ESTIMATED_COUNT_MIN_ROWS = 100000
+
+
+def estimated_count(model, using='default'):
+    """Row count of ``model``'s table from the database's statistics, or None if it keeps none"""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'djongo':
+        connection.ensure_connection()
+        return connection.connection[table].estimated_document_count()
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE relname = %s', [table])
+            row = cursor.fetchone()
+        # -1 until the table has been analyzed
+        return row[0] if row and row[0] >= 0 else None
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts an unfiltered changelist of a large table from table statistics"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_MIN_ROWS:
+                return estimate
+        return super().count
+
+
+class SpanDatesQuerySet(models.QuerySet):
+    """
+    ``dates()`` lists every year, month or day between the first and last date.
+
+    The admin date hierarchy calls ``dates()`` for its links; Django's version
+    truncates and de-duplicates the date of every row, this one reads the
+    bounds from the date index. Periods without rows still get a link.
+    """
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day'):
+            return super().dates(field_name, kind, order)
+        bounds = self.aggregate(first=models.Min(field_name), last=models.Max(field_name))
+        if bounds['first'] is None:
+            return []
+        day = {
+            'year': bounds['first'].replace(month=1, day=1),
+            'month': bounds['first'].replace(day=1),
+            'day': bounds['first'],
+        }[kind]
+        periods = []
+        while day <= bounds['last']:
+            periods.append(day)
+            if kind == 'year':
+                day = date(day.year + 1, 1, 1)
+            elif kind == 'month':
+                day = snapshots.next_month(day)
+            else:
+                day += timedelta(days=1)
+        return periods if order == 'ASC' else periods[::-1]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for tables that grow with every school day.
+
+    Related rows shown in the list come from the page query itself, the
+    unfiltered total is estimated once the table is large, filtered pages
+    skip the second count over the whole table, and foreign keys are picked
+    with autocomplete instead of a select holding every student. With
+    ``search_by_student`` set, the search box matches the start of student
+    names on the student table and filters the rows by student id.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    search_by_student = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return SpanDatesQuerySet(queryset.model, queryset.query.chain(), queryset.db)
+
+    def get_search_results(self, request, queryset, search_term):
+        if not (self.search_by_student and search_term.strip()):
+            return super().get_search_results(request, queryset, search_term)
+        students = Student.objects.all()
+        for bit in search_term.split():
+            students = students.filter(
+                Q(user__last_name__istartswith=bit) | Q(user__first_name__istartswith=bit)
+            )
+        # Filtering by student id lets the (student, date) index find the rows
+        return queryset.filter(student_id__in=list(students.values_list('pk', flat=True))), False
+
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['get_full_name', 'grade', 'age', 'fitness_level', 'created_at']
     list_filter = ['grade', 'fitness_level']
+    list_select_related = ['user']
     search_fields = ['user__first_name', 'user__last_name', 'user__email']
     
     def get_full_name(self, obj):
@@ -19,6 +124,7 @@ class StudentAdmin(admin.ModelAdmin):
 @admin.register(Teacher)
 class TeacherAdmin(admin.ModelAdmin):
     list_display = ['get_full_name', 'department', 'created_at']
+    list_select_related = ['user']
     search_fields = ['user__first_name', 'user__last_name', 'user__email']
     
     def get_full_name(self, obj):
@@ -31,6 +137,27 @@ class ExerciseAdmin(admin.ModelAdmin):
     list_display = ['name', 'category', 'calories_per_minute']
     list_filter = ['category']
     search_fields = ['name', 'description']
+    actions = ['recalculate_calories']
+
+    @admin.action(description='Recalculate calories of logged activities')
+    def recalculate_calories(self, request, queryset):
+        rates = sorted(queryset.values_list('pk', 'calories_per_minute'))
+        # Selecting the same exercises at the same rates again finds the queued job
+        job, created = jobs.enqueue(
+            'recalculate_calories',
+            {'exercise_ids': [pk for pk, _ in rates]},
+            idempotency_key='recalculate-calories:' + md5(
+                ','.join(f'{pk}@{rate}' for pk, rate in rates).encode(), usedforsecurity=False
+            ).hexdigest(),
+            created_by=getattr(request.user, 'teacher_profile', None),
+        )
+        if created:
+            self.message_user(request, f'Queued calorie recalculation as job {job.pk}.', messages.SUCCESS)
+        else:
+            self.message_user(
+                request, f'These rates were already recalculated or queued as job {job.pk} ({job.status}).',
+                messages.WARNING
+            )
 
 
 @admin.register(WorkoutPlan)
@@ -44,23 +171,80 @@ class WorkoutPlanAdmin(admin.ModelAdmin):
 class WorkoutPlanExerciseAdmin(admin.ModelAdmin):
     list_display = ['workout_plan', 'exercise', 'sets', 'reps', 'duration_minutes', 'order']
     list_filter = ['workout_plan']
+    list_select_related = ['workout_plan', 'exercise']
+    autocomplete_fields = ['workout_plan', 'exercise']
 
 
 @admin.register(StudentWorkoutPlan)
-class StudentWorkoutPlanAdmin(admin.ModelAdmin):
+class StudentWorkoutPlanAdmin(LargeTableAdmin):
     list_display = ['student', 'workout_plan', 'status', 'start_date', 'end_date']
     list_filter = ['status']
+    list_select_related = ['student__user', 'workout_plan']
+    autocomplete_fields = ['student', 'workout_plan', 'assigned_by']
 
 
 @admin.register(ActivityLog)
-class ActivityLogAdmin(admin.ModelAdmin):
+class ActivityLogAdmin(LargeTableAdmin):
     list_display = ['student', 'exercise', 'date', 'duration_minutes', 'intensity', 'calories_burned']
-    list_filter = ['date', 'intensity']
-    search_fields = ['student__user__first_name', 'student__user__last_name']
+    list_filter = ['intensity', 'exercise__category']
+    list_select_related = ['student__user', 'exercise']
+    date_hierarchy = 'date'
+    search_fields = ['^student__user__last_name', '^student__user__first_name']
+    search_by_student = True
+    autocomplete_fields = ['student', 'exercise', 'workout_plan']
+
+
+@admin.register(ArchivedActivityLog)
+class ArchivedActivityLogAdmin(LargeTableAdmin):
+    list_display = ['id', 'student', 'exercise', 'date', 'duration_minutes', 'intensity', 'calories_burned',
+                    'archived_at']
+    list_filter = ['intensity']
+    list_select_related = ['student__user', 'exercise']
+    date_hierarchy = 'date'
+    search_fields = ['^student__user__last_name', '^student__user__first_name']
+    search_by_student = True
+
+    # Archived rows are history; changing them would put the rollups out of step
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(PerformanceMetric)
-class PerformanceMetricAdmin(admin.ModelAdmin):
+class PerformanceMetricAdmin(LargeTableAdmin):
     list_display = ['student', 'date', 'fitness_score', 'weight_kg']
-    list_filter = ['date']
-    search_fields = ['student__user__first_name', 'student__user__last_name']
+    list_select_related = ['student__user']
+    date_hierarchy = 'date'
+    search_fields = ['^student__user__last_name', '^student__user__first_name']
+    search_by_student = True
+    autocomplete_fields = ['student', 'recorded_by']
+
+
+@admin.register(ActivityRollup)
+class ActivityRollupAdmin(LargeTableAdmin):
+    list_display = ['student', 'period', 'period_start', 'category', 'activity_count',
+                    'total_minutes', 'total_calories']
+    list_filter = ['period', 'category']
+    list_select_related = ['student__user']
+    autocomplete_fields = ['student']
+
+
+@admin.register(MetricRollup)
+class MetricRollupAdmin(LargeTableAdmin):
+    list_display = ['student', 'period', 'period_start', 'sample_count']
+    list_filter = ['period']
+    list_select_related = ['student__user']
+    autocomplete_fields = ['student']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'attempts', 'progress_current', 'progress_total',
+                    'created_at', 'finished_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['attempts', 'locked_by', 'locked_at', 'result', 'error', 'started_at', 'finished_at']
@@ -0,0 +1,169 @@
+"""
+Class-wide activity and fitness distributions for teachers.
+
+The database reduces the history to one row per student (activity totals
+from the rollups and the latest fitness score in the window). Those rows are
+held as parallel columns and split by grade and by fitness level in a single
+pass; each group's columns are then sorted once to read off the mean, median
+and percentiles. Results are cached for the rest of the day.
+
+Reads go to the ``OCTOFIT_ANALYTICS_DATABASE`` alias when it is configured,
+which in production prefers MongoDB secondaries so these scans stay off the
+primary.
+"""
+from array import array
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Sum
+
+from . import leaderboard, pipelines, rollups
+from .models import ActivityRollup, PerformanceMetric, Student
+
+DIMENSIONS = ['grade', 'fitness_level']
+PERCENTILES = [25, 75, 90]
+
+
+def database():
+    """Alias analytics reads use, falling back to the default database"""
+    alias = getattr(settings, 'OCTOFIT_ANALYTICS_DATABASE', DEFAULT_DB_ALIAS)
+    return alias if alias in connections.databases else DEFAULT_DB_ALIAS
+
+
+def _activity_totals(window, start, using):
+    """``(student_id, activities, calories, minutes)`` per student active in the window"""
+    if pipelines.enabled(using):
+        return pipelines.student_activity_totals(window, start, using)
+    # Weeks and months are single rollup rows; a term spans several months
+    activity = ActivityRollup.objects.using(using).filter(
+        period='week' if window == 'week' else 'month'
+    )
+    if window == 'term':
+        activity = activity.filter(period_start__gte=start)
+    else:
+        activity = activity.filter(period_start=start)
+    return activity.order_by().values('student_id').annotate(
+        count=Sum('activity_count'), calories=Sum('total_calories'), minutes=Sum('total_minutes'),
+    ).values_list('student_id', 'count', 'calories', 'minutes')
+
+
+def _latest_scores(start, using):
+    """``(student_id, fitness_score)`` pairs in which each student's latest score comes last"""
+    if pipelines.enabled(using):
+        return pipelines.latest_fitness_scores(start, using)
+    return PerformanceMetric.objects.using(using).filter(
+        date__gte=start, fitness_score__isnull=False
+    ).order_by('date').values_list('student_id', 'fitness_score')
+
+
+def extract_columns(window, today=None):
+    """
+    Return ``(start, columns)`` with one entry per student in every column.
+
+    Columns are ``grade`` and ``fitness_level`` plus ``activities``,
+    ``calories``, ``minutes`` and ``fitness_score`` for the window, the
+    latter being NaN for students without an assessment.
+    """
+    start = leaderboard.window_start(window, today)
+    using = database()
+    students = list(
+        Student.objects.using(using).order_by('pk').values_list('pk', 'grade', 'fitness_level')
+    )
+    position = {student_id: index for index, (student_id, _, _) in enumerate(students)}
+
+    columns = {
+        'grade': [grade for _, grade, _ in students],
+        'fitness_level': [level for _, _, level in students],
+        'activities': array('l', [0]) * len(students),
+        'calories': array('d', [0.0]) * len(students),
+        'minutes': array('l', [0]) * len(students),
+        'fitness_score': array('d', [float('nan')]) * len(students),
+    }
+
+    for student_id, count, calories, minutes in _activity_totals(window, start, using):
+        index = position.get(student_id)
+        if index is None:
+            # Registered after the roster was read
+            continue
+        columns['activities'][index] = count or 0
+        columns['calories'][index] = float(rollups.to_calories(calories))
+        columns['minutes'][index] = minutes or 0
+
+    for student_id, score in _latest_scores(start, using):
+        if student_id in position:
+            columns['fitness_score'][position[student_id]] = score
+    return start, columns
+
+
+def percentile(ordered, q):
+    """The ``q``-th percentile of sorted values, interpolating between neighbours"""
+    if not ordered:
+        return None
+    rank = (len(ordered) - 1) * q / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def distribution(values):
+    """Mean, median and percentiles of ``values``, ignoring NaN"""
+    ordered = sorted(value for value in values if value == value)
+    summary = {
+        'count': len(ordered),
+        'mean': sum(ordered) / len(ordered) if ordered else None,
+        'median': percentile(ordered, 50),
+    }
+    for q in PERCENTILES:
+        summary[f'p{q}'] = percentile(ordered, q)
+    return {name: round(value, 2) if isinstance(value, float) else value for name, value in summary.items()}
+
+
+def summarize(columns, indexes):
+    """Distributions of the students at ``indexes``"""
+    activities = [columns['activities'][index] for index in indexes]
+    return {
+        'students': len(indexes),
+        'participation_rate': round(sum(map(bool, activities)) / len(indexes), 4) if indexes else None,
+        'activities': distribution(activities),
+        'calories': distribution([columns['calories'][index] for index in indexes]),
+        'minutes': distribution([columns['minutes'][index] for index in indexes]),
+        'fitness_score': distribution([columns['fitness_score'][index] for index in indexes]),
+    }
+
+
+def build_analytics(window, today=None):
+    today = today or date.today()
+    start, columns = extract_columns(window, today)
+
+    groups = {dimension: defaultdict(list) for dimension in DIMENSIONS}
+    for index in range(len(columns['grade'])):
+        for dimension in DIMENSIONS:
+            groups[dimension][columns[dimension][index]].append(index)
+
+    data = {
+        'window': window,
+        'start_date': start,
+        'date': today,
+        'overall': summarize(columns, range(len(columns['grade']))),
+    }
+    for dimension in DIMENSIONS:
+        data[f'by_{dimension}'] = [
+            {dimension: key, **summarize(columns, indexes)}
+            for key, indexes in sorted(groups[dimension].items())
+        ]
+    return data
+
+
+def get_analytics(window):
+    """Return today's cached analytics for ``window``, building them on a miss"""
+    today = date.today()
+    key = f'class-analytics:{window}:{today.isoformat()}'
+    data = cache.get(key)
+    if data is None:
+        data = build_analytics(window, today)
+        midnight = datetime.combine(today + timedelta(days=1), time.min)
+        cache.set(key, data, max(int((midnight - datetime.now()).total_seconds()), 1))
+    return data
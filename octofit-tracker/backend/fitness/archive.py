@@ -0,0 +1,84 @@
+"""
+Archival of old ActivityLog rows.
+
+Logs from terms that ended long ago are moved into ArchivedActivityLog so the
+live table, and every list, dashboard and leaderboard query over it, only
+holds recent terms. Rows are copied and deleted in batches, one transaction
+per batch. The deletes skip the rollup signals, so rollups keep counting
+archived logs and every total stays the same; ``rollups.rebuild_rollups``
+reads both tables for the same reason.
+
+Readers that take a date range ask ``includes_archive`` whether the range
+reaches back past the newest archived date, and only then read the archive.
+"""
+from contextvars import ContextVar
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from . import leaderboard
+from .models import ActivityLog, ArchivedActivityLog
+
+FIELDS = [
+    'id', 'student_id', 'exercise_id', 'workout_plan_id', 'date', 'duration_minutes', 'intensity',
+    'calories_burned', 'notes', 'logged_at', 'updated_at',
+]
+
+_archiving = ContextVar('archiving', default=False)
+
+
+def archiving():
+    """True while this thread is moving logs, so signal handlers leave the rollups alone"""
+    return _archiving.get()
+
+
+def default_cutoff(today=None):
+    """Start of the term that was running ``OCTOFIT_ARCHIVE_AFTER_DAYS`` ago"""
+    today = today or date.today()
+    days = getattr(settings, 'OCTOFIT_ARCHIVE_AFTER_DAYS', 365)
+    # Rounded to a term start so a term is never split between the two tables
+    return leaderboard.window_start('term', today - timedelta(days=days))
+
+
+def boundary():
+    """Date of the newest archived log, or None while the archive is empty"""
+    # Read on every call, from the date index: archival runs in another
+    # process, so a cached copy would go stale in the web processes
+    return ArchivedActivityLog.objects.order_by('-date').values_list('date', flat=True).first()
+
+
+def includes_archive(date_from=None):
+    """True when logs dated from ``date_from`` onwards (or all logs) may be archived"""
+    latest = boundary()
+    return latest is not None and (date_from is None or date_from <= latest)
+
+
+def pending(before):
+    """Live logs dated before ``before``"""
+    return ActivityLog.objects.filter(date__lt=before)
+
+
+def archive_logs(before, batch_size=1000, on_batch=None):
+    """
+    Move every live log dated before ``before`` into the archive.
+
+    ``on_batch(moved)`` is called after each committed batch. Returns the
+    number of logs moved.
+    """
+    moved = 0
+    token = _archiving.set(True)
+    try:
+        while True:
+            rows = list(pending(before).order_by('pk').values(*FIELDS)[:batch_size])
+            if not rows:
+                break
+            with transaction.atomic():
+                ArchivedActivityLog.objects.bulk_create([ArchivedActivityLog(**row) for row in rows])
+                ActivityLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
+            if on_batch:
+                on_batch(moved)
+    finally:
+        _archiving.reset(token)
+    return moved
@@ -0,0 +1,85 @@
+"""
+Assigning a workout plan to a whole class at once.
+
+The students are selected with one query, students who already have the
+plan active are skipped after one more lookup, and the new assignments are
+written with ``bulk_create``. Callers get a summary of counts back instead
+of one nested assignment per student.
+"""
+from datetime import date
+
+from django.db import transaction
+from rest_framework import serializers
+
+from .models import Student, StudentWorkoutPlan, WorkoutPlan
+
+FITNESS_LEVEL_CHOICES = [choice for choice, _ in Student._meta.get_field('fitness_level').choices]
+MAX_STUDENT_IDS = 10000
+
+
+class BulkAssignmentSerializer(serializers.Serializer):
+    """Validates a plan and a student filter; at least one filter is required"""
+    workout_plan_id = serializers.PrimaryKeyRelatedField(queryset=WorkoutPlan.objects.all())
+    grade = serializers.IntegerField(required=False, min_value=9, max_value=12)
+    fitness_level = serializers.ChoiceField(choices=FITNESS_LEVEL_CHOICES, required=False)
+    student_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, allow_empty=False, max_length=MAX_STUDENT_IDS
+    )
+    start_date = serializers.DateField(default=date.today)
+    end_date = serializers.DateField(required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        if not any(name in attrs for name in ('grade', 'fitness_level', 'student_ids')):
+            raise serializers.ValidationError('Select students by grade, fitness_level or student_ids')
+        if attrs['end_date'] and attrs['end_date'] < attrs['start_date']:
+            raise serializers.ValidationError({'end_date': 'End date must not be before the start date'})
+        return attrs
+
+
+def assign_plan(workout_plan, assigned_by, start_date, end_date=None, grade=None,
+                fitness_level=None, student_ids=None, batch_size=500):
+    """
+    Assign ``workout_plan`` to every student matching all of the given filters.
+
+    Students who already have the plan active are left alone. Returns a
+    summary with the number of matched, created and skipped assignments and
+    any requested ``student_ids`` that do not exist or do not match the other
+    filters.
+    """
+    students = Student.objects.all()
+    if grade is not None:
+        students = students.filter(grade=grade)
+    if fitness_level is not None:
+        students = students.filter(fitness_level=fitness_level)
+    if student_ids is not None:
+        students = students.filter(pk__in=student_ids)
+    matched = list(students.order_by('pk').values_list('pk', flat=True))
+
+    already_active = set(StudentWorkoutPlan.objects.filter(
+        workout_plan=workout_plan, status='active', student_id__in=matched
+    ).values_list('student_id', flat=True))
+    new_assignments = [
+        StudentWorkoutPlan(
+            student_id=student_id,
+            workout_plan=workout_plan,
+            assigned_by=assigned_by,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        for student_id in matched if student_id not in already_active
+    ]
+    with transaction.atomic():
+        StudentWorkoutPlan.objects.bulk_create(new_assignments, batch_size=batch_size)
+
+    summary = {
+        'workout_plan_id': workout_plan.pk,
+        'matched': len(matched),
+        'created': len(new_assignments),
+        'skipped_active': len(already_active),
+    }
+    if student_ids is not None:
+        found = set(matched)
+        summary['unmatched_student_ids'] = sorted({
+            student_id for student_id in student_ids if student_id not in found
+        })
+    return summary
@@ -0,0 +1,96 @@
+"""
+Async versions of the read-heavy endpoints, for ASGI deployments.
+
+Each view runs its independent queries at the same time on worker threads
+(every thread has its own database connection) and awaits them together, so
+a slow aggregation neither blocks the event loop nor delays the other queries
+of the same request. The response bodies match the synchronous endpoints.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Count, Q
+from django.http import HttpResponse, HttpResponseNotAllowed
+
+from .leaderboard import get_ranking
+from .models import Student
+from .renderers import FastJSONRenderer
+from .views import (
+    ActivityLogViewSet, dashboard_data, dashboard_fitness_trend, dashboard_recent_activities,
+    dashboard_totals, leaderboard_data, parse_leaderboard_params,
+)
+
+activity_log_list = ActivityLogViewSet.as_view({'get': 'list'})
+
+
+def _run(function, *args):
+    try:
+        return function(*args)
+    finally:
+        # Worker threads outlive the request, so apply CONN_MAX_AGE here
+        close_old_connections()
+
+
+async def run_query(function, *args):
+    """Run ``function`` on a worker thread and its database connection"""
+    return await sync_to_async(_run, thread_sensitive=False)(function, *args)
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def active_plan_count(student_id):
+    """Number of active plans, or None when the student does not exist"""
+    return Student.objects.filter(pk=student_id).annotate(active_plan_count=Count(
+        'assigned_plans', filter=Q(assigned_plans__status='active')
+    )).values_list('active_plan_count', flat=True).first()
+
+
+def student_profile_id(request):
+    student = getattr(request.user, 'student_profile', None)
+    return student.pk if student else None
+
+
+async def student_dashboard(request, pk):
+    """Dashboard statistics for a student, like ``/api/students/{id}/dashboard/``"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    active_plans, totals, recent_activities, fitness_trend = await asyncio.gather(
+        run_query(active_plan_count, pk),
+        run_query(dashboard_totals, pk),
+        run_query(dashboard_recent_activities, pk),
+        run_query(dashboard_fitness_trend, pk),
+    )
+    if active_plans is None:
+        return json_response({'detail': 'Not found.'}, status=404)
+    return json_response(dashboard_data(active_plans, totals, recent_activities, fitness_trend))
+
+
+async def activity_logs(request):
+    """The activity log list, served from a worker thread"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    # A single paginated query; the viewset keeps cursors, fields and ETags
+    return await run_query(activity_log_list, request)
+
+
+async def leaderboard(request):
+    """Ranked students, like ``/api/leaderboard/``"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        metric, window, grade, limit, student_id = parse_leaderboard_params(request.GET)
+    except ValueError as error:
+        return json_response({'error': str(error)}, status=400)
+
+    ranking = run_query(get_ranking, metric, window, grade)
+    if student_id is None:
+        # Loading the session user is a query of its own
+        student_id, (start_date, ranking) = await asyncio.gather(
+            run_query(student_profile_id, request), ranking
+        )
+    else:
+        start_date, ranking = await ranking
+    return json_response(leaderboard_data(metric, window, grade, limit, student_id, start_date, ranking))
@@ -0,0 +1,520 @@
+"""
+Helpers for timing the REST API hot paths in-process.
+
+Requests go through the full Django stack with the test client. The suite
+seeds a throwaway database at several scales and records latency, query
+counts and allocations per endpoint as JSON, so two runs can be compared.
+"""
+import asyncio
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+import django
+from django.db import connection, connections
+from django.db.models import Count, Max, Min, Sum
+from django.db.backends.signals import connection_created
+from django.core.asgi import get_asgi_application
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext, setup_databases, teardown_databases
+from rest_framework.renderers import JSONRenderer
+
+from . import analytics, history, leaderboard, loadgen, rollups, snapshots
+from .fastpath import ValuesSerializer
+from .models import (
+    ActivityLog, PerformanceMetric, Student, StudentWorkoutPlan, Teacher, WorkoutPlan,
+    WorkoutPlanExercise
+)
+from .renderers import FastJSONRenderer
+from .serializers import ActivityLogSerializer
+from .views import dashboard_totals
+
+SCALES = {
+    'small': {'schools': 1, 'students': 50, 'months': 2},
+    'medium': {'schools': 2, 'students': 250, 'months': 6},
+    'large': {'schools': 4, 'students': 500, 'months': 12},
+}
+
+WORKOUT_PLANS = 10
+EXERCISES_PER_PLAN = 5
+
+
+@contextmanager
+def benchmark_databases():
+    """
+    Create throwaway test databases for a benchmark and drop them afterwards.
+
+    Goes through the test runner's setup so that mirror aliases such as
+    ``analytics`` read the test database too, not the one in production.
+    """
+    old_config = setup_databases(verbosity=0, interactive=False, serialized_aliases=set())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+def hot_paths(student_id):
+    """Return ``(name, path)`` pairs for the endpoints that matter most"""
+    return [
+        ('students', '/api/students/'),
+        ('dashboard', f'/api/students/{student_id}/dashboard/'),
+        ('activity_logs_by_student', f'/api/activity-logs/?student_id={student_id}'),
+        ('workout_plans', '/api/workout-plans/'),
+    ]
+
+
+def creation_payload(student_id, exercise_id):
+    return {
+        'student_id': student_id,
+        'exercise_id': exercise_id,
+        'date': date.today().isoformat(),
+        'duration_minutes': 30,
+        'intensity': 'medium',
+    }
+
+
+def default_student_id():
+    student_id = Student.objects.order_by('pk').values_list('pk', flat=True).first()
+    if student_id is None:
+        raise LookupError('There are no students to benchmark against')
+    return student_id
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(timings):
+    return {
+        'min_ms': round(min(timings), 3),
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+    }
+
+
+def measure(client, method, path, repeat=20, warmup=2, data=None):
+    """Time ``repeat`` requests after ``warmup`` untimed ones"""
+    send = getattr(client, method)
+    kwargs = {'data': data, 'content_type': 'application/json'} if data is not None else {}
+    for _ in range(warmup):
+        send(path, **kwargs)
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = send(path, **kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method.upper()} {path} returned {response.status_code}')
+
+    result = summarize(timings)
+    result['queries'] = len(queries.captured_queries)
+    return result
+
+
+def measure_allocations(client, method, path, data=None):
+    """Peak Python memory allocated while serving one request, in KiB"""
+    send = getattr(client, method)
+    kwargs = {'data': data, 'content_type': 'application/json'} if data is not None else {}
+    tracemalloc.start()
+    try:
+        send(path, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def seed(scale, random_seed=42):
+    """Fill the current database with a data set of the given scale"""
+    catalog = loadgen.ensure_catalog()
+    for school in range(scale['schools']):
+        loadgen.generate_school(
+            school=school, students=scale['students'], months=scale['months'], seed=random_seed,
+            prefix='bench', catalog=catalog, batch_size=5000,
+        )
+
+    teacher = Teacher.objects.order_by('pk').first()
+    plans = [
+        WorkoutPlan.objects.create(
+            title=f'Benchmark plan {number}', description='Benchmark plan',
+            created_by=teacher, duration_weeks=4,
+        )
+        for number in range(WORKOUT_PLANS)
+    ]
+    WorkoutPlanExercise.objects.bulk_create([
+        WorkoutPlanExercise(workout_plan=plan, exercise_id=exercise_id, order=order, duration_minutes=10)
+        for plan in plans
+        for order, (exercise_id, _, _) in enumerate(catalog[:EXERCISES_PER_PLAN])
+    ])
+    StudentWorkoutPlan.objects.bulk_create([
+        StudentWorkoutPlan(
+            student_id=student_id, workout_plan=plans[student_id % len(plans)],
+            assigned_by=teacher, start_date=date.today(),
+        )
+        for student_id in Student.objects.values_list('pk', flat=True)
+    ])
+    return catalog
+
+
+def run_scale(repeat=20):
+    """Benchmark every hot path against the data currently in the database"""
+    student_id = default_student_id()
+    exercise_id = ActivityLog.objects.values_list('exercise_id', flat=True).first()
+    client = benchmark_client()
+
+    results = {}
+    for name, path in hot_paths(student_id):
+        result = measure(client, 'get', path, repeat=repeat)
+        result['alloc_kib'] = measure_allocations(client, 'get', path)
+        results[name] = result
+
+    path = '/api/activity-logs/'
+    payload = creation_payload(student_id, exercise_id)
+    result = measure(client, 'post', path, repeat=repeat, data=payload)
+    result['alloc_kib'] = measure_allocations(client, 'post', path, data=payload)
+    results['create_activity_log'] = result
+    return results
+
+
+def environment():
+    """Describe where the results came from"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+    }
+
+
+def compare(base, head, threshold):
+    """
+    Yield ``(scale, endpoint, base_result, head_result, regressed)`` rows.
+
+    A latency regression is a p50 increase of more than ``threshold``
+    percent; any increase in query count is a regression too.
+    """
+    for scale, endpoints in head['scales'].items():
+        for endpoint, head_result in endpoints.items():
+            base_result = base['scales'].get(scale, {}).get(endpoint)
+            if base_result is None:
+                yield scale, endpoint, None, head_result, False
+                continue
+            slower = head_result['p50_ms'] > base_result['p50_ms'] * (1 + threshold / 100)
+            more_queries = head_result['queries'] > base_result['queries']
+            yield scale, endpoint, base_result, head_result, slower or more_queries
+
+
+def seed_activity_logs(rows, random_seed=42):
+    """Generate at least ``rows`` activity logs in the current database"""
+    catalog = loadgen.ensure_catalog()
+    # About 50 logs per student over four months, whatever the fitness mix
+    loadgen.generate_school(
+        school=0, students=max(1, rows // 40), months=4, seed=random_seed, prefix='serializer',
+        catalog=catalog, batch_size=5000, build_rollups=False,
+    )
+
+
+def _timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        content = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    return content, summarize(timings)
+
+
+def compare_serializers(rows, repeat=5):
+    """
+    Time ActivityLogSerializer + JSONRenderer against the .values() fast path.
+
+    ``serialize`` times only building and rendering already fetched rows;
+    ``end_to_end`` includes fetching them. Raises AssertionError if the two
+    paths do not produce the same bytes.
+    """
+    queryset = ActivityLog.objects.order_by('-date', '-logged_at', '-id')[:rows]
+    values_serializer = ValuesSerializer(ActivityLogSerializer())
+    instances = list(ActivityLogSerializer.setup_eager_loading(queryset))
+    value_rows = list(values_serializer.values(queryset))
+
+    def drf_serialize():
+        return JSONRenderer().render(ActivityLogSerializer(instances, many=True).data)
+
+    def fast_serialize():
+        return FastJSONRenderer().render(values_serializer.represent(value_rows))
+
+    def drf_end_to_end():
+        instances = ActivityLogSerializer.setup_eager_loading(queryset)
+        return JSONRenderer().render(ActivityLogSerializer(instances, many=True).data)
+
+    def fast_end_to_end():
+        return FastJSONRenderer().render(values_serializer.represent(values_serializer.values(queryset)))
+
+    results = {'rows': len(instances)}
+    for name, drf, fast in [('serialize', drf_serialize, fast_serialize),
+                            ('end_to_end', drf_end_to_end, fast_end_to_end)]:
+        drf_content, drf_timings = _timed(drf, repeat)
+        fast_content, fast_timings = _timed(fast, repeat)
+        assert drf_content == fast_content, 'The fast path output differs from the serializer'
+        results[name] = {
+            'serializer': drf_timings,
+            'fast_path': fast_timings,
+            'speedup': round(drf_timings['p50_ms'] / fast_timings['p50_ms'], 1),
+        }
+    return results
+
+
+def benchmark_client():
+    # The test client's default host name is not in ALLOWED_HOSTS outside tests
+    return Client(SERVER_NAME='localhost')
+
+
+def async_paths(student_ids):
+    """Return ``(name, [(sync_path, async_path)])`` for the endpoints with async versions"""
+    return [
+        ('dashboard', [
+            (f'/api/students/{pk}/dashboard/', f'/api/async/students/{pk}/dashboard/')
+            for pk in student_ids
+        ]),
+        ('activity_logs_by_student', [
+            (f'/api/activity-logs/?student_id={pk}', f'/api/async/activity-logs/?student_id={pk}')
+            for pk in student_ids
+        ]),
+        ('leaderboard', [
+            ('/api/leaderboard/?metric=minutes', '/api/async/leaderboard/?metric=minutes'),
+        ]),
+    ]
+
+
+class SimulatedLatency:
+    """
+    Delay every query by a fixed time, like a database across the network.
+
+    In-process benchmarks against a local database otherwise have almost no
+    I/O wait, which is exactly what async views overlap.
+    """
+
+    def __init__(self, latency_ms):
+        self.delay = latency_ms / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.delay)
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs):
+        for conn in [connection] if connection is not None else connections.all():
+            if self not in conn.execute_wrappers:
+                conn.execute_wrappers.append(self)
+
+    def __enter__(self):
+        if self.delay:
+            self.install()
+            connection_created.connect(self.install, weak=False)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.install)
+        for conn in connections.all():
+            if self in conn.execute_wrappers:
+                conn.execute_wrappers.remove(self)
+
+
+async def asgi_get(application, path):
+    """Send a GET request straight to an ASGI application and return the status code"""
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+        'root_path': '', 'headers': [(b'host', b'localhost')],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+async def _throughput(application, paths, requests, clients):
+    counter = iter(range(requests))
+
+    async def run_client():
+        for index in counter:
+            path = paths[index % len(paths)]
+            status_code = await asgi_get(application, path)
+            if status_code >= 400:
+                raise RuntimeError(f'GET {path} returned {status_code}')
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client() for _ in range(clients)))
+    return requests / (time.perf_counter() - started)
+
+
+def throughput(paths, requests, clients):
+    """Requests per second of one ASGI process with ``clients`` requests in flight"""
+    return asyncio.run(_throughput(get_asgi_application(), paths, requests, clients))
+
+
+def compare_async(requests=200, clients=20, latency_ms=2.0, students=10):
+    """
+    Throughput of the sync endpoints against their async versions in one process.
+
+    Both are served by Django's ASGI handler on one event loop with ``clients``
+    requests in flight: each sync view runs on a thread of its own request,
+    while async views also overlap the queries within a request.
+    """
+    student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True)[:students])
+    if not student_ids:
+        raise LookupError('There are no students to benchmark against')
+
+    results = {}
+    with SimulatedLatency(latency_ms):
+        for name, pairs in async_paths(student_ids):
+            sync_rps = throughput([sync_path for sync_path, _ in pairs], requests, clients)
+            async_rps = throughput([async_path for _, async_path in pairs], requests, clients)
+            results[name] = {
+                'sync_rps': round(sync_rps, 1),
+                'async_rps': round(async_rps, 1),
+                'speedup': round(async_rps / sync_rps, 1),
+            }
+    return results
+
+
+def seed_history(students, months, random_seed=42):
+    """Generate ``months`` of history for ``students`` in the current database"""
+    catalog = loadgen.ensure_catalog()
+    loadgen.generate_school(
+        school=0, students=students, months=months, seed=random_seed, prefix='history',
+        catalog=catalog, batch_size=5000, build_rollups=False,
+    )
+
+
+def _live_monthly_totals(months):
+    # One aggregation per month, which djongo can translate
+    totals = []
+    for month in months:
+        row = ActivityLog.objects.filter(
+            date__gte=month, date__lt=snapshots.next_month(month)
+        ).aggregate(activities=Count('id'), minutes=Sum('duration_minutes'), calories=Sum('calories_burned'))
+        if row['activities']:
+            # sqlite sums decimals as floats
+            totals.append({'month': month, **row, 'calories': rollups.to_calories(row['calories'])})
+    return totals
+
+
+def _live_student_totals(end):
+    return [
+        {'student': row['student_id'], 'activities': row['activities'], 'minutes': row['minutes'],
+         'calories': rollups.to_calories(row['calories'])}
+        for row in ActivityLog.objects.filter(date__lte=end).order_by('student_id').values(
+            'student_id'
+        ).annotate(activities=Count('id'), minutes=Sum('duration_minutes'), calories=Sum('calories_burned'))
+    ]
+
+
+def _live_fitness_by_year(end):
+    results = []
+    first = PerformanceMetric.objects.order_by('date').values_list('date', flat=True).first()
+    for year in range(first.year, end.year + 1):
+        row = PerformanceMetric.objects.filter(
+            date__year=year, date__lte=end, fitness_score__isnull=False
+        ).aggregate(count=Count('id'), total=Sum('fitness_score'), min=Min('fitness_score'),
+                    max=Max('fitness_score'))
+        if row['count']:
+            results.append({
+                'year': year, 'count': row['count'], 'mean': round(row['total'] / row['count'], 2),
+                'min': row['min'], 'max': row['max'],
+            })
+    return results
+
+
+def compare_snapshots(directory, repeat=3):
+    """
+    Time the same aggregations over the live tables and over exported snapshots.
+
+    Covers every closed month; raises AssertionError if the answers differ.
+    """
+    today = date.today()
+    end = today.replace(day=1) - timedelta(days=1)
+    months = snapshots.closed_months(snapshots.TABLES['activity_logs'][0], today)
+    queries = [
+        ('monthly_totals', lambda: _live_monthly_totals(months),
+         lambda: history.activity_totals(by='month', directory=directory)),
+        ('student_totals', lambda: _live_student_totals(end),
+         lambda: history.activity_totals(by='student', directory=directory)),
+        ('fitness_by_year', lambda: _live_fitness_by_year(end),
+         lambda: history.metric_averages('fitness_score', by='year', directory=directory)),
+    ]
+    results = {'months': len(months), 'rows': ActivityLog.objects.filter(date__lte=end).count()}
+    for name, live, snapshot in queries:
+        live_result, live_timings = _timed(live, repeat)
+        snapshot_result, snapshot_timings = _timed(snapshot, repeat)
+        assert live_result == snapshot_result, f'{name} differs between the live tables and the snapshots'
+        results[name] = {
+            'live': live_timings,
+            'snapshot': snapshot_timings,
+            'speedup': round(live_timings['p50_ms'] / snapshot_timings['p50_ms'], 1),
+        }
+    return results
+
+
+def seed_school(students, months, random_seed=42):
+    """Generate one school with its rollups in the current database"""
+    catalog = loadgen.ensure_catalog()
+    loadgen.generate_school(
+        school=0, students=students, months=months, seed=random_seed, prefix='aggregation',
+        catalog=catalog, batch_size=5000,
+    )
+
+
+def compare_aggregations(repeat=5):
+    """
+    Time the dashboard, leaderboard and class analytics reads with and without native pipelines.
+
+    Raises AssertionError if the two paths answer differently.
+    """
+    student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True)[:20])
+    queries = [
+        ('dashboard_totals', lambda: [dashboard_totals(student_id) for student_id in student_ids]),
+    ]
+    for metric in leaderboard.METRICS:
+        queries.append(
+            (f'leaderboard_{metric}', lambda metric=metric: leaderboard.build_ranking(metric, 'term'))
+        )
+    queries.append(('leaderboard_grade', lambda: leaderboard.build_ranking('calories', 'month', grade=9)))
+    for window in leaderboard.WINDOWS:
+        queries.append((f'analytics_{window}', lambda window=window: analytics.build_analytics(window)))
+
+    results = {}
+    for name, query in queries:
+        with override_settings(OCTOFIT_NATIVE_AGGREGATION=False):
+            orm_result, orm_timings = _timed(query, repeat)
+        with override_settings(OCTOFIT_NATIVE_AGGREGATION=True):
+            native_result, native_timings = _timed(query, repeat)
+        assert orm_result == native_result, f'{name} differs between the ORM and the native pipelines'
+        results[name] = {
+            'orm': orm_timings,
+            'native': native_timings,
+            'speedup': round(orm_timings['p50_ms'] / native_timings['p50_ms'], 1),
+        }
+    return results
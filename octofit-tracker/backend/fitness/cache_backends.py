@@ -0,0 +1,28 @@
+"""
+Django cache backends that report evictions to the catalog cache counters.
+
+``LocMemCache`` evicts least recently used entries once ``MAX_ENTRIES`` is
+reached; set ``CULL_FREQUENCY`` to ``MAX_ENTRIES`` to evict one at a time.
+``FileBasedCache`` can be shared by every worker process on a host.
+"""
+from django.core.cache.backends import filebased, locmem
+
+from . import catalog_cache
+
+
+class LocMemCache(locmem.LocMemCache):
+
+    def _cull(self):
+        before = len(self._cache)
+        super()._cull()
+        catalog_cache.record('evictions', before - len(self._cache))
+
+
+class FileBasedCache(filebased.FileBasedCache):
+
+    def _cull(self):
+        before = len(self._list_cache_files())
+        if before < self._max_entries:
+            return
+        super()._cull()
+        catalog_cache.record('evictions', before - len(self._list_cache_files()))
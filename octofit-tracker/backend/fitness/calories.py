@@ -0,0 +1,110 @@
+"""
+Bulk recalculation of ``ActivityLog.calories_burned``.
+
+``ActivityLog.save`` fills in calories once, from the exercise rate at the
+time. After a rate changes, ``recalculate`` walks the affected logs, live
+and archived, in primary key order, a batch at a time, and writes the new
+values with one ``UPDATE ... WHERE id IN (...)`` per table and distinct
+value. Queryset updates skip
+``save()`` and signals, so each batch sets ``updated_at`` itself, and
+``refresh_rollups`` rebuilds the affected students' rollups afterwards in
+one set-based pass, which is far cheaper than a rollup delta per log.
+"""
+import time
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import leaderboard, rollups
+from .models import ActivityLog, ArchivedActivityLog, Exercise
+
+# Rollups count archived logs too, so their calories follow the rates as well
+LOG_MODELS = (ActivityLog, ArchivedActivityLog)
+
+
+def affected_logs(exercise_ids=None, model=ActivityLog):
+    logs = model.objects.all()
+    if exercise_ids is not None:
+        logs = logs.filter(exercise_id__in=exercise_ids)
+    return logs
+
+
+def affected_count(exercise_ids=None):
+    """Number of live and archived logs a recalculation reads"""
+    return sum(affected_logs(exercise_ids, model).count() for model in LOG_MODELS)
+
+
+def recalculate(exercise_ids=None, batch_size=2000, after_id=0, on_batch=None):
+    """
+    Recompute calories for logs of ``exercise_ids`` (all exercises by default).
+
+    Starts after the log with primary key ``after_id``, so an interrupted run
+    can continue where it stopped. ``on_batch(last_id, scanned, updated)`` is
+    called after every committed batch. Returns the run's statistics.
+    """
+    rates = dict(Exercise.objects.values_list('pk', 'calories_per_minute'))
+    tables = [
+        (model, affected_logs(exercise_ids, model).order_by('pk').values(
+            'pk', 'duration_minutes', 'intensity', 'exercise_id', 'calories_burned',
+        ))
+        for model in LOG_MODELS
+    ]
+    started = time.monotonic()
+    scanned = updated = 0
+    while True:
+        # Archived logs keep their live ids, so one primary key order (and one
+        # checkpoint) runs through both tables
+        rows = sorted(
+            ((model, row) for model, logs in tables for row in logs.filter(pk__gt=after_id)[:batch_size]),
+            key=lambda entry: entry[1]['pk'],
+        )[:batch_size]
+        if not rows:
+            break
+        updated += _recalculate_batch(rows, rates)
+        scanned += len(rows)
+        after_id = rows[-1][1]['pk']
+        if on_batch is not None:
+            on_batch(after_id, scanned, updated)
+
+    elapsed = time.monotonic() - started
+    return {
+        'scanned': scanned,
+        'updated': updated,
+        'last_id': after_id,
+        'seconds': round(elapsed, 3),
+        'logs_per_second': round(scanned / elapsed, 1) if elapsed else None,
+    }
+
+
+def _recalculate_batch(rows, rates):
+    """Write new calories for the ``(model, row)`` pairs whose value changed; returns how many did"""
+    by_value = defaultdict(list)
+    for model, row in rows:
+        calories = rollups.to_calories(ActivityLog.calculate_calories(
+            rates[row['exercise_id']], row['duration_minutes'], row['intensity']
+        ))
+        if row['calories_burned'] is None or calories != rollups.to_calories(row['calories_burned']):
+            by_value[model, calories].append(row['pk'])
+
+    now = timezone.now()
+    with transaction.atomic():
+        for (model, calories), pks in by_value.items():
+            model.objects.filter(pk__in=pks).update(calories_burned=calories, updated_at=now)
+    return sum(len(pks) for pks in by_value.values())
+
+
+def refresh_rollups(exercise_ids=None):
+    """Rebuild the rollups of every student with logs of ``exercise_ids``"""
+    student_ids = None
+    if exercise_ids is not None:
+        student_ids = sorted({
+            student_id
+            for model in LOG_MODELS
+            for student_id in affected_logs(exercise_ids, model).order_by().values_list(
+                'student_id', flat=True
+            ).distinct()
+        })
+    written = rollups.rebuild_rollups(student_ids=student_ids)
+    leaderboard.invalidate()
+    return written
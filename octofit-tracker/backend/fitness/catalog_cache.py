@@ -0,0 +1,167 @@
+"""
+Response cache for the read-mostly exercise and workout plan catalog.
+
+List and detail responses are stored in the ``catalog`` cache, keyed by
+host and query string. Every key embeds version numbers: one for the whole
+resource, one for its list responses and one per object. Model signals bump
+the versions an edit affects, so stale responses are simply never read again
+and age out of the bounded cache.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError, connections
+from django.http import HttpRequest
+
+logger = logging.getLogger('fitness.performance')
+
+CACHE_ALIAS = 'catalog'
+
+_lock = threading.Lock()
+_stats = Counter()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def record(event, count=1):
+    """Count a cache hit, miss or eviction for this process"""
+    if count:
+        with _lock:
+            _stats[event] += count
+
+
+def stats():
+    with _lock:
+        hits, misses, evictions = _stats['hits'], _stats['misses'], _stats['evictions']
+    lookups = hits + misses
+    return {
+        'backend': settings.CACHES[CACHE_ALIAS]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'evictions': evictions,
+        'hit_ratio': round(hits / lookups, 3) if lookups else None,
+    }
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+def _version_key(resource, scope):
+    return f'catalog:{resource}:version:{scope}'
+
+
+def _versions(resource, *scopes):
+    """
+    Return the current version for each scope.
+
+    Versions are timestamps rather than counters so that a version key lost
+    to eviction comes back as a value no stored response was built with.
+    """
+    cache = get_cache()
+    keys = [_version_key(resource, scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def invalidate(resource, pk=None):
+    """Make cached responses stale: one object and the lists, or everything"""
+    now = time.time_ns()
+    if pk is None:
+        get_cache().set(_version_key(resource, 'all'), now, None)
+    else:
+        get_cache().set_many({
+            _version_key(resource, 'list'): now,
+            _version_key(resource, pk): now,
+        }, None)
+
+
+def response_key(resource, request, pk=None):
+    scope = 'list' if pk is None else str(pk)
+    versions = '.'.join(str(version) for version in _versions(resource, 'all', scope))
+    query = urlencode(sorted(
+        (name, value) for name, values in request.query_params.lists() for value in values
+    ))
+    return f'catalog:{resource}:{scope}:{versions}:{request.get_host()}:{query}'
+
+
+def get(key):
+    data = get_cache().get(key)
+    record('misses' if data is None else 'hits')
+    return data
+
+
+def store(key, data):
+    get_cache().set(key, data)
+
+
+def _list_request(host, path):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {'HTTP_HOST': host, 'REQUEST_METHOD': 'GET', 'PATH_INFO': path}
+    return request
+
+
+def warm_up(hosts=None):
+    """
+    Fill the cache with the default list pages for each host name.
+
+    Returns the number of responses cached.
+    """
+    from .views import ExerciseViewSet, WorkoutPlanViewSet
+
+    hosts = hosts if hosts is not None else getattr(settings, 'OCTOFIT_CATALOG_CACHE_WARM_HOSTS', [])
+    views = {
+        '/api/exercises/': ExerciseViewSet.as_view({'get': 'list'}),
+        '/api/workout-plans/': WorkoutPlanViewSet.as_view({'get': 'list'}),
+    }
+    warmed = 0
+    for host in hosts:
+        for path, view in views.items():
+            try:
+                response = view(_list_request(host, path))
+            except DatabaseError:
+                logger.warning('Could not warm the catalog cache for %s%s', host, path, exc_info=True)
+                continue
+            if response.status_code == 200:
+                warmed += 1
+    return warmed
+
+
+def _warm_up_thread(hosts):
+    try:
+        warm_up(hosts)
+    except Exception:
+        logger.warning('Could not warm the catalog cache', exc_info=True)
+    finally:
+        connections.close_all()
+
+
+def warm_up_in_background(hosts=None):
+    """
+    Warm the cache on a thread of its own, so the first page load after a deploy is not a cold miss.
+
+    Called at process start when ``OCTOFIT_CATALOG_CACHE_WARM_HOSTS`` is set.
+    The ORM cannot query from the event loop an ASGI server imports the
+    application in, and the process need not wait for the queries either.
+    Returns the thread, or None when there is nothing to warm.
+    """
+    hosts = hosts if hosts is not None else getattr(settings, 'OCTOFIT_CATALOG_CACHE_WARM_HOSTS', [])
+    if not hosts:
+        return None
+    thread = threading.Thread(target=_warm_up_thread, args=(hosts,), name='catalog-warm-up', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,61 @@
+"""
+Validators for conditional GET requests.
+
+ETags are weak and derived from row counts and change timestamps, so a
+request can be answered with 304 Not Modified before anything is serialized.
+A detail is validated by its row's latest change; a page of a list by the
+total row count and the ids and timestamps of that page's rows, which is
+one bounded query rather than an aggregate over the whole table.
+"""
+import calendar
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.crypto import md5
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """Weak ETag for the representation of ``parts`` at the requested URL"""
+    # Pagination links, sparse fieldsets and renderers all change the body
+    source = '|'.join(str(part) for part in (
+        request.get_host(), request.get_full_path(), getattr(request, 'accepted_media_type', ''), *parts
+    ))
+    return f'W/"{md5(source.encode(), usedforsecurity=False).hexdigest()}"'
+
+
+def to_timestamp(value):
+    return calendar.timegm(value.utctimetuple()) if value else None
+
+
+def queryset_state(queryset, timestamp_fields):
+    """Return ``(row_count, latest_change)`` for the rows of ``queryset``"""
+    queryset = queryset.select_related(None).prefetch_related(None).order_by()
+    state = queryset.aggregate(
+        row_count=Count('pk'),
+        **{f'latest_{index}': Max(field) for index, field in enumerate(timestamp_fields)}
+    )
+    row_count = state.pop('row_count')
+    return row_count, max((value for value in state.values() if value is not None), default=None)
+
+
+def page_state(queryset, offset, limit, timestamp_fields):
+    """Return ``(row_count, rows)``: the total count and the pk and timestamps of each row on one page"""
+    queryset = queryset.select_related(None).prefetch_related(None)
+    rows = list(queryset[offset:offset + limit].values_list('pk', *timestamp_fields))
+    return queryset.count(), rows
+
+
+def not_modified(request, etag, last_modified=None):
+    """Return a 304 (or 412) response when the request's preconditions call for one"""
+    return get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified=None):
+    if etag:
+        response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # Make browsers revalidate rather than reuse responses heuristically
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ['Accept'])
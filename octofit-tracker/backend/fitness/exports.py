@@ -0,0 +1,179 @@
+"""
+Streaming CSV and NDJSON exports.
+
+Rows are read with ``.values_list().iterator()`` so the database driver
+fetches them in chunks and nothing is cached on the queryset; output is
+written as it is produced, so memory stays flat however many rows match and
+the header goes out before the first chunk is fetched. Exports that span
+more than one table (live and archived activity logs) merge the tables' rows
+in ``(date, id)`` order as they stream.
+
+Django 4.1 iterates streaming responses inside the event loop under ASGI,
+where the ORM refuses to query, so there every chunk is produced on one
+worker thread that keeps the export's cursors and database connection.
+"""
+import asyncio
+import csv
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import StreamingHttpResponse
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+
+# Spreadsheets run a cell starting with one of these as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+ACTIVITY_LOG_COLUMNS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('student_id', 'student_id'),
+    ('first_name', 'student__user__first_name'),
+    ('last_name', 'student__user__last_name'),
+    ('grade', 'student__grade'),
+    ('exercise', 'exercise__name'),
+    ('category', 'exercise__category'),
+    ('workout_plan_id', 'workout_plan_id'),
+    ('duration_minutes', 'duration_minutes'),
+    ('intensity', 'intensity'),
+    ('calories_burned', 'calories_burned'),
+    ('notes', 'notes'),
+    ('logged_at', 'logged_at'),
+]
+
+PERFORMANCE_METRIC_COLUMNS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('student_id', 'student_id'),
+    ('first_name', 'student__user__first_name'),
+    ('last_name', 'student__user__last_name'),
+    ('grade', 'student__grade'),
+    ('weight_kg', 'weight_kg'),
+    ('pushups_count', 'pushups_count'),
+    ('situps_count', 'situps_count'),
+    ('mile_time_seconds', 'mile_time_seconds'),
+    ('flexibility_cm', 'flexibility_cm'),
+    ('fitness_score', 'fitness_score'),
+    ('notes', 'notes'),
+    ('recorded_by_id', 'recorded_by_id'),
+    ('created_at', 'created_at'),
+]
+
+
+def filter_export(queryset, params):
+    """
+    Apply the ``student_id``, ``grade``, ``date_from`` and ``date_to`` filters.
+
+    Raises ValueError with a message for the client when a value is malformed.
+    """
+    try:
+        if params.get('student_id'):
+            queryset = queryset.filter(student_id=int(params['student_id']))
+        if params.get('grade'):
+            queryset = queryset.filter(student__grade=int(params['grade']))
+    except ValueError:
+        raise ValueError('student_id and grade must be integers')
+    try:
+        if params.get('date_from'):
+            queryset = queryset.filter(date__gte=date.fromisoformat(params['date_from']))
+        if params.get('date_to'):
+            queryset = queryset.filter(date__lte=date.fromisoformat(params['date_to']))
+    except ValueError:
+        raise ValueError('date_from and date_to must be dates in YYYY-MM-DD format')
+    return queryset
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the value back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def _batches(rows, size=500):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_cell(value):
+    """Quote free text that a spreadsheet would otherwise evaluate as a formula"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def csv_stream(names, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for batch in _batches(rows):
+        yield ''.join(writer.writerow([csv_cell(value) for value in row]) for row in batch)
+
+
+def ndjson_stream(names, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+    for batch in _batches(rows):
+        yield ''.join(encoder.encode(dict(zip(names, row))) + '\n' for row in batch)
+
+
+def _close_on_worker(chunks):
+    try:
+        chunks.close()
+    finally:
+        # The thread ends with the response, so its connections go with it
+        connections.close_all()
+
+
+def off_event_loop(chunks):
+    """Yield ``chunks``, producing them on a worker thread when iterated from an event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        yield from chunks
+        return
+    # A single thread, as cursors belong to the connection of the thread that opened them
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+    done = object()
+    try:
+        while True:
+            chunk = executor.submit(next, chunks, done).result()
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        executor.submit(_close_on_worker, chunks).result()
+        executor.shutdown()
+
+
+def streaming_export(querysets, columns, export_format, filename):
+    """Return a StreamingHttpResponse with the rows of every queryset as CSV or NDJSON"""
+    names = [name for name, _ in columns]
+    paths = [path for _, path in columns]
+    rows = [
+        queryset.order_by('date', 'id').values_list(*paths).iterator(chunk_size=CHUNK_SIZE)
+        for queryset in querysets
+    ]
+    if len(rows) == 1:
+        rows = rows[0]
+    else:
+        date_index, id_index = names.index('date'), names.index('id')
+        rows = heapq.merge(*rows, key=lambda row: (row[date_index], row[id_index]))
+    stream = csv_stream if export_format == 'csv' else ndjson_stream
+    response = StreamingHttpResponse(
+        off_event_loop(stream(names, rows)), content_type=FORMATS[export_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
@@ -0,0 +1,175 @@
+"""
+Read-only fast path for large list responses.
+
+``ValuesSerializer`` compiles a DRF serializer into the ``.values()`` columns
+it reads (joins included) and one getter per field, then builds the same
+representation straight from the value rows, without creating model
+instances or walking DRF fields for every row. Dates, datetimes and
+decimals are formatted by the DRF field's own rules, with the time zone and
+decimal context looked up once per response, so the output matches the
+serializer exactly.
+"""
+import decimal
+from operator import itemgetter
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+
+class UnsupportedField(Exception):
+    """The serializer has a field that cannot be read from value rows"""
+
+
+# Fields whose representation of a database value is the value itself
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.IntegerField,
+)
+
+
+def _datetime_converter(field):
+    """``DateTimeField.to_representation`` with the time zone looked up once"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def _date_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    def convert(value):
+        return value if isinstance(value, str) else value.isoformat()
+    return convert
+
+
+def _decimal_converter(field):
+    """``DecimalField.to_representation`` with the quantizing context built once"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.decimal_places is None:
+        return field.to_representation
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=field.rounding, context=context))
+    return convert
+
+
+def _converter(field):
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DateField):
+        return _date_converter(field)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    return field.to_representation
+
+
+def _converted(column, convert):
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def _nested(column, build, memo):
+    # Every row pointing at the same related object carries the same joined
+    # columns, so each related object is built once per response
+    def get(row):
+        key = row[column]
+        if key is None:
+            return None
+        try:
+            return memo[key]
+        except KeyError:
+            value = memo[key] = build(row)
+            return value
+    return get
+
+
+def _method(columns, function):
+    def get(row):
+        return function(*[row[column] for column in columns])
+    return get
+
+
+class ValuesSerializer:
+    """
+    Builds a serializer's read representation from ``.values()`` rows.
+
+    Serializer method fields are supported when the serializer declares them
+    in ``values_method_fields`` as ``{name: (source_columns, function)}``.
+    Raises ``UnsupportedField`` for anything else that is not a plain column,
+    a primary key or a nested single-object serializer.
+    """
+
+    def __init__(self, serializer, extra_columns=()):
+        self.columns = list(extra_columns)
+        self._memos = []
+        self.build = self._compile(serializer, '')
+
+    def values(self, queryset):
+        return queryset.prefetch_related(None).values(*self.columns)
+
+    def represent(self, rows):
+        for memo in self._memos:
+            memo.clear()
+        build = self.build
+        return [build(row) for row in rows]
+
+    def _column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return path
+
+    def _compile(self, serializer, prefix):
+        method_fields = getattr(serializer, 'values_method_fields', {})
+        getters = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.SerializerMethodField):
+                if name not in method_fields:
+                    raise UnsupportedField(name)
+                sources, function = method_fields[name]
+                columns = [self._column(prefix + source) for source in sources]
+                getters.append((name, _method(columns, function)))
+                continue
+            if field.source == '*' or isinstance(field, (serializers.ListSerializer,
+                                                         serializers.ManyRelatedField)):
+                raise UnsupportedField(name)
+
+            column = self._column(prefix + field.source.replace('.', '__'))
+            if isinstance(field, serializers.BaseSerializer):
+                memo = {}
+                self._memos.append(memo)
+                getters.append((name, _nested(column, self._compile(field, column + '__'), memo)))
+            elif isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+                getters.append((name, itemgetter(column)))
+            elif isinstance(field, serializers.RelatedField):
+                raise UnsupportedField(name)
+            elif isinstance(field, PASSTHROUGH_FIELDS) and not isinstance(
+                    field, serializers.MultipleChoiceField):
+                getters.append((name, itemgetter(column)))
+            else:
+                getters.append((name, _converted(column, _converter(field))))
+
+        def build(row):
+            return {name: get(row) for name, get in getters}
+        return build
@@ -0,0 +1,140 @@
+"""
+Aggregations over the columnar snapshots of closed months.
+
+These answer the year-over-year questions that would otherwise scan
+millions of live ActivityLog rows. Every function reads the memory-mapped
+columns of ``snapshots.Snapshot`` directly; months that fall entirely inside
+the requested range are summed column by column, and only the months cut by
+``start`` or ``end`` are filtered row by row. Only closed months are
+snapshotted, so the current month is never included.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from . import snapshots
+
+ACTIVITY_GROUPS = ['month', 'year', 'student', 'exercise', 'intensity']
+METRIC_GROUPS = ['month', 'year', 'student']
+METRICS = ['weight_kg', 'pushups_count', 'situps_count', 'mile_time_seconds', 'flexibility_cm',
+           'fitness_score']
+_DECIMAL_METRICS = {'weight_kg', 'flexibility_cm'}
+
+
+def _in_range(snapshot, start, end):
+    """Row indexes of ``snapshot`` dated from ``start`` to ``end``, or None for every row"""
+    first = snapshots.to_day(start) if start and start > snapshot.month else None
+    last = snapshots.to_day(end) if end and end < snapshots.next_month(snapshot.month) else None
+    if first is None and last is None:
+        return None
+    days = snapshot.columns['date']
+    return [
+        index for index, day in enumerate(days)
+        if (first is None or day >= first) and (last is None or day <= last)
+    ]
+
+
+def _group_keys(snapshot, by, rows):
+    """Group key of every row in ``rows`` (or of the whole snapshot when ``by`` is a period)"""
+    if by == 'month':
+        return snapshot.month
+    if by == 'year':
+        return snapshot.month.year
+    column = snapshot.columns[f'{by}_id' if by in ('student', 'exercise') else by]
+    return column if rows is None else [column[index] for index in rows]
+
+
+def _pick(column, rows):
+    return column if rows is None else [column[index] for index in rows]
+
+
+def activity_totals(start=None, end=None, by='month', student_ids=None, directory=None):
+    """
+    Activity count, minutes and calories per month, year, student, exercise or intensity.
+
+    Returns a list of ``{by: key, 'activities': ..., 'minutes': ..., 'calories': ...}``
+    sorted by key, for snapshotted activity dated from ``start`` to ``end``.
+    """
+    if by not in ACTIVITY_GROUPS:
+        raise ValueError(f"by must be one of: {', '.join(ACTIVITY_GROUPS)}")
+    students = set(student_ids) if student_ids is not None else None
+    totals = defaultdict(lambda: [0, 0, 0])
+    for snapshot in snapshots.open_snapshots('activity_logs', start, end, directory):
+        with snapshot:
+            rows = _in_range(snapshot, start, end)
+            if students is not None:
+                column = snapshot.columns['student_id']
+                rows = [
+                    index for index in (range(snapshot.rows) if rows is None else rows)
+                    if column[index] in students
+                ]
+            minutes = _pick(snapshot.columns['duration_minutes'], rows)
+            calories = _pick(snapshot.columns['calories_burned'], rows)
+            keys = _group_keys(snapshot, by, rows)
+
+            if by in ('month', 'year'):
+                total = totals[keys]
+                total[0] += len(minutes)
+                total[1] += sum(minutes)
+                total[2] += sum(value for value in calories if value != snapshots.NULL)
+                continue
+            for key, minute, calorie in zip(keys, minutes, calories):
+                total = totals[key]
+                total[0] += 1
+                total[1] += minute
+                if calorie != snapshots.NULL:
+                    total[2] += calorie
+
+    if by == 'intensity':
+        totals = {snapshots.INTENSITY_CODES[code]: total for code, total in totals.items()}
+    return [
+        {
+            by: key,
+            'activities': count,
+            'minutes': minutes,
+            'calories': Decimal(calories) / snapshots.DECIMAL_SCALE,
+        }
+        for key, (count, minutes, calories) in sorted(totals.items())
+    ]
+
+
+def metric_averages(metric, start=None, end=None, by='month', student_ids=None, directory=None):
+    """
+    Mean, minimum and maximum of one performance metric per month, year or student.
+
+    Assessments without a value for ``metric`` are left out.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    if by not in METRIC_GROUPS:
+        raise ValueError(f"by must be one of: {', '.join(METRIC_GROUPS)}")
+    scale = snapshots.DECIMAL_SCALE if metric in _DECIMAL_METRICS else 1
+    students = set(student_ids) if student_ids is not None else None
+    groups = defaultdict(list)
+    for snapshot in snapshots.open_snapshots('performance_metrics', start, end, directory):
+        with snapshot:
+            rows = _in_range(snapshot, start, end)
+            if students is not None:
+                column = snapshot.columns['student_id']
+                rows = [
+                    index for index in (range(snapshot.rows) if rows is None else rows)
+                    if column[index] in students
+                ]
+            values = _pick(snapshot.columns[metric], rows)
+            keys = _group_keys(snapshot, by, rows)
+            if by in ('month', 'year'):
+                groups[keys].extend(value for value in values if value != snapshots.NULL)
+                continue
+            for key, value in zip(keys, values):
+                if value != snapshots.NULL:
+                    groups[key].append(value)
+
+    return [
+        {
+            by: key,
+            'count': len(values),
+            'mean': round(sum(values) / len(values) / scale, 2),
+            'min': min(values) / scale if scale > 1 else min(values),
+            'max': max(values) / scale if scale > 1 else max(values),
+        }
+        for key, values in sorted(groups.items()) if values
+    ]
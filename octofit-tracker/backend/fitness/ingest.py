@@ -0,0 +1,107 @@
+"""
+Batch ingestion of activity logs.
+
+Rows are validated without touching the database, all foreign keys are
+resolved with one query per model, calories are computed with the same
+multipliers as ``ActivityLog.save`` and rows are written with
+``bulk_create`` in chunks. Rollups and leaderboards are refreshed once per
+chunk, since bulk inserts do not send model signals.
+"""
+from django.db import transaction
+from rest_framework import serializers
+
+from . import leaderboard, rollups
+from .models import ActivityLog, Exercise, Student, WorkoutPlan
+
+INTENSITY_CHOICES = [choice for choice, _ in ActivityLog._meta.get_field('intensity').choices]
+
+
+class ActivityLogBulkItemSerializer(serializers.Serializer):
+    """Validates one bulk activity row; references are resolved later in batch"""
+    student_id = serializers.IntegerField()
+    exercise_id = serializers.IntegerField()
+    workout_plan_id = serializers.IntegerField(required=False, allow_null=True)
+    date = serializers.DateField()
+    duration_minutes = serializers.IntegerField(min_value=1)
+    intensity = serializers.ChoiceField(choices=INTENSITY_CHOICES, default='medium')
+    notes = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+def _existing_ids(model, ids):
+    return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def ingest_activity_logs(rows, batch_size=500):
+    """
+    Validate and insert activity log rows.
+
+    Returns ``(created, errors)`` where ``errors`` is a list of
+    ``{'index': ..., 'errors': ...}`` entries for the rows that were skipped.
+    """
+    errors = []
+    valid = []
+    for index, row in enumerate(rows):
+        serializer = ActivityLogBulkItemSerializer(data=row)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    # One query per referenced model for the whole batch
+    exercises = {
+        exercise['pk']: exercise
+        for exercise in Exercise.objects.filter(
+            pk__in={data['exercise_id'] for _, data in valid}
+        ).values('pk', 'calories_per_minute', 'category')
+    }
+    student_ids = _existing_ids(Student, {data['student_id'] for _, data in valid})
+    plan_ids = _existing_ids(
+        WorkoutPlan, {data['workout_plan_id'] for _, data in valid if data.get('workout_plan_id')}
+    )
+
+    logs = []
+    delta_rows = []
+    for index, data in valid:
+        row_errors = {}
+        exercise = exercises.get(data['exercise_id'])
+        if exercise is None:
+            row_errors['exercise_id'] = [f"Invalid pk \"{data['exercise_id']}\" - object does not exist."]
+        if data['student_id'] not in student_ids:
+            row_errors['student_id'] = [f"Invalid pk \"{data['student_id']}\" - object does not exist."]
+        plan_id = data.get('workout_plan_id')
+        if plan_id and plan_id not in plan_ids:
+            row_errors['workout_plan_id'] = [f'Invalid pk "{plan_id}" - object does not exist.']
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+
+        calories = ActivityLog.calculate_calories(
+            exercise['calories_per_minute'], data['duration_minutes'], data['intensity']
+        )
+        logs.append(ActivityLog(
+            student_id=data['student_id'],
+            exercise_id=data['exercise_id'],
+            workout_plan_id=plan_id,
+            date=data['date'],
+            duration_minutes=data['duration_minutes'],
+            intensity=data['intensity'],
+            calories_burned=calories,
+            notes=data['notes'],
+        ))
+        delta_rows.append({
+            'student_id': data['student_id'],
+            'category': exercise['category'],
+            'date': data['date'],
+            'duration_minutes': data['duration_minutes'],
+            'calories_burned': calories,
+        })
+
+    for start in range(0, len(logs), batch_size):
+        with transaction.atomic():
+            ActivityLog.objects.bulk_create(logs[start:start + batch_size])
+            rollups.apply_deltas(rollups.collect_deltas(delta_rows[start:start + batch_size]))
+
+    if logs:
+        leaderboard.invalidate()
+    errors.sort(key=lambda error: error['index'])
+    return len(logs), errors
@@ -0,0 +1,289 @@
+"""
+Database-backed background jobs.
+
+Jobs are rows in the ``Job`` table. ``manage.py run_jobs`` claims queued
+rows with a conditional update (so several workers never run the same job),
+runs them in a pool of processes and records progress, results and
+failures back on the row. Failed jobs are retried with exponential backoff
+until ``max_attempts`` is reached; jobs whose worker stopped sending
+progress are put back in the queue.
+"""
+import inspect
+import logging
+import time
+from datetime import date, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+
+from . import archive, calories, leaderboard, rollups, trends
+from .models import ActivityRollup, Job, PerformanceMetric, Student
+
+logger = logging.getLogger('fitness.jobs')
+
+# Seconds before the first retry; doubled for every further attempt
+RETRY_DELAY_SECONDS = 30
+
+JOB_TYPES = {}
+JOB_VALIDATORS = {}
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key was reused for a different job"""
+
+
+def register(kind, validator=None):
+    """
+    Register ``function(context, **params)`` as the handler for jobs of ``kind``.
+
+    ``validator(**params)`` may raise ValueError to refuse params when a job is queued.
+    """
+    def decorator(function):
+        JOB_TYPES[kind] = function
+        if validator is not None:
+            JOB_VALIDATORS[kind] = validator
+        return function
+    return decorator
+
+
+def validate(kind, params):
+    """Raise ValueError unless ``kind`` is known and accepts ``params``"""
+    if kind not in JOB_TYPES:
+        raise ValueError(f"kind must be one of: {', '.join(sorted(JOB_TYPES))}")
+    if not isinstance(params, dict):
+        raise ValueError('params must be an object')
+    try:
+        inspect.signature(JOB_TYPES[kind]).bind(None, **params)
+    except TypeError as error:
+        raise ValueError(f'Invalid params for {kind}: {error}')
+    if kind in JOB_VALIDATORS:
+        JOB_VALIDATORS[kind](**params)
+
+
+def enqueue(kind, params=None, idempotency_key=None, created_by=None, max_attempts=3):
+    """
+    Queue a job and return ``(job, created)``.
+
+    Enqueueing again with the same idempotency key returns the existing job
+    instead of queueing a duplicate; reusing the key for a different kind or
+    different params raises IdempotencyConflict.
+    """
+    params = params or {}
+    validate(kind, params)
+    fields = {'kind': kind, 'params': params, 'created_by': created_by, 'max_attempts': max_attempts}
+    if not idempotency_key:
+        return Job.objects.create(**fields), True
+    try:
+        with transaction.atomic():
+            return Job.objects.create(idempotency_key=idempotency_key, **fields), True
+    except IntegrityError:
+        job = Job.objects.get(idempotency_key=idempotency_key)
+        if job.kind != kind or job.params != params:
+            raise IdempotencyConflict(idempotency_key)
+        return job, False
+
+
+def claim(worker, limit=1):
+    """Mark up to ``limit`` due jobs as running for ``worker`` and return their ids"""
+    candidates = Job.objects.filter(status=Job.QUEUED, run_after__lte=timezone.now()).order_by(
+        'run_after', 'id'
+    ).values_list('pk', flat=True)[:limit * 2]
+    claimed = []
+    for pk in candidates:
+        if claim_job(pk, worker):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def claim_job(pk, worker):
+    """Mark one queued job as running for ``worker``; False if another worker got it first"""
+    now = timezone.now()
+    # Only one worker's update can match while the job is still queued
+    return bool(Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=worker, locked_at=now, started_at=now,
+        attempts=F('attempts') + 1, progress_message='',
+    ))
+
+
+class JobContext:
+    """Handed to job handlers to report progress and save checkpoints"""
+
+    def __init__(self, job):
+        self.job = job
+        self.checkpoint = job.checkpoint
+
+    def progress(self, current, total=None, message=''):
+        """Record progress; this also tells the queue the worker is still alive"""
+        changes = {
+            'progress_current': current,
+            'progress_message': message[:200],
+            'locked_at': timezone.now(),
+        }
+        if total is not None:
+            changes['progress_total'] = total
+        Job.objects.filter(pk=self.job.pk, status=Job.RUNNING).update(**changes)
+
+    def save_checkpoint(self, checkpoint):
+        """Remember how far the job got; a retry starts with ``context.checkpoint`` set to it"""
+        self.checkpoint = checkpoint
+        Job.objects.filter(pk=self.job.pk, status=Job.RUNNING).update(
+            checkpoint=checkpoint, locked_at=timezone.now()
+        )
+
+
+def execute(pk):
+    """Run a claimed job in this process and return its final status"""
+    job = Job.objects.get(pk=pk)
+    try:
+        result = JOB_TYPES[job.kind](JobContext(job), **job.params)
+    except Exception as error:
+        logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.kind, job.attempts)
+        return retry_or_fail(job, f'{type(error).__name__}: {error}')
+
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(
+        status=Job.SUCCEEDED, result=result, error='', finished_at=timezone.now(),
+    )
+    return Job.SUCCEEDED
+
+
+def retry_or_fail(job, error):
+    """Queue the job again after a backoff, or fail it once it is out of attempts"""
+    now = timezone.now()
+    if job.attempts < job.max_attempts:
+        changes = {
+            'status': Job.QUEUED,
+            'run_after': now + timedelta(seconds=RETRY_DELAY_SECONDS * 2 ** (job.attempts - 1)),
+        }
+    else:
+        changes = {'status': Job.FAILED, 'finished_at': now}
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(error=error, locked_by='', **changes)
+    return changes['status']
+
+
+def requeue_stale(stale_after):
+    """Retry or fail running jobs that have not reported progress for ``stale_after`` seconds"""
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = list(Job.objects.filter(status=Job.RUNNING, locked_at__lt=cutoff))
+    for job in stale:
+        retry_or_fail(job, f'Worker {job.locked_by} stopped responding')
+    return len(stale)
+
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@register('rebuild_rollups')
+def rebuild_rollups(context, student_ids=None, batch_size=200):
+    """Rebuild activity and metric rollups from the full history, a batch of students at a time"""
+    if student_ids is None:
+        student_ids = list(Student.objects.order_by('pk').values_list('pk', flat=True))
+    written = metric_written = 0
+    context.progress(0, len(student_ids))
+    for done, batch in enumerate(_batches(student_ids, batch_size)):
+        written += rollups.rebuild_rollups(student_ids=batch)
+        metric_written += trends.rebuild_rollups(student_ids=batch)
+        context.progress(min((done + 1) * batch_size, len(student_ids)), message=f'{written} rollup rows')
+    leaderboard.invalidate()
+    return {'students': len(student_ids), 'rollup_rows': written, 'metric_rollup_rows': metric_written}
+
+
+@register('recalculate_calories')
+def recalculate_calories(context, exercise_ids=None, batch_size=2000):
+    """Recompute calories_burned of logged activities after exercise rates changed"""
+    resumed = context.checkpoint or {'last_id': 0, 'scanned': 0, 'updated': 0}
+    total = calories.affected_count(exercise_ids)
+
+    def on_batch(last_id, scanned, updated):
+        scanned += resumed['scanned']
+        updated += resumed['updated']
+        context.save_checkpoint({'last_id': last_id, 'scanned': scanned, 'updated': updated})
+        context.progress(scanned, total, f'{updated} logs updated')
+
+    result = calories.recalculate(
+        exercise_ids, batch_size=batch_size, after_id=resumed['last_id'], on_batch=on_batch
+    )
+    logger.info(
+        'Recalculated calories for %d logs (%d changed) at %s logs/s',
+        result['scanned'], result['updated'], result['logs_per_second']
+    )
+    result['scanned'] += resumed['scanned']
+    result['updated'] += resumed['updated']
+    result['resumed_after_id'] = resumed['last_id']
+    # Also reached when resuming a run interrupted after its last batch
+    if result['updated']:
+        context.progress(result['scanned'], total, 'Rebuilding activity rollups')
+        result['rollup_rows'] = calories.refresh_rollups(exercise_ids)
+    return result
+
+
+def validate_archive_cutoff(before=None, batch_size=1000):
+    """Queued archival may not reach into the terms the live lists still show"""
+    if before is None:
+        return
+    try:
+        before = date.fromisoformat(before)
+    except (TypeError, ValueError):
+        raise ValueError('before must be a date in YYYY-MM-DD format')
+    cutoff = archive.default_cutoff()
+    if before > cutoff:
+        raise ValueError(f'before cannot be later than the archive cutoff {cutoff.isoformat()}')
+
+
+@register('archive_activity_logs', validator=validate_archive_cutoff)
+def archive_activity_logs(context, before=None, batch_size=1000):
+    """Move logs dated before ``before`` (an ISO date, the configured cutoff by default) to the archive"""
+    before = date.fromisoformat(before) if before else archive.default_cutoff()
+    started = time.monotonic()
+    context.progress(0, archive.pending(before).count())
+    # Every batch commits on its own, so a retry carries on where the last attempt stopped
+    moved = archive.archive_logs(
+        before, batch_size=batch_size,
+        on_batch=lambda moved: context.progress(moved, message=f'{moved} logs moved'),
+    )
+    return {'before': before, 'moved': moved, 'seconds': round(time.monotonic() - started, 3)}
+
+
+@register('term_report')
+def term_report(context, grade=None, batch_size=500):
+    """Per-student activity totals and best fitness score for the current term"""
+    start = leaderboard.window_start('term')
+    students = Student.objects.select_related('user').order_by('grade', 'user__last_name', 'pk')
+    if grade is not None:
+        students = students.filter(grade=grade)
+    students = list(students)
+    context.progress(0, len(students))
+
+    rows = []
+    for batch in _batches(students, batch_size):
+        ids = [student.pk for student in batch]
+        totals = {
+            row['student_id']: row for row in ActivityRollup.objects.filter(
+                student_id__in=ids, period='month', period_start__gte=start
+            ).order_by().values('student_id').annotate(
+                activities=Sum('activity_count'), minutes=Sum('total_minutes'),
+                calories=Sum('total_calories'),
+            )
+        }
+        best_scores = dict(PerformanceMetric.objects.filter(
+            student_id__in=ids, date__gte=start
+        ).order_by().values('student_id').annotate(best=Max('fitness_score')).values_list(
+            'student_id', 'best'
+        ))
+        for student in batch:
+            total = totals.get(student.pk, {})
+            rows.append({
+                'student_id': student.pk,
+                'full_name': student.user.get_full_name(),
+                'grade': student.grade,
+                'activities': total.get('activities') or 0,
+                'minutes': total.get('minutes') or 0,
+                'calories': rollups.to_calories(total.get('calories')),
+                'best_fitness_score': best_scores.get(student.pk),
+            })
+        context.progress(len(rows))
+    return {'term_start': start, 'grade': grade, 'students': rows}
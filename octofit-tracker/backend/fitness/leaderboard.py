@@ -0,0 +1,109 @@
+"""
+Ranked student leaderboards built from precomputed rollups.
+
+Full rankings are cached per metric, window and grade. Any ActivityLog or
+PerformanceMetric write bumps a version number that is part of every cache
+key, so stale snapshots are simply never read again.
+"""
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Max, Sum
+
+from . import pipelines, rollups
+from .models import ActivityRollup, PerformanceMetric, Student
+
+METRICS = ['fitness_score', 'calories', 'minutes']
+WINDOWS = ['week', 'month', 'term']
+
+CACHE_TIMEOUT = 60 * 60
+VERSION_KEY = 'leaderboard:version'
+
+_ROLLUP_COLUMNS = {
+    'calories': 'total_calories',
+    'minutes': 'total_minutes',
+}
+
+
+def window_start(window, today=None):
+    """Return the first day of the current week, month or term"""
+    today = today or date.today()
+    if window in ('week', 'month'):
+        return rollups.period_start(window, today)
+    if window == 'term':
+        start_months = sorted(getattr(settings, 'OCTOFIT_TERM_START_MONTHS', [1, 8]))
+        started = [month for month in start_months if month <= today.month]
+        if started:
+            return date(today.year, started[-1], 1)
+        return date(today.year - 1, start_months[-1], 1)
+    raise ValueError(f"Unknown leaderboard window: {window}")
+
+
+def invalidate():
+    """Make every cached leaderboard stale"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 2, None)
+
+
+def _version():
+    return cache.get_or_set(VERSION_KEY, 1, None)
+
+
+def _scores(metric, window, start, grade):
+    """Return ``(student_id, value)`` pairs for every student scoring in the window"""
+    if pipelines.enabled():
+        return pipelines.leaderboard_scores(metric, window, start, grade)
+    if metric == 'fitness_score':
+        queryset = PerformanceMetric.objects.filter(date__gte=start, fitness_score__isnull=False)
+        aggregate = Max('fitness_score')
+    else:
+        # Weeks and months are single rollup rows; a term spans several months
+        queryset = ActivityRollup.objects.filter(period='week' if window == 'week' else 'month')
+        if window == 'term':
+            queryset = queryset.filter(period_start__gte=start)
+        else:
+            queryset = queryset.filter(period_start=start)
+        aggregate = Sum(_ROLLUP_COLUMNS[metric])
+
+    if grade is not None:
+        queryset = queryset.filter(student__grade=grade)
+    return queryset.order_by().values('student_id').annotate(
+        value=aggregate
+    ).values_list('student_id', 'value')
+
+
+def build_ranking(metric, window, grade=None, today=None):
+    """Compute the full ranking, best first, using competition ranks for ties"""
+    start = window_start(window, today)
+    scores = sorted(_scores(metric, window, start, grade), key=lambda pair: (-pair[1], pair[0]))
+    students = Student.objects.select_related('user').in_bulk([student_id for student_id, _ in scores])
+
+    ranking = []
+    previous_value = None
+    for position, (student_id, value) in enumerate(scores, start=1):
+        if value != previous_value:
+            rank = position
+            previous_value = value
+        student = students[student_id]
+        ranking.append({
+            'rank': rank,
+            'student_id': student_id,
+            'full_name': student.user.get_full_name(),
+            'grade': student.grade,
+            'value': value,
+        })
+    return start, ranking
+
+
+def get_ranking(metric, window, grade=None):
+    """Return the cached ranking snapshot, building it on a miss"""
+    today = date.today()
+    key = f'leaderboard:{_version()}:{metric}:{window}:{grade}:{today.isoformat()}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_ranking(metric, window, grade, today)
+        cache.set(key, snapshot, CACHE_TIMEOUT)
+    return snapshot
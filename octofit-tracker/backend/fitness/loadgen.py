@@ -0,0 +1,223 @@
+"""
+Synthetic data generation for load testing.
+
+Each school gets a teacher and its own students, and every student gets a
+history of activity logs and periodic fitness assessments whose volume and
+scores depend on their fitness level. Each school is generated from its own
+random seed, so the output does not depend on how many worker processes
+share the work.
+"""
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import rollups, trends
+from .models import ActivityLog, Exercise, PerformanceMetric, Student, Teacher
+
+EXERCISE_CATALOG = [
+    ('Running', 'cardio', '10.00'),
+    ('Cycling', 'cardio', '9.50'),
+    ('Swimming', 'cardio', '11.00'),
+    ('Jumping Jacks', 'cardio', '8.00'),
+    ('Push-ups', 'strength', '7.00'),
+    ('Squats', 'strength', '7.50'),
+    ('Sit-ups', 'strength', '6.00'),
+    ('Yoga', 'flexibility', '4.00'),
+    ('Stretching', 'flexibility', '3.00'),
+    ('Basketball', 'sports', '9.00'),
+]
+
+FITNESS_LEVELS = ['beginner', 'intermediate', 'advanced']
+FITNESS_LEVEL_WEIGHTS = [0.5, 0.35, 0.15]
+
+# Chance of logging on a given day, typical session length and intensity mix
+ACTIVE_DAY_PROBABILITY = {'beginner': 0.3, 'intermediate': 0.5, 'advanced': 0.7}
+MEAN_DURATION_MINUTES = {'beginner': 25, 'intermediate': 35, 'advanced': 45}
+INTENSITY_WEIGHTS = {
+    'beginner': [0.5, 0.4, 0.1],
+    'intermediate': [0.25, 0.5, 0.25],
+    'advanced': [0.1, 0.4, 0.5],
+}
+BASE_FITNESS_SCORE = {'beginner': 45, 'intermediate': 62, 'advanced': 78}
+
+ASSESSMENT_INTERVAL_DAYS = 14
+DAYS_PER_MONTH = 30
+
+
+def ensure_catalog():
+    """Return ``(pk, calories_per_minute, category)`` for the exercise catalog"""
+    for name, category, calories_per_minute in EXERCISE_CATALOG:
+        Exercise.objects.get_or_create(
+            name=name,
+            defaults={
+                'description': name,
+                'category': category,
+                'calories_per_minute': calories_per_minute,
+            }
+        )
+    return list(Exercise.objects.values_list('pk', 'calories_per_minute', 'category'))
+
+
+def _create_people(school, students, prefix, rng):
+    """Create the school's teacher and students and return the student rows"""
+    password = make_password(None)
+    school_prefix = f'{prefix}_s{school}'
+
+    teacher_user = User.objects.create(
+        username=f'{school_prefix}_teacher', first_name='Teacher', last_name=f'School {school}',
+        password=password,
+    )
+    Teacher.objects.create(user=teacher_user)
+
+    User.objects.bulk_create(
+        [
+            User(
+                username=f'{school_prefix}_{number}',
+                first_name=f'Student{number}',
+                last_name=f'School{school}',
+                password=password,
+            )
+            for number in range(students)
+        ],
+        batch_size=1000,
+    )
+    # Look ids up again rather than relying on bulk_create returning them
+    user_ids = list(User.objects.filter(
+        username__startswith=f'{school_prefix}_'
+    ).exclude(username=teacher_user.username).order_by('pk').values_list('pk', flat=True))
+
+    Student.objects.bulk_create(
+        [
+            Student(
+                user_id=user_id,
+                grade=rng.randint(9, 12),
+                age=rng.randint(14, 18),
+                fitness_level=rng.choices(FITNESS_LEVELS, FITNESS_LEVEL_WEIGHTS)[0],
+            )
+            for user_id in user_ids
+        ],
+        batch_size=1000,
+    )
+    return list(
+        Student.objects.filter(user_id__in=user_ids).order_by('pk').values_list('pk', 'fitness_level')
+    )
+
+
+def _activity_logs(student_id, fitness_level, start, days, catalog, rng):
+    active = ACTIVE_DAY_PROBABILITY[fitness_level]
+    mean_duration = MEAN_DURATION_MINUTES[fitness_level]
+    intensity_weights = INTENSITY_WEIGHTS[fitness_level]
+    for offset in range(days):
+        if rng.random() >= active:
+            continue
+        exercise_id, calories_per_minute, _ = rng.choice(catalog)
+        duration = max(5, min(180, int(rng.gauss(mean_duration, mean_duration / 3))))
+        intensity = rng.choices(['low', 'medium', 'high'], intensity_weights)[0]
+        yield ActivityLog(
+            student_id=student_id,
+            exercise_id=exercise_id,
+            date=start + timedelta(days=offset),
+            duration_minutes=duration,
+            intensity=intensity,
+            calories_burned=ActivityLog.calculate_calories(calories_per_minute, duration, intensity),
+        )
+
+
+def _performance_metrics(student_id, fitness_level, start, days, rng):
+    score = BASE_FITNESS_SCORE[fitness_level] + rng.gauss(0, 6)
+    weight = rng.gauss(62, 9)
+    for offset in range(0, days, ASSESSMENT_INTERVAL_DAYS):
+        # Slow improvement with assessment-to-assessment noise
+        score = min(100, max(0, score + rng.gauss(0.4, 2.5)))
+        weight += rng.gauss(0, 0.4)
+        yield PerformanceMetric(
+            student_id=student_id,
+            date=start + timedelta(days=offset),
+            weight_kg=round(weight, 2),
+            pushups_count=max(0, int(score / 2 + rng.gauss(0, 4))),
+            situps_count=max(0, int(score / 1.8 + rng.gauss(0, 4))),
+            mile_time_seconds=max(300, int(900 - score * 5 + rng.gauss(0, 25))),
+            flexibility_cm=round(max(0, score / 4 + rng.gauss(0, 3)), 2),
+            fitness_score=round(score),
+        )
+
+
+def _write_in_batches(model, rows, batch_size, on_batch=None):
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            if on_batch:
+                on_batch(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch)
+        if on_batch:
+            on_batch(batch)
+        written += len(batch)
+    return written
+
+
+def generate_school(school, students, months, seed, prefix, catalog, batch_size,
+                    build_rollups=True):
+    """
+    Generate one school's people and history.
+
+    ``catalog`` is the output of ``ensure_catalog``. Returns a dict of row
+    counts and the seconds spent writing them.
+    """
+    rng = random.Random(f'{seed}:{school}')
+    days = months * DAYS_PER_MONTH
+    start = date.today() - timedelta(days=days - 1)
+
+    categories = {pk: category for pk, _, category in catalog}
+    totals = rollups.collect_deltas([])
+
+    def add_to_rollups(logs):
+        rollups.collect_deltas((
+            {
+                'student_id': log.student_id,
+                'category': categories[log.exercise_id],
+                'date': log.date,
+                'duration_minutes': log.duration_minutes,
+                'calories_burned': log.calories_burned,
+            }
+            for log in logs
+        ), deltas=totals)
+
+    metric_totals = trends.collect_totals([])
+
+    def add_to_metric_rollups(metrics):
+        trends.collect_totals(map(trends.metric_row, metrics), metric_totals)
+
+    started = time.monotonic()
+    with transaction.atomic():
+        roster = _create_people(school, students, prefix, rng)
+    activity_rows = _write_in_batches(ActivityLog, (
+        log
+        for student_id, fitness_level in roster
+        for log in _activity_logs(student_id, fitness_level, start, days, catalog, rng)
+    ), batch_size, on_batch=add_to_rollups if build_rollups else None)
+    metric_rows = _write_in_batches(PerformanceMetric, (
+        metric
+        for student_id, fitness_level in roster
+        for metric in _performance_metrics(student_id, fitness_level, start, days, rng)
+    ), batch_size, on_batch=add_to_metric_rollups if build_rollups else None)
+    if build_rollups:
+        # The students are new, so their rollups can be inserted outright
+        rollups.insert_rollups(totals, batch_size=batch_size)
+        trends.insert_rollups(metric_totals, batch_size=batch_size)
+
+    return {
+        'students': len(roster),
+        'activity_logs': activity_rows,
+        'performance_metrics': metric_rows,
+        'seconds': time.monotonic() - started,
+    }
@@ -0,0 +1,53 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fitness import archive, jobs
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves activity logs from terms that ended more than OCTOFIT_ARCHIVE_AFTER_DAYS ago into '
+        'the archive table; rollup totals are unchanged'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', help='Archive logs dated before this day (YYYY-MM-DD) instead of the configured cutoff'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Logs moved per transaction')
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Only report how many logs would be archived'
+        )
+        parser.add_argument(
+            '--background', action='store_true',
+            help='Queue the archival for run_jobs instead of running it here'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            before = date.fromisoformat(options['before']) if options['before'] else archive.default_cutoff()
+        except ValueError:
+            raise CommandError('--before must be a date in YYYY-MM-DD format')
+
+        if options['dry_run']:
+            count = archive.pending(before).count()
+            self.stdout.write(f'{count} logs dated before {before} would be archived')
+            return
+        if options['background']:
+            try:
+                job, _ = jobs.enqueue(
+                    'archive_activity_logs', {'before': before.isoformat(), 'batch_size': options['batch_size']}
+                )
+            except ValueError as error:
+                raise CommandError(f'{error}; run without --background to archive up to a later day')
+            self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk}'))
+            return
+
+        started = time.monotonic()
+        moved = archive.archive_logs(before, batch_size=options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {moved} logs dated before {before} in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from fitness import analytics
+from fitness.benchmarks import benchmark_databases, compare_aggregations, seed_school
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway MongoDB test database and compares the dashboard, leaderboard and class '
+        'analytics reads through the ORM and through native aggregation pipelines'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500, help='Students to generate')
+        parser.add_argument('--months', type=int, default=12, help='Months of history per student')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'djongo':
+            raise CommandError('Native aggregation pipelines need the MongoDB (djongo) database')
+
+        setup_test_environment()
+        try:
+            with benchmark_databases():
+                analytics_name = connections[analytics.database()].settings_dict['NAME']
+                if analytics_name != connection.settings_dict['NAME']:
+                    raise CommandError(
+                        f'Analytics reads would go to {analytics_name} instead of the test database'
+                    )
+                self.stdout.write(
+                    f"Seeding {options['months']} months of history for {options['students']} students..."
+                )
+                seed_school(options['students'], options['months'])
+                results = compare_aggregations(repeat=options['repeat'])
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(f"{'':<26}{'ORM p50 ms':>12}{'native p50 ms':>15}{'speedup':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<26}{result['orm']['p50_ms']:>12.1f}"
+                f"{result['native']['p50_ms']:>15.1f}{result['speedup']:>9.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS('Native pipelines match the ORM answers'))
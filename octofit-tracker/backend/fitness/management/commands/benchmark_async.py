@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from fitness.benchmarks import SCALES, benchmark_databases, compare_async, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database and load tests the sync dashboard, activity log and '
+        'leaderboard endpoints against their async versions under one ASGI process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint and mode')
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent clients')
+        parser.add_argument(
+            '--db-latency-ms', type=float, default=2.0,
+            help='Delay added to every query to stand in for a networked database (0 to disable)'
+        )
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+        parser.add_argument(
+            '--min-speedup', type=float, default=None,
+            help='Fail unless the async dashboard serves at least this many times more requests'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with benchmark_databases():
+                self.stdout.write(f"Seeding the {options['scale']} data set...")
+                seed(SCALES[options['scale']])
+                results = compare_async(
+                    requests=options['requests'], clients=options['clients'],
+                    latency_ms=options['db_latency_ms'],
+                )
+        finally:
+            teardown_test_environment()
+
+        self.stdout.write(
+            f"{options['clients']} concurrent clients, {options['db_latency_ms']} ms per query"
+        )
+        self.stdout.write(f"{'':<26}{'sync req/s':>12}{'async req/s':>13}{'speedup':>10}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<26}{result['sync_rps']:>12.1f}{result['async_rps']:>13.1f}"
+                f"{result['speedup']:>9.1f}x"
+            )
+
+        speedup = results['dashboard']['speedup']
+        if options['min_speedup'] is not None and speedup < options['min_speedup']:
+            raise CommandError(f"Dashboard speedup {speedup}x is below {options['min_speedup']}x")
+        self.stdout.write(self.style.SUCCESS('Done'))
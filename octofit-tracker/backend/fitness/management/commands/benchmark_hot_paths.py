@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fitness.benchmarks import benchmark_client, default_student_id, hot_paths, measure
+
+
+class Command(BaseCommand):
+    help = 'Times the hot API read paths against the configured database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--student', type=int, help='Student id to use for per-student endpoints')
+
+    def handle(self, *args, **options):
+        try:
+            student_id = options['student'] or default_student_id()
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        client = benchmark_client()
+        self.stdout.write(f"{'endpoint':<28}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}")
+        for name, path in hot_paths(student_id):
+            result = measure(client, 'get', path, repeat=options['repeat'])
+            self.stdout.write(
+                f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['queries']:>9}"
+            )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from fitness.benchmarks import compare_serializers, seed_activity_logs
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database and compares ActivityLogSerializer with the '
+        '.values() fast path on the same rows'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Activity logs to serialize')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per path')
+        parser.add_argument(
+            '--min-speedup', type=float, default=5.0,
+            help='Fail unless the fast path serializes at least this many times faster'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Seeding {options['rows']} activity logs...")
+            seed_activity_logs(options['rows'])
+            results = compare_serializers(options['rows'], repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{results['rows']} rows")
+        self.stdout.write(f"{'':<12}{'serializer p50 ms':>20}{'fast path p50 ms':>20}{'speedup':>10}")
+        for name in ['serialize', 'end_to_end']:
+            result = results[name]
+            self.stdout.write(
+                f"{name:<12}{result['serializer']['p50_ms']:>20.1f}"
+                f"{result['fast_path']['p50_ms']:>20.1f}{result['speedup']:>9.1f}x"
+            )
+
+        if results['serialize']['speedup'] < options['min_speedup']:
+            raise CommandError(
+                f"Serialization speedup {results['serialize']['speedup']}x is below "
+                f"{options['min_speedup']}x"
+            )
+        self.stdout.write(self.style.SUCCESS('Fast path output is identical and fast enough'))
@@ -0,0 +1,54 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from fitness import snapshots
+from fitness.benchmarks import compare_snapshots, seed_history
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database, exports its closed months to snapshots and compares '
+        'historical aggregations over the live tables and the snapshot files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200, help='Students to generate')
+        parser.add_argument('--months', type=int, default=24, help='Months of history per student')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query')
+        parser.add_argument(
+            '--min-speedup', type=float, default=2.0,
+            help='Fail unless every snapshot query is at least this many times faster'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                self.stdout.write(
+                    f"Seeding {options['months']} months of history for {options['students']} students..."
+                )
+                seed_history(options['students'], options['months'])
+                snapshots.export(directory=directory)
+                results = compare_snapshots(directory, repeat=options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{results['rows']} activity logs in {results['months']} closed months")
+        self.stdout.write(f"{'':<18}{'live p50 ms':>14}{'snapshot p50 ms':>18}{'speedup':>10}")
+        names = [name for name in results if name not in ('rows', 'months')]
+        for name in names:
+            result = results[name]
+            self.stdout.write(
+                f"{name:<18}{result['live']['p50_ms']:>14.1f}"
+                f"{result['snapshot']['p50_ms']:>18.1f}{result['speedup']:>9.1f}x"
+            )
+
+        slowest = min(results[name]['speedup'] for name in names)
+        if slowest < options['min_speedup']:
+            raise CommandError(f"Snapshot speedup {slowest}x is below {options['min_speedup']}x")
+        self.stdout.write(self.style.SUCCESS('Snapshot answers match the live tables'))
@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Verifies that the indexes declared on the fitness models exist in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database alias to inspect'
+        )
+
+    def expected_indexes(self, model):
+        """Yield ``(name, columns)`` for every index the model declares"""
+        for index in model._meta.indexes:
+            columns = [
+                model._meta.get_field(field_name.lstrip('-')).column
+                for field_name in index.fields
+            ]
+            yield index.name, columns
+        for field_names in model._meta.unique_together:
+            columns = [model._meta.get_field(field_name).column for field_name in field_names]
+            yield f"unique({', '.join(field_names)})", columns
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        missing = 0
+        with connection.cursor() as cursor:
+            for model in apps.get_app_config('fitness').get_models():
+                table = model._meta.db_table
+                constraints = connection.introspection.get_constraints(cursor, table)
+                existing = [
+                    constraint['columns'] for constraint in constraints.values()
+                    if constraint['index'] or constraint['unique']
+                ]
+                for name, columns in self.expected_indexes(model):
+                    if columns in existing:
+                        self.stdout.write(f'{table}: {name} ({", ".join(columns)}) OK')
+                    else:
+                        missing += 1
+                        self.stdout.write(self.style.ERROR(
+                            f'{table}: {name} ({", ".join(columns)}) MISSING'
+                        ))
+
+        if missing:
+            raise CommandError(f'{missing} declared index(es) are missing; run "manage.py migrate"')
+        self.stdout.write(self.style.SUCCESS('All declared indexes exist'))
@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fitness.benchmarks import compare
+
+
+class Command(BaseCommand):
+    help = 'Compares two run_benchmarks result files and reports regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', help='Results from the baseline commit')
+        parser.add_argument('head', help='Results from the commit under test')
+        parser.add_argument(
+            '--threshold', type=float, default=10.0,
+            help='Allowed p50 latency increase in percent before it counts as a regression'
+        )
+
+    def handle(self, *args, **options):
+        with open(options['base']) as base_file, open(options['head']) as head_file:
+            base, head = json.load(base_file), json.load(head_file)
+
+        self.stdout.write(
+            f"base {base['environment'].get('commit')} -> head {head['environment'].get('commit')}"
+        )
+        regressions = 0
+        for scale, endpoint, base_result, head_result, regressed in compare(
+            base, head, options['threshold']
+        ):
+            label = f'{scale}/{endpoint}'
+            if base_result is None:
+                self.stdout.write(f"{label:<40} new: {head_result['p50_ms']:.2f} ms")
+                continue
+            change = (head_result['p50_ms'] / base_result['p50_ms'] - 1) * 100
+            line = (
+                f"{label:<40}{base_result['p50_ms']:>9.2f} ->{head_result['p50_ms']:>9.2f} ms "
+                f"({change:+.1f}%)  queries {base_result['queries']} -> {head_result['queries']}"
+            )
+            if regressed:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f'{regressions} benchmark(s) regressed')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
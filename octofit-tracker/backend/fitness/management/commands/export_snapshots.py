@@ -0,0 +1,45 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fitness import snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes closed months of ActivityLog and PerformanceMetric to columnar snapshot files; '
+        'months already exported are only rewritten if their rows changed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table', choices=sorted(snapshots.TABLES), action='append', dest='tables',
+            help='Only export this table (may be repeated)'
+        )
+        parser.add_argument(
+            '--before', help='Export months before this one (YYYY-MM); defaults to the current month'
+        )
+        parser.add_argument('--directory', help='Snapshot directory; defaults to OCTOFIT_SNAPSHOT_DIR')
+        parser.add_argument('--force', action='store_true', help='Rewrite every month')
+
+    def handle(self, *args, **options):
+        before = None
+        if options['before']:
+            try:
+                before = date.fromisoformat(f"{options['before']}-01")
+            except ValueError:
+                raise CommandError('--before must be a month in YYYY-MM format')
+
+        started = time.monotonic()
+        results = snapshots.export(
+            tables=options['tables'], before=before, directory=options['directory'], force=options['force']
+        )
+        written = [(table, month, rows) for table, month, rows, changed in results if changed]
+        for table, month, rows in written:
+            self.stdout.write(f'{table} {month:%Y-%m}: {rows} rows')
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(written)} snapshots ({sum(rows for _, _, rows in written)} rows) in '
+            f'{elapsed:.2f}s; {len(results) - len(written)} were already up to date'
+        ))
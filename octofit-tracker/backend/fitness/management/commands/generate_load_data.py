@@ -0,0 +1,91 @@
+import multiprocessing
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from fitness.loadgen import ensure_catalog, generate_school
+
+
+def _init_worker():
+    # Needed when processes are spawned rather than forked
+    django.setup()
+
+
+def _generate(kwargs):
+    return generate_school(**kwargs)
+
+
+class Command(BaseCommand):
+    help = 'Generates realistic synthetic schools, students and activity history for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--schools', type=int, default=1, help='Number of schools')
+        parser.add_argument('--students', type=int, default=100, help='Students per school')
+        parser.add_argument('--months', type=int, default=6, help='Months of history per student')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Worker processes; each generates whole schools (use 1 with sqlite)'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+        parser.add_argument(
+            '--prefix', default='load',
+            help='Username prefix, so several generated data sets can coexist'
+        )
+        parser.add_argument(
+            '--skip-rollups', action='store_true',
+            help='Do not build activity and metric rollups for the generated students'
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f'{prefix}_s').exists():
+            raise CommandError(f'Data with prefix "{prefix}" already exists; choose another --prefix')
+
+        catalog = ensure_catalog()
+        jobs = [
+            {
+                'school': school,
+                'students': options['students'],
+                'months': options['months'],
+                'seed': options['seed'],
+                'prefix': prefix,
+                'catalog': catalog,
+                'batch_size': options['batch_size'],
+                'build_rollups': not options['skip_rollups'],
+            }
+            for school in range(options['schools'])
+        ]
+
+        started = time.monotonic()
+        if options['workers'] > 1:
+            # Children must open their own database connections
+            connections.close_all()
+            with multiprocessing.Pool(options['workers'], initializer=_init_worker) as pool:
+                results = pool.imap_unordered(_generate, jobs)
+                totals = self.report(results)
+        else:
+            totals = self.report(map(_generate, jobs))
+        elapsed = time.monotonic() - started
+
+        rows = totals['activity_logs'] + totals['performance_metrics']
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {totals['students']} students, {totals['activity_logs']} activity logs and "
+            f"{totals['performance_metrics']} performance metrics in {elapsed:.1f}s "
+            f"({rows / elapsed:,.0f} rows/sec)"
+        ))
+
+    def report(self, results):
+        totals = {'students': 0, 'activity_logs': 0, 'performance_metrics': 0}
+        for number, result in enumerate(results, start=1):
+            for key in totals:
+                totals[key] += result[key]
+            rate = (result['activity_logs'] + result['performance_metrics']) / result['seconds']
+            self.stdout.write(
+                f"School {number}: {result['students']} students, {result['activity_logs']} logs, "
+                f"{result['performance_metrics']} metrics ({rate:,.0f} rows/sec)"
+            )
+        return totals
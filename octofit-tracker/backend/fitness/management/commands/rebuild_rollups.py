@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from fitness import trends
+from fitness.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the per-student activity and performance metric rollups from the full '
+        'ActivityLog and PerformanceMetric history'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--student', type=int, action='append', dest='student_ids',
+            help='Only rebuild rollups for this student id (may be repeated)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rollup rows written per insert'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        written = rebuild_rollups(
+            student_ids=options['student_ids'],
+            batch_size=options['batch_size'],
+        )
+        metric_written = trends.rebuild_rollups(
+            student_ids=options['student_ids'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} activity and {metric_written} metric rollup rows in {elapsed:.2f}s'
+        ))
@@ -0,0 +1,68 @@
+import os
+import socket
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fitness import jobs
+from fitness.models import Job
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes calories_burned of logged activities from the current exercise rates, '
+        'in batches that can be resumed after an interruption'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--exercise', type=int, action='append', dest='exercise_ids',
+            help='Only recalculate logs of this exercise id (may be repeated)'
+        )
+        parser.add_argument('--batch-size', type=int, default=2000, help='Logs read and written per batch')
+        parser.add_argument(
+            '--background', action='store_true',
+            help='Queue the recalculation for run_jobs instead of running it here'
+        )
+        parser.add_argument(
+            '--resume', type=int, metavar='JOB_ID',
+            help='Continue an interrupted recalculation from its last completed batch'
+        )
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            job = self.resumable_job(options['resume'])
+        else:
+            params = {'exercise_ids': options['exercise_ids'], 'batch_size': options['batch_size']}
+            job, _ = jobs.enqueue('recalculate_calories', params)
+            if options['background']:
+                self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk}'))
+                return
+
+        if not jobs.claim_job(job.pk, f'{socket.gethostname()}:{os.getpid()}'):
+            raise CommandError(f'Job {job.pk} is already being run by another worker')
+        self.stdout.write(f'Running job {job.pk}; if interrupted, continue with --resume {job.pk}')
+        try:
+            final_status = jobs.execute(job.pk)
+        except KeyboardInterrupt:
+            raise CommandError(f'Interrupted; continue with --resume {job.pk}')
+
+        job.refresh_from_db()
+        if final_status != Job.SUCCEEDED:
+            raise CommandError(f'{job.error}; continue with --resume {job.pk}')
+        result = job.result
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {result['scanned']} logs and updated {result['updated']} in "
+            f"{result['seconds']:.2f}s ({result['logs_per_second'] or 0:.0f} logs/s), "
+            f"then rebuilt {result.get('rollup_rows', 0)} rollup rows"
+        ))
+
+    def resumable_job(self, pk):
+        job = Job.objects.filter(pk=pk, kind='recalculate_calories').first()
+        if job is None:
+            raise CommandError(f'There is no calorie recalculation job {pk}')
+        if job.status == Job.SUCCEEDED:
+            raise CommandError(f'Job {pk} has already finished')
+        # Interrupted runs are left running or failed; queue the job so it can be claimed here
+        Job.objects.filter(pk=pk).update(status=Job.QUEUED, run_after=timezone.now(), locked_by='')
+        return job
@@ -0,0 +1,56 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from fitness.benchmarks import SCALES, benchmark_databases, environment, run_scale, seed
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database at several scales, benchmarks the REST API hot paths '
+        'and writes latency, query counts and allocations to a JSON file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', default='small,medium',
+            help=f"Comma-separated scales to run ({', '.join(SCALES)})"
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the data sets')
+        parser.add_argument(
+            '--output', default='benchmark-results.json', help='Where to write the JSON results'
+        )
+
+    def handle(self, *args, **options):
+        scales = [name.strip() for name in options['scales'].split(',') if name.strip()]
+        unknown = set(scales) - set(SCALES)
+        if unknown:
+            raise CommandError(f"Unknown scale(s): {', '.join(sorted(unknown))}")
+
+        report = {'environment': environment(), 'scales': {}}
+        setup_test_environment()
+        try:
+            for name in scales:
+                self.stdout.write(f'Seeding {name} data set...')
+                with benchmark_databases():
+                    seed(SCALES[name], random_seed=options['seed'])
+                    report['scales'][name] = run_scale(repeat=options['repeat'])
+                self.print_scale(name, report['scales'][name])
+        finally:
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def print_scale(self, name, results):
+        self.stdout.write(
+            f"{name:<28}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}{'alloc KiB':>11}"
+        )
+        for endpoint, result in results.items():
+            self.stdout.write(
+                f"  {endpoint:<26}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['queries']:>9}{result['alloc_kib']:>11.1f}"
+            )
@@ -0,0 +1,85 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand
+
+from fitness import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=2,
+            help='Worker processes; 0 runs jobs one at a time in this process'
+        )
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0, help='Seconds between checks for new jobs'
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=30 * 60,
+            help='Seconds without progress after which a running job is retried'
+        )
+
+    def handle(self, *args, **options):
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.options = options
+        self.stdout.write(f"Worker {self.worker} started with {options['processes']} processes")
+        try:
+            if options['processes'] > 0:
+                self.run_pool(options['processes'])
+            else:
+                self.run_inline()
+        except KeyboardInterrupt:
+            # Jobs still running are picked up again once they go stale
+            self.stdout.write('Stopping')
+
+    def requeue_stale(self):
+        requeued = jobs.requeue_stale(self.options['stale_after'])
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+
+    def report(self, pk, final_status):
+        style = self.style.SUCCESS if final_status == 'succeeded' else self.style.WARNING
+        self.stdout.write(style(f'Job {pk}: {final_status}'))
+
+    def run_inline(self):
+        while True:
+            self.requeue_stale()
+            claimed = jobs.claim(self.worker)
+            if claimed:
+                self.report(claimed[0], jobs.execute(claimed[0]))
+            elif self.options['once']:
+                return
+            else:
+                time.sleep(self.options['poll_interval'])
+
+    def run_pool(self, processes):
+        # Spawned processes start clean and open their own database connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(processes, mp_context=context, initializer=django.setup) as pool:
+            running = {}
+            while True:
+                self.requeue_stale()
+                for pk in jobs.claim(self.worker, limit=processes - len(running)):
+                    running[pool.submit(jobs.execute, pk)] = pk
+                if not running:
+                    if self.options['once']:
+                        return
+                    time.sleep(self.options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=self.options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    pk = running.pop(future)
+                    try:
+                        self.report(pk, future.result())
+                    except Exception as error:
+                        # The process died; the job goes stale and is retried
+                        self.stderr.write(f'Job {pk}: worker process failed ({error})')
@@ -0,0 +1,169 @@
+"""
+Per-request timing and query accounting, aggregated per route.
+
+Aggregates live in process memory, so with several worker processes each
+one reports its own share of the traffic.
+"""
+import contextvars
+import threading
+import time
+from collections import Counter
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, float('inf')]
+
+
+class RequestMetrics:
+    """
+    Collects database and serialization timings for a single request.
+
+    While a request is active every query on any connection passes through
+    ``__call__``, including queries that async views run on worker threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.statements = []
+        self._serialize_mark = None
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.db_time += elapsed
+                self.queries += 1
+                self.statements.append(sql)
+
+    def start_serialization(self):
+        if self._serialize_mark is None:
+            self._serialize_mark = (time.perf_counter(), self.db_time)
+
+    def end_serialization(self):
+        """Close the serialization span, leaving out queries run during it"""
+        if self._serialize_mark is not None:
+            started, db_time = self._serialize_mark
+            elapsed = time.perf_counter() - started
+            self.serialize_time += elapsed - (self.db_time - db_time)
+            self._serialize_mark = None
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def end_render(self):
+        if self._render_started is not None:
+            self.render_time += time.perf_counter() - self._render_started
+            self._render_started = None
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.started
+
+    def duplicated_statements(self):
+        """Statements executed more than once, most repeated first"""
+        return [
+            (statement, count)
+            for statement, count in Counter(self.statements).most_common()
+            if count > 1
+        ]
+
+    def server_timing(self, total_time):
+        return ', '.join([
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.2f}',
+            f'serialize;dur={(self.serialize_time + self.render_time) * 1000:.2f}',
+            f'total;dur={total_time * 1000:.2f}',
+        ])
+
+
+class RouteStats:
+    """Running totals and a latency histogram for one route"""
+
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.db_ms = 0.0
+        self.serialize_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+    def add(self, metrics, total_time):
+        total_ms = total_time * 1000
+        self.requests += 1
+        self.total_ms += total_ms
+        self.db_ms += metrics.db_time * 1000
+        self.serialize_ms += (metrics.serialize_time + metrics.render_time) * 1000
+        self.queries += metrics.queries
+        self.max_queries = max(self.max_queries, metrics.queries)
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if total_ms <= bound:
+                self.buckets[index] += 1
+                break
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'mean_total_ms': round(self.total_ms / self.requests, 3),
+            'mean_db_ms': round(self.db_ms / self.requests, 3),
+            'mean_serialize_ms': round(self.serialize_ms / self.requests, 3),
+            'mean_queries': round(self.queries / self.requests, 2),
+            'max_queries': self.max_queries,
+            'latency_histogram_ms': {
+                ('+Inf' if bound == float('inf') else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def activate(request_metrics):
+    """Attribute queries in this context to ``request_metrics``; returns a reset token"""
+    return _current.set(request_metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    # The context variable follows the request into sync_to_async threads
+    request_metrics = _current.get()
+    if request_metrics is None:
+        return execute(sql, params, many, context)
+    return request_metrics(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(connection):
+    """Add the request metrics wrapper to a database connection, once"""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+_lock = threading.Lock()
+_routes = {}
+
+
+def record(route, metrics, total_time):
+    with _lock:
+        _routes.setdefault(route, RouteStats()).add(metrics, total_time)
+
+
+def snapshot():
+    """Return the aggregated stats for every route seen so far"""
+    with _lock:
+        return {route: stats.as_dict() for route, stats in sorted(_routes.items())}
+
+
+def reset():
+    with _lock:
+        _routes.clear()
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger('fitness.performance')
+
+
+class RequestMetricsMiddleware:
+    """
+    Measure query count, DB time, serialization time and total time per request.
+
+    The numbers are sent back in a ``Server-Timing`` header, aggregated per
+    route name for the metrics endpoint, and requests that exceed
+    ``OCTOFIT_QUERY_BUDGET`` queries are logged with their repeated statements.
+    Works under WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Let Django see the instance as a coroutine function, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        request_metrics = metrics.RequestMetrics()
+        request.metrics = request_metrics
+        token = metrics.activate(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, request_metrics, response)
+
+    async def __acall__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        request.metrics = request_metrics
+        token = metrics.activate(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.deactivate(token)
+        return self.finish(request, request_metrics, response)
+
+    def finish(self, request, request_metrics, response):
+        total_time = request_metrics.total_time
+
+        response['Server-Timing'] = request_metrics.server_timing(total_time)
+        route = self.route_name(request)
+        metrics.record(route, request_metrics, total_time)
+
+        budget = getattr(settings, 'OCTOFIT_QUERY_BUDGET', None)
+        if budget is not None and request_metrics.queries > budget:
+            duplicates = '\n'.join(
+                f'  {count}x {statement}'
+                for statement, count in request_metrics.duplicated_statements()[:10]
+            )
+            logger.warning(
+                '%s %s (%s) ran %d queries, over the budget of %d. Repeated statements:\n%s',
+                request.method, request.path, route, request_metrics.queries, budget,
+                duplicates or '  (none)'
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # The view has returned; rendering (JSON encoding) happens next
+        request_metrics = getattr(request, 'metrics', None)
+        if request_metrics is not None:
+            request_metrics.end_serialization()
+            request_metrics.start_render()
+            response.add_post_render_callback(lambda rendered: request_metrics.end_render())
+        return response
+
+    @staticmethod
+    def route_name(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unresolved'
+        return match.view_name or match.route
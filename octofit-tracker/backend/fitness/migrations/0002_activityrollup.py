@@ -0,0 +1,31 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('category', models.CharField(max_length=50)),
+                ('activity_count', models.IntegerField(default=0)),
+                ('total_minutes', models.IntegerField(default=0)),
+                ('total_calories', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_rollups', to='fitness.student')),
+            ],
+            options={
+                'ordering': ['student', 'period', '-period_start'],
+                'unique_together': {('student', 'period', 'period_start', 'category')},
+            },
+        ),
+    ]
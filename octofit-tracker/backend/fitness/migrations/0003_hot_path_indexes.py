@@ -0,0 +1,25 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0002_activityrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['student', '-date', '-logged_at'], name='fitness_log_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentworkoutplan',
+            index=models.Index(fields=['student', 'status'], name='fitness_swp_student_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutplanexercise',
+            index=models.Index(fields=['workout_plan', 'order'], name='fitness_wpe_plan_order_idx'),
+        ),
+    ]
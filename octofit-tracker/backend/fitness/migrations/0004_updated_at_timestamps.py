@@ -0,0 +1,39 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='performancemetric',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='studentworkoutplan',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
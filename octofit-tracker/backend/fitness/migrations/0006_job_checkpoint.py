@@ -0,0 +1,19 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:53
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0005_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='checkpoint',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
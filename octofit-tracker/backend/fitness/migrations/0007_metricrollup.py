@@ -0,0 +1,40 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0006_job_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('sample_count', models.IntegerField(default=0)),
+                ('fitness_score_sum', models.IntegerField(default=0)),
+                ('fitness_score_samples', models.IntegerField(default=0)),
+                ('weight_kg_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('weight_kg_samples', models.IntegerField(default=0)),
+                ('pushups_count_sum', models.IntegerField(default=0)),
+                ('pushups_count_samples', models.IntegerField(default=0)),
+                ('situps_count_sum', models.IntegerField(default=0)),
+                ('situps_count_samples', models.IntegerField(default=0)),
+                ('mile_time_seconds_sum', models.IntegerField(default=0)),
+                ('mile_time_seconds_samples', models.IntegerField(default=0)),
+                ('flexibility_cm_sum', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('flexibility_cm_samples', models.IntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='metric_rollups', to='fitness.student')),
+            ],
+            options={
+                'ordering': ['student', 'period', 'period_start'],
+                'unique_together': {('student', 'period', 'period_start')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0007_metricrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedActivityLog',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('duration_minutes', models.IntegerField()),
+                ('intensity', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High')], max_length=20)),
+                ('calories_burned', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('notes', models.TextField(blank=True)),
+                ('logged_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='fitness.exercise')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_activity_logs', to='fitness.student')),
+                ('workout_plan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='fitness.workoutplan')),
+            ],
+            options={
+                'ordering': ['-date', '-logged_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedactivitylog',
+            index=models.Index(fields=['date'], name='fitness_archive_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedactivitylog',
+            index=models.Index(fields=['student', '-date'], name='fitness_archive_student_idx'),
+        ),
+    ]
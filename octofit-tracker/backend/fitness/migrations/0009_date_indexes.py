@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitness', '0008_archivedactivitylog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['date'], name='fitness_log_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='performancemetric',
+            index=models.Index(fields=['date'], name='fitness_metric_date_idx'),
+        ),
+    ]
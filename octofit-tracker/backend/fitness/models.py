@@ -1,6 +1,14 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
 
 
 class Student(models.Model):
@@ -34,6 +42,7 @@ class Teacher(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='teacher_profile')
     department = models.CharField(max_length=100, default='Physical Education')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"Teacher: {self.user.get_full_name()}"
@@ -80,7 +89,8 @@ class Exercise(models.Model):
         ]
     )
     calories_per_minute = models.DecimalField(max_digits=5, decimal_places=2, default=5.0)
-    
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"{self.name} ({self.category})"
 
@@ -103,6 +113,9 @@ class WorkoutPlanExercise(models.Model):
 
     class Meta:
         ordering = ['workout_plan', 'order']
+        indexes = [
+            models.Index(fields=['workout_plan', 'order'], name='fitness_wpe_plan_order_idx'),
+        ]
 
 
 class StudentWorkoutPlan(models.Model):
@@ -122,12 +135,16 @@ class StudentWorkoutPlan(models.Model):
         default='active'
     )
     assigned_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.workout_plan.title}"
 
     class Meta:
         ordering = ['-assigned_at']
+        indexes = [
+            models.Index(fields=['student', 'status'], name='fitness_swp_student_status_idx'),
+        ]
 
 
 class ActivityLog(models.Model):
@@ -149,12 +166,22 @@ class ActivityLog(models.Model):
     calories_burned = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
     notes = models.TextField(blank=True)
     logged_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    INTENSITY_MULTIPLIERS = {'low': 0.8, 'medium': 1.0, 'high': 1.3}
+
+    @classmethod
+    def calculate_calories(cls, calories_per_minute, duration_minutes, intensity):
+        """Estimate calories burned from the exercise rate, duration and intensity"""
+        intensity_multiplier = cls.INTENSITY_MULTIPLIERS.get(intensity, 1.0)
+        return float(calories_per_minute) * duration_minutes * intensity_multiplier
 
     def save(self, *args, **kwargs):
         # Auto-calculate calories if not provided
         if not self.calories_burned and self.exercise:
-            intensity_multiplier = {'low': 0.8, 'medium': 1.0, 'high': 1.3}.get(self.intensity, 1.0)
-            self.calories_burned = float(self.exercise.calories_per_minute) * self.duration_minutes * intensity_multiplier
+            self.calories_burned = self.calculate_calories(
+                self.exercise.calories_per_minute, self.duration_minutes, self.intensity
+            )
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -162,6 +189,44 @@ class ActivityLog(models.Model):
 
     class Meta:
         ordering = ['-date', '-logged_at']
+        indexes = [
+            models.Index(fields=['student', '-date', '-logged_at'], name='fitness_log_student_date_idx'),
+            # Date ranges across all students: admin date navigation, exports and archival
+            models.Index(fields=['date'], name='fitness_log_date_idx'),
+        ]
+
+
+class ArchivedActivityLog(models.Model):
+    """An ActivityLog moved out of the live table; rollups still count it"""
+    # The live log's id, kept so archived and live rows never collide
+    id = models.BigIntegerField(primary_key=True)
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='archived_activity_logs')
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name='+')
+    workout_plan = models.ForeignKey(
+        WorkoutPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='+'
+    )
+    date = models.DateField()
+    duration_minutes = models.IntegerField()
+    intensity = models.CharField(max_length=20, choices=[
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+    ])
+    calories_burned = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    notes = models.TextField(blank=True)
+    logged_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.student_id} - {self.exercise_id} on {self.date} (archived)"
+
+    class Meta:
+        ordering = ['-date', '-logged_at']
+        indexes = [
+            models.Index(fields=['date'], name='fitness_archive_date_idx'),
+            models.Index(fields=['student', '-date'], name='fitness_archive_student_idx'),
+        ]
 
 
 class PerformanceMetric(models.Model):
@@ -185,10 +250,118 @@ class PerformanceMetric(models.Model):
     notes = models.TextField(blank=True)
     recorded_by = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.date}"
 
     class Meta:
         ordering = ['-date']
+        # Also serves as the (student, date) index for per-student lookups
         unique_together = ['student', 'date']
+        indexes = [
+            models.Index(fields=['date'], name='fitness_metric_date_idx'),
+        ]
+
+
+class ActivityRollup(models.Model):
+    """Pre-aggregated activity totals per student, period and exercise category"""
+    PERIOD_CHOICES = [
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='activity_rollups')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    category = models.CharField(max_length=50)
+    activity_count = models.IntegerField(default=0)
+    total_minutes = models.IntegerField(default=0)
+    total_calories = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.student_id} - {self.period} {self.period_start} ({self.category})"
+
+    class Meta:
+        ordering = ['student', 'period', '-period_start']
+        unique_together = ['student', 'period', 'period_start', 'category']
+
+
+class MetricRollup(models.Model):
+    """Pre-aggregated performance metric sums per student and period, for trend charts"""
+    PERIOD_CHOICES = [
+        ('week', 'Week'),
+        ('month', 'Month'),
+    ]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='metric_rollups')
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+    sample_count = models.IntegerField(default=0)
+    # Each metric is optional, so every sum has its own count of recorded values
+    fitness_score_sum = models.IntegerField(default=0)
+    fitness_score_samples = models.IntegerField(default=0)
+    weight_kg_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    weight_kg_samples = models.IntegerField(default=0)
+    pushups_count_sum = models.IntegerField(default=0)
+    pushups_count_samples = models.IntegerField(default=0)
+    situps_count_sum = models.IntegerField(default=0)
+    situps_count_samples = models.IntegerField(default=0)
+    mile_time_seconds_sum = models.IntegerField(default=0)
+    mile_time_seconds_samples = models.IntegerField(default=0)
+    flexibility_cm_sum = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    flexibility_cm_samples = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.student_id} - {self.period} {self.period_start}"
+
+    class Meta:
+        ordering = ['student', 'period', 'period_start']
+        unique_together = ['student', 'period', 'period_start']
+
+
+class Job(models.Model):
+    """A unit of background work, queued in the database and run by ``manage.py run_jobs``"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    # Always set, so the unique index never has to hold more than one null
+    idempotency_key = models.CharField(max_length=100, unique=True, default=new_idempotency_key)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3, validators=[MinValueValidator(1)])
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    progress_current = models.IntegerField(default=0)
+    progress_total = models.IntegerField(null=True, blank=True)
+    progress_message = models.CharField(max_length=200, blank=True)
+    # Where a resumable job got to, so a retry can continue from there
+    checkpoint = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='fitness_job_status_run_idx'),
+        ]
@@ -0,0 +1,153 @@
+"""
+Pagination classes for the fitness API.
+
+Small catalog tables use page numbers. The append-heavy ActivityLog and
+PerformanceMetric tables use keyset cursors over their full ordering, so
+fetching a deep page costs the same as fetching the first one.
+"""
+import json
+from base64 import b64decode, b64encode
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class StandardPagination(PageNumberPagination):
+    """Page number pagination with a client-selectable, bounded page size"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Cursor pagination over a composite ordering.
+
+    Unlike DRF's CursorPagination, which only keys on the first ordering
+    field and skips ties with an offset, the cursor here stores the values
+    of every ordering field of the boundary row, so each page is a single
+    range scan no matter how many rows share a date.
+    """
+    ordering = ('-id',)
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        cursor = b64encode(payload.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(b64decode(cursor.encode('ascii')).decode('ascii'))
+            if len(payload['p']) != len(self.ordering):
+                raise ValueError(cursor)
+            values = [
+                model._meta.get_field(name.lstrip('-')).to_python(value)
+                for name, value in zip(self.ordering, payload['p'])
+            ]
+            return values, bool(payload['r'])
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def position_filter(self, values, reverse):
+        """Build ``(a, b, c) > (x, y, z)`` in the direction of each ordering field"""
+        clauses = []
+        for index, name in enumerate(self.ordering):
+            field = name.lstrip('-')
+            descending = name.startswith('-') != reverse
+            clause = {f'{field}__{"lt" if descending else "gt"}': values[index]}
+            for previous, value in zip(self.ordering[:index], values):
+                clause[previous.lstrip('-')] = value
+            clauses.append(Q(**clause))
+        return reduce(or_, clauses)
+
+    def position(self, obj):
+        # Rows are model instances, or dicts when read with .values()
+        position = []
+        for name in self.ordering:
+            field = name.lstrip('-')
+            value = obj[field] if isinstance(obj, dict) else getattr(obj, field)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        values, reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [name[1:] if name.startswith('-') else f'-{name}' for name in ordering]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.position_filter(values, reverse))
+
+        # Fetch one extra row to learn whether another page follows
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results:
+            if has_more or reverse:
+                self.next_position = self.position(results[-1])
+            if values is not None and (has_more or not reverse):
+                self.previous_position = self.position(results[0])
+        return results
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class ActivityLogCursorPagination(KeysetCursorPagination):
+    ordering = ('-date', '-logged_at', '-id')
+
+
+class PerformanceMetricCursorPagination(KeysetCursorPagination):
+    ordering = ('-date', '-id')
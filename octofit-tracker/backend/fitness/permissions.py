@@ -0,0 +1,9 @@
+from rest_framework.permissions import BasePermission
+
+
+class IsTeacher(BasePermission):
+    """Allows access only to users with a teacher profile"""
+    message = 'Only teachers can do this'
+
+    def has_permission(self, request, view):
+        return hasattr(request.user, 'teacher_profile')
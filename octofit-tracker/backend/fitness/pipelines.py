@@ -0,0 +1,134 @@
+"""
+Native MongoDB aggregation pipelines for the heavy analytic reads.
+
+djongo answers ORM aggregations by parsing the SQL Django generates and
+translating it into MongoDB commands, which costs a parse per query and
+does not cover every construct (joins through ``student__grade``, for
+one). With ``OCTOFIT_NATIVE_AGGREGATION`` on and a djongo database, the
+dashboard totals, leaderboards and class analytics run the pipelines here
+directly on the collections with pymongo instead. Each function returns
+exactly what the ORM query it replaces returns, so callers do not care
+which path answered.
+
+djongo stores dates as midnight ``datetime`` values and decimals as
+``Decimal128``; both are converted on the way in and out.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from . import rollups
+from .models import ActivityRollup, PerformanceMetric, Student
+
+ROLLUP_COLUMNS = {
+    'calories': 'total_calories',
+    'minutes': 'total_minutes',
+}
+
+
+def enabled(using=DEFAULT_DB_ALIAS):
+    """True when reads on ``using`` should go through the native pipelines"""
+    return getattr(settings, 'OCTOFIT_NATIVE_AGGREGATION', True) and connections[using].vendor == 'djongo'
+
+
+def collection(model, using=DEFAULT_DB_ALIAS):
+    """The pymongo collection behind ``model``"""
+    connection = connections[using]
+    connection.ensure_connection()
+    return connection.connection[model._meta.db_table]
+
+
+def _date(value, using):
+    return connections[using].ops.adapt_datefield_value(value)
+
+
+def _number(value):
+    # bson.Decimal128, which Decimal() does not accept
+    return value.to_decimal() if hasattr(value, 'to_decimal') else value
+
+
+def _calories(value):
+    return None if value is None else rollups.to_calories(_number(value))
+
+
+def _rollup_match(window, start, using):
+    # Weeks and months are single rollup rows; a term spans several months
+    match = {'period': 'week' if window == 'week' else 'month'}
+    match['period_start'] = {'$gte': _date(start, using)} if window == 'term' else _date(start, using)
+    return match
+
+
+def _grade_match(match, grade, using):
+    if grade is not None:
+        # Resolved here rather than with a $lookup, one indexed query on a small table
+        match['student_id'] = {
+            '$in': list(Student.objects.using(using).filter(grade=grade).values_list('pk', flat=True))
+        }
+    return match
+
+
+def dashboard_totals(student_id, using=DEFAULT_DB_ALIAS):
+    """All-time activity totals of a student from the monthly rollups"""
+    rows = list(collection(ActivityRollup, using).aggregate([
+        {'$match': {'student_id': student_id, 'period': 'month'}},
+        {'$group': {
+            '_id': None,
+            'rows': {'$sum': 1},
+            'total_activities': {'$sum': '$activity_count'},
+            'total_calories': {'$sum': '$total_calories'},
+            'total_minutes': {'$sum': '$total_minutes'},
+        }},
+    ]))
+    if not rows or not rows[0]['rows']:
+        # Sum() over no rows is None
+        return {'total_activities': None, 'total_calories': None, 'total_minutes': None}
+    return {
+        'total_activities': rows[0]['total_activities'],
+        'total_calories': _calories(rows[0]['total_calories']),
+        'total_minutes': rows[0]['total_minutes'],
+    }
+
+
+def leaderboard_scores(metric, window, start, grade=None, using=DEFAULT_DB_ALIAS):
+    """``(student_id, value)`` pairs for every student scoring in the window, best first"""
+    if metric == 'fitness_score':
+        model = PerformanceMetric
+        match = {'date': {'$gte': _date(start, using)}, 'fitness_score': {'$ne': None}}
+        value = {'$max': '$fitness_score'}
+    else:
+        model = ActivityRollup
+        match = _rollup_match(window, start, using)
+        value = {'$sum': f'${ROLLUP_COLUMNS[metric]}'}
+
+    rows = collection(model, using).aggregate([
+        {'$match': _grade_match(match, grade, using)},
+        {'$group': {'_id': '$student_id', 'value': value}},
+        {'$sort': {'value': -1, '_id': 1}},
+    ])
+    if metric == 'calories':
+        return [(row['_id'], _calories(row['value'])) for row in rows]
+    return [(row['_id'], row['value']) for row in rows]
+
+
+def student_activity_totals(window, start, using=DEFAULT_DB_ALIAS):
+    """``(student_id, activities, calories, minutes)`` per student active in the window"""
+    rows = collection(ActivityRollup, using).aggregate([
+        {'$match': _rollup_match(window, start, using)},
+        {'$group': {
+            '_id': '$student_id',
+            'count': {'$sum': '$activity_count'},
+            'calories': {'$sum': '$total_calories'},
+            'minutes': {'$sum': '$total_minutes'},
+        }},
+    ])
+    return [(row['_id'], row['count'], _calories(row['calories']), row['minutes']) for row in rows]
+
+
+def latest_fitness_scores(start, using=DEFAULT_DB_ALIAS):
+    """``(student_id, fitness_score)`` of each student's latest assessment since ``start``"""
+    # One row per student and day, so date order picks a single latest score
+    rows = collection(PerformanceMetric, using).aggregate([
+        {'$match': {'date': {'$gte': _date(start, using)}, 'fitness_score': {'$ne': None}}},
+        {'$sort': {'date': 1}},
+        {'$group': {'_id': '$student_id', 'fitness_score': {'$last': '$fitness_score'}}},
+    ])
+    return [(row['_id'], row['fitness_score']) for row in rows]
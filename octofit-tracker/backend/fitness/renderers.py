@@ -0,0 +1,39 @@
+import re
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Renders compact JSON with orjson when it is installed.
+
+    The output is byte for byte what ``JSONRenderer`` produces: dates, times
+    and any type orjson does not handle itself go through DRF's encoder, and
+    indented or ASCII-only output, as well as output with floats in exponent
+    notation, is left to ``JSONRenderer``.
+    """
+    _encoder = encoders.JSONEncoder()
+    # orjson writes 1e16 and 1e-7 where json writes 1e+16 and 1e-07
+    _float_exponent = re.compile(rb'[0-9]e[-0-9]')
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self._encoder.default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            # Non-string keys, oversized integers and the like
+            return super().render(data, accepted_media_type, renderer_context)
+        if self._float_exponent.search(content):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same JavaScript-safe escaping as JSONRenderer
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,223 @@
+"""
+Incremental maintenance of ActivityRollup rows.
+
+Every ActivityLog contributes to one rollup row per period (day, week and
+month) for its student and exercise category. Writes apply signed deltas to
+those rows so reads never need to scan a student's full history; the rows a
+write touches are read, locked and written back in bulk.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import ActivityLog, ActivityRollup, ArchivedActivityLog
+
+PERIODS = [period for period, _ in ActivityRollup.PERIOD_CHOICES]
+
+_calories_field = ActivityLog._meta.get_field('calories_burned')
+_date_field = ActivityLog._meta.get_field('date')
+_CENT = Decimal('0.01')
+
+
+def period_start(period, day):
+    """Return the first day of the period containing ``day``"""
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+def to_calories(value):
+    """Normalise a calories value the same way the database column stores it"""
+    if value is None:
+        return Decimal('0.00')
+    return _calories_field.to_python(value).quantize(_CENT)
+
+
+def collect_deltas(rows, sign=1, deltas=None):
+    """
+    Accumulate signed rollup deltas for ``rows``.
+
+    Each row is a mapping with ``student_id``, ``category``, ``date``,
+    ``duration_minutes`` and ``calories_burned``.
+    """
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0, Decimal('0.00')])
+    for row in rows:
+        calories = to_calories(row['calories_burned'])
+        for period in PERIODS:
+            key = (row['student_id'], period, period_start(period, row['date']), row['category'])
+            delta = deltas[key]
+            delta[0] += sign
+            delta[1] += sign * row['duration_minutes']
+            delta[2] += sign * calories
+    return deltas
+
+
+ROLLUP_KEY = ['student_id', 'period', 'period_start', 'category']
+ROLLUP_TOTALS = ['activity_count', 'total_minutes', 'total_calories']
+
+
+def _rollup_key(rollup):
+    return tuple(getattr(rollup, name) for name in ROLLUP_KEY)
+
+
+def _existing_rollups(keys):
+    """The stored rollups for ``keys``, read and locked with one query"""
+    starts = [start for _, _, start, _ in keys]
+    # Bounded by the students, dates and categories involved, then narrowed to the exact keys
+    candidates = ActivityRollup.objects.filter(
+        student_id__in={student_id for student_id, _, _, _ in keys},
+        period_start__gte=min(starts),
+        period_start__lte=max(starts),
+        category__in={category for _, _, _, category in keys},
+    ).order_by().select_for_update()
+    rollups = {_rollup_key(rollup): rollup for rollup in candidates}
+    return {key: rollup for key, rollup in rollups.items() if key in keys}
+
+
+def _apply_delta(lookup, count, minutes, calories):
+    """Apply one key's delta with atomic F() updates"""
+    changes = {
+        'activity_count': F('activity_count') + count,
+        'total_minutes': F('total_minutes') + minutes,
+        'total_calories': F('total_calories') + calories,
+    }
+    if ActivityRollup.objects.filter(**lookup).update(**changes) or count <= 0:
+        return
+    try:
+        with transaction.atomic():
+            ActivityRollup.objects.create(
+                activity_count=count, total_minutes=minutes, total_calories=calories, **lookup
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        ActivityRollup.objects.filter(**lookup).update(**changes)
+
+
+def apply_deltas(deltas, batch_size=1000):
+    """
+    Apply accumulated deltas to the rollup table.
+
+    The stored rows for every key are read in one query, then written back
+    with one bulk update and one bulk insert, so the number of queries does
+    not grow with the number of keys.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    with transaction.atomic():
+        existing = _existing_rollups(deltas)
+        updated = []
+        created = []
+        for key, (count, minutes, calories) in deltas.items():
+            rollup = existing.get(key)
+            if rollup is not None:
+                rollup.activity_count += count
+                rollup.total_minutes += minutes
+                rollup.total_calories += calories
+                updated.append(rollup)
+            elif count > 0:
+                # Removals never create rows; the student may be mid-deletion
+                created.append(ActivityRollup(
+                    activity_count=count,
+                    total_minutes=minutes,
+                    total_calories=calories,
+                    **dict(zip(ROLLUP_KEY, key))
+                ))
+        ActivityRollup.objects.bulk_update(updated, ROLLUP_TOTALS, batch_size=batch_size)
+        try:
+            with transaction.atomic():
+                ActivityRollup.objects.bulk_create(created, batch_size=batch_size)
+        except IntegrityError:
+            # Another writer created some of the rows first; apply those keys one at a time
+            for rollup in created:
+                key = _rollup_key(rollup)
+                _apply_delta(dict(zip(ROLLUP_KEY, key)), *deltas[key])
+
+
+def log_row(log):
+    """Build a delta row from an ActivityLog instance"""
+    return {
+        'student_id': log.student_id,
+        'category': log.exercise.category,
+        # Instances may still hold raw assigned values such as ISO date strings
+        'date': _date_field.to_python(log.date),
+        'duration_minutes': int(log.duration_minutes),
+        'calories_burned': log.calories_burned,
+    }
+
+
+def stored_log_row(pk):
+    """Fetch the currently stored delta row for an ActivityLog, if any"""
+    return ActivityLog.objects.filter(pk=pk).values(
+        'student_id', 'date', 'duration_minutes', 'calories_burned',
+        category=F('exercise__category'),
+    ).first()
+
+
+def rebuild_rollups(student_ids=None, batch_size=1000):
+    """
+    Recompute rollups from live and archived logs, optionally for a subset of students.
+
+    Returns the number of rollup rows written.
+    """
+    rollups = ActivityRollup.objects.all()
+    if student_ids is not None:
+        rollups = rollups.filter(student_id__in=student_ids)
+
+    totals = defaultdict(lambda: [0, 0, Decimal('0.00')])
+    # Archived logs still count, so the rebuild reads both tables
+    for model in (ActivityLog, ArchivedActivityLog):
+        logs = model.objects.all()
+        if student_ids is not None:
+            logs = logs.filter(student_id__in=student_ids)
+        daily = logs.order_by().values(
+            'student_id', 'date', category=F('exercise__category'),
+        ).annotate(
+            day_count=Count('id'),
+            day_minutes=Sum('duration_minutes'),
+            day_calories=Sum('calories_burned'),
+        )
+        for row in daily.iterator():
+            for period in PERIODS:
+                key = (row['student_id'], period, period_start(period, row['date']), row['category'])
+                total = totals[key]
+                total[0] += row['day_count']
+                total[1] += row['day_minutes'] or 0
+                total[2] += to_calories(row['day_calories'])
+
+    with transaction.atomic():
+        rollups.delete()
+        insert_rollups(totals, batch_size=batch_size)
+    return len(totals)
+
+
+def insert_rollups(totals, batch_size=1000):
+    """
+    Bulk insert accumulated totals as new rollup rows.
+
+    Only valid when none of the keys exist yet, e.g. for freshly created
+    students or after their rollups were deleted.
+    """
+    ActivityRollup.objects.bulk_create(
+        (
+            ActivityRollup(
+                student_id=student_id,
+                period=period,
+                period_start=start,
+                category=category,
+                activity_count=count,
+                total_minutes=minutes,
+                total_calories=calories,
+            )
+            for (student_id, period, start, category), (count, minutes, calories) in totals.items()
+        ),
+        batch_size=batch_size,
+    )
@@ -1,11 +1,63 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count, Prefetch
+from . import jobs
 from .models import (
     Student, Teacher, WorkoutPlan, Exercise, WorkoutPlanExercise,
-    StudentWorkoutPlan, ActivityLog, PerformanceMetric
+    StudentWorkoutPlan, ActivityLog, PerformanceMetric, Job
 )
 
 
+def join_full_name(first_name, last_name):
+    """``User.get_full_name()`` for rows read with ``.values()``"""
+    return f'{first_name} {last_name}'.strip()
+
+
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it reads so that views can load
+    them up front instead of issuing one query per row.
+    """
+    select_related_fields = []
+    prefetch_related_fields = []
+
+    @classmethod
+    def get_prefetch_related_fields(cls):
+        return list(cls.prefetch_related_fields)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        prefetch_related_fields = cls.get_prefetch_related_fields()
+        if prefetch_related_fields:
+            queryset = queryset.prefetch_related(*prefetch_related_fields)
+        return queryset
+
+
+class DynamicFieldsMixin:
+    """
+    Sparse fieldsets for read responses.
+
+    ``fields`` limits the top-level fields that are rendered. ``expand`` names
+    the nested relations to render in full; any other relation listed in
+    ``expandable_fields`` collapses to its primary key(s).
+    """
+    expandable_fields = []
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is not None:
+            for name in self.expandable_fields:
+                if name in expand or name not in self.fields:
+                    continue
+                many = isinstance(self.fields[name], serializers.ListSerializer)
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -13,10 +65,14 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     full_name = serializers.SerializerMethodField()
 
+    select_related_fields = ['user']
+    expandable_fields = ['user']
+    values_method_fields = {'full_name': (['user__first_name', 'user__last_name'], join_full_name)}
+
     class Meta:
         model = Student
         fields = ['id', 'user', 'full_name', 'grade', 'age', 'height_cm', 
@@ -65,10 +121,14 @@ class StudentRegistrationSerializer(serializers.Serializer):
         return student
 
 
-class TeacherSerializer(serializers.ModelSerializer):
+class TeacherSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     full_name = serializers.SerializerMethodField()
 
+    select_related_fields = ['user']
+    expandable_fields = ['user']
+    values_method_fields = {'full_name': (['user__first_name', 'user__last_name'], join_full_name)}
+
     class Meta:
         model = Teacher
         fields = ['id', 'user', 'full_name', 'department', 'created_at']
@@ -78,14 +138,14 @@ class TeacherSerializer(serializers.ModelSerializer):
         return obj.user.get_full_name()
 
 
-class ExerciseSerializer(serializers.ModelSerializer):
+class ExerciseSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Exercise
         fields = ['id', 'name', 'description', 'category', 'calories_per_minute']
         read_only_fields = ['id']
 
 
-class WorkoutPlanExerciseSerializer(serializers.ModelSerializer):
+class WorkoutPlanExerciseSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     exercise = ExerciseSerializer(read_only=True)
     exercise_id = serializers.PrimaryKeyRelatedField(
         queryset=Exercise.objects.all(),
@@ -93,6 +153,9 @@ class WorkoutPlanExerciseSerializer(serializers.ModelSerializer):
         write_only=True
     )
 
+    select_related_fields = ['exercise']
+    expandable_fields = ['exercise']
+
     class Meta:
         model = WorkoutPlanExercise
         fields = ['id', 'exercise', 'exercise_id', 'sets', 'reps', 
@@ -100,11 +163,14 @@ class WorkoutPlanExerciseSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class WorkoutPlanSerializer(serializers.ModelSerializer):
+class WorkoutPlanSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     created_by = TeacherSerializer(read_only=True)
     exercises = WorkoutPlanExerciseSerializer(many=True, read_only=True)
     exercise_count = serializers.SerializerMethodField()
 
+    select_related_fields = ['created_by__user']
+    expandable_fields = ['created_by', 'exercises']
+
     class Meta:
         model = WorkoutPlan
         fields = ['id', 'title', 'description', 'created_by', 'difficulty_level',
@@ -112,15 +178,47 @@ class WorkoutPlanSerializer(serializers.ModelSerializer):
                   'created_at', 'updated_at']
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    @classmethod
+    def get_prefetch_related_fields(cls):
+        return [Prefetch(
+            'exercises',
+            queryset=WorkoutPlanExerciseSerializer.setup_eager_loading(
+                WorkoutPlanExercise.objects.all()
+            )
+        )]
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        queryset = super().setup_eager_loading(queryset)
+        # Aggregating drops Meta.ordering, so carry the effective ordering over
+        ordering = queryset.query.order_by or WorkoutPlan._meta.ordering
+        return queryset.annotate(
+            exercise_count=Count('exercises', distinct=True)
+        ).order_by(*ordering)
+
     def get_exercise_count(self, obj):
+        # Annotated by setup_eager_loading; fall back for unannotated instances
+        if hasattr(obj, 'exercise_count'):
+            return obj.exercise_count
         return obj.exercises.count()
 
 
-class StudentWorkoutPlanSerializer(serializers.ModelSerializer):
+class StudentWorkoutPlanSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     workout_plan = WorkoutPlanSerializer(read_only=True)
     assigned_by = TeacherSerializer(read_only=True)
 
+    select_related_fields = ['student__user', 'assigned_by__user']
+    expandable_fields = ['student', 'workout_plan', 'assigned_by']
+
+    @classmethod
+    def get_prefetch_related_fields(cls):
+        # Plans are shared by many assignments, so load each one once
+        return [Prefetch(
+            'workout_plan',
+            queryset=WorkoutPlanSerializer.setup_eager_loading(WorkoutPlan.objects.all())
+        )]
+
     class Meta:
         model = StudentWorkoutPlan
         fields = ['id', 'student', 'workout_plan', 'assigned_by', 
@@ -128,8 +226,13 @@ class StudentWorkoutPlanSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'assigned_at']
 
 
-class ActivityLogSerializer(serializers.ModelSerializer):
+class ActivityLogSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
+    student_id = serializers.PrimaryKeyRelatedField(
+        queryset=Student.objects.all(),
+        source='student',
+        write_only=True
+    )
     exercise = ExerciseSerializer(read_only=True)
     exercise_id = serializers.PrimaryKeyRelatedField(
         queryset=Exercise.objects.all(),
@@ -143,18 +246,24 @@ class ActivityLogSerializer(serializers.ModelSerializer):
         required=False
     )
 
+    select_related_fields = ['student__user', 'exercise']
+    expandable_fields = ['student', 'exercise']
+
     class Meta:
         model = ActivityLog
-        fields = ['id', 'student', 'exercise', 'exercise_id', 'workout_plan',
+        fields = ['id', 'student', 'student_id', 'exercise', 'exercise_id', 'workout_plan',
                   'workout_plan_id', 'date', 'duration_minutes', 'intensity',
                   'calories_burned', 'notes', 'logged_at']
         read_only_fields = ['id', 'calories_burned', 'logged_at']
 
 
-class PerformanceMetricSerializer(serializers.ModelSerializer):
+class PerformanceMetricSerializer(EagerLoadingMixin, DynamicFieldsMixin, serializers.ModelSerializer):
     student = StudentSerializer(read_only=True)
     recorded_by = TeacherSerializer(read_only=True)
 
+    select_related_fields = ['student__user', 'recorded_by__user']
+    expandable_fields = ['student', 'recorded_by']
+
     class Meta:
         model = PerformanceMetric
         fields = ['id', 'student', 'date', 'weight_kg', 'pushups_count',
@@ -163,11 +272,46 @@ class PerformanceMetricSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class RecentActivitySerializer(serializers.ModelSerializer):
+    """Lean activity shape for the dashboard; the student is implied by the URL"""
+    exercise_name = serializers.CharField(source='exercise.name', read_only=True)
+    exercise_category = serializers.CharField(source='exercise.category', read_only=True)
+
+    class Meta:
+        model = ActivityLog
+        fields = ['id', 'exercise', 'exercise_name', 'exercise_category', 'workout_plan',
+                  'date', 'duration_minutes', 'intensity', 'calories_burned', 'notes',
+                  'logged_at']
+        read_only_fields = fields
+
+
 class DashboardStatsSerializer(serializers.Serializer):
     """Serializer for dashboard statistics"""
     total_activities = serializers.IntegerField()
     total_calories = serializers.DecimalField(max_digits=10, decimal_places=2)
     total_minutes = serializers.IntegerField()
     active_plans = serializers.IntegerField()
-    recent_activities = ActivityLogSerializer(many=True)
+    recent_activities = RecentActivitySerializer(many=True)
     fitness_trend = serializers.ListField()
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for background jobs; only the job description is writable"""
+    # Declared so a repeated key reaches the idempotency check instead of failing uniqueness
+    idempotency_key = serializers.CharField(max_length=100, required=False)
+
+    class Meta:
+        model = Job
+        fields = ['id', 'kind', 'params', 'idempotency_key', 'status', 'attempts', 'max_attempts',
+                  'progress_current', 'progress_total', 'progress_message', 'result', 'error',
+                  'created_by', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = ['id', 'status', 'attempts', 'progress_current', 'progress_total',
+                            'progress_message', 'result', 'error', 'created_by', 'created_at',
+                            'started_at', 'finished_at']
+
+    def validate(self, attrs):
+        try:
+            jobs.validate(attrs['kind'], attrs.get('params', {}))
+        except ValueError as error:
+            raise serializers.ValidationError(str(error))
+        return attrs
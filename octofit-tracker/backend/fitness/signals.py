@@ -0,0 +1,140 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import archive, catalog_cache, leaderboard, metrics, rollups, trends
+from .models import (
+    ActivityLog, Exercise, PerformanceMetric, Student, Teacher, WorkoutPlan, WorkoutPlanExercise
+)
+
+
+@receiver(pre_save, sender=ActivityLog)
+def remember_stored_activity(sender, instance, raw=False, **kwargs):
+    """Keep the stored version of an edited log so its old totals can be removed"""
+    instance._rollup_previous = None
+    if not raw and instance.pk and not instance._state.adding:
+        instance._rollup_previous = rollups.stored_log_row(instance.pk)
+
+
+@receiver(post_save, sender=ActivityLog)
+def update_rollups_on_save(sender, instance, raw=False, **kwargs):
+    """Move the log's contribution into the rollups after create or update"""
+    if raw:
+        return
+    deltas = rollups.collect_deltas([rollups.log_row(instance)])
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous:
+        rollups.collect_deltas([previous], sign=-1, deltas=deltas)
+    rollups.apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=ActivityLog)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """Remove a deleted log's contribution from the rollups"""
+    if archive.archiving():
+        # Archived logs still count toward the rollups
+        return
+    rollups.apply_deltas(rollups.collect_deltas([rollups.log_row(instance)], sign=-1))
+
+
+@receiver(pre_save, sender=PerformanceMetric)
+def remember_stored_metric(sender, instance, raw=False, **kwargs):
+    """Keep the stored student and date of an edited metric so its old buckets are refreshed"""
+    instance._trend_previous = None
+    if not raw and instance.pk and not instance._state.adding:
+        instance._trend_previous = PerformanceMetric.objects.filter(pk=instance.pk).values_list(
+            'student_id', 'date'
+        ).first()
+
+
+@receiver(post_save, sender=PerformanceMetric)
+def update_metric_rollups_on_save(sender, instance, raw=False, **kwargs):
+    """Recompute the trend buckets the metric is in, and the ones it moved out of"""
+    if raw:
+        return
+    row = trends.metric_row(instance)
+    trends.refresh_buckets(row['student_id'], row['date'])
+    previous = getattr(instance, '_trend_previous', None)
+    if previous and previous != (row['student_id'], row['date']):
+        trends.refresh_buckets(*previous)
+
+
+@receiver(post_delete, sender=PerformanceMetric)
+def update_metric_rollups_on_delete(sender, instance, **kwargs):
+    row = trends.metric_row(instance)
+    trends.refresh_buckets(row['student_id'], row['date'])
+
+
+@receiver(post_save, sender=ActivityLog)
+@receiver(post_delete, sender=ActivityLog)
+@receiver(post_save, sender=PerformanceMetric)
+@receiver(post_delete, sender=PerformanceMetric)
+def invalidate_leaderboards(sender, **kwargs):
+    """Any new activity or metric can change a ranking"""
+    if archive.archiving():
+        return
+    leaderboard.invalidate()
+
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def invalidate_cached_exercise(sender, instance, **kwargs):
+    """Drop cached responses for the exercise and the plans that embed it"""
+    # Deleting an exercise cascades to its plan entries, which handle their plans
+    plan_ids = list(WorkoutPlanExercise.objects.filter(
+        exercise_id=instance.pk
+    ).values_list('workout_plan_id', flat=True).distinct())
+
+    def invalidate():
+        catalog_cache.invalidate('exercise', instance.pk)
+        for plan_id in plan_ids:
+            catalog_cache.invalidate('workout-plan', plan_id)
+    # Invalidating before commit would let a concurrent read cache the old rows again
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=WorkoutPlan)
+@receiver(post_delete, sender=WorkoutPlan)
+def invalidate_cached_workout_plan(sender, instance, **kwargs):
+    plan_id = instance.pk
+    transaction.on_commit(lambda: catalog_cache.invalidate('workout-plan', plan_id))
+
+
+@receiver(post_save, sender=WorkoutPlanExercise)
+@receiver(post_delete, sender=WorkoutPlanExercise)
+def invalidate_cached_plan_exercise(sender, instance, **kwargs):
+    plan_id = instance.workout_plan_id
+    transaction.on_commit(lambda: catalog_cache.invalidate('workout-plan', plan_id))
+
+
+@receiver(post_save, sender=WorkoutPlanExercise)
+@receiver(post_delete, sender=WorkoutPlanExercise)
+def touch_workout_plan(sender, instance, raw=False, **kwargs):
+    """A plan's exercises are part of the plan, so changing them updates its timestamp"""
+    if not raw:
+        WorkoutPlan.objects.filter(pk=instance.workout_plan_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Exercise)
+def touch_plans_using_exercise(sender, instance, created=False, raw=False, **kwargs):
+    if not (created or raw):
+        WorkoutPlan.objects.filter(exercises__exercise=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def touch_profiles_of_user(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Names and emails are shown through the profiles, so editing a user updates their timestamps"""
+    if created or raw or update_fields == frozenset(['last_login']):
+        return
+    now = timezone.now()
+    Student.objects.filter(user=instance).update(updated_at=now)
+    Teacher.objects.filter(user=instance).update(updated_at=now)
+
+
+@receiver(connection_created)
+def install_request_metrics(sender, connection, **kwargs):
+    """Count the connection's queries toward whichever request is running them"""
+    metrics.install_execute_wrapper(connection)
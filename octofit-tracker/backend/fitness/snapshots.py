@@ -0,0 +1,290 @@
+"""
+Columnar snapshots of closed months of ActivityLog and PerformanceMetric.
+
+Each month of a table is written to one file: an 8 byte magic number, a
+4 byte header length, a JSON header and then one fixed-width column after
+another, each aligned to 8 bytes. Ids and counts are stored as integers,
+dates as days since 1970-01-01, decimals as integers in hundredths and
+choice fields as small integer codes; missing values are stored as -1.
+``Snapshot`` maps a file into memory and exposes every column as a typed
+``memoryview`` without copying it.
+
+Closed months rarely change, but backfills and recalculations do happen, so
+the header records the live row count and latest ``updated_at`` of the month
+and ``export`` rewrites a file when either no longer matches. Activity logs
+are read from the live and archive tables together, so archiving a month
+leaves its snapshot as it was.
+"""
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import ActivityLog, ArchivedActivityLog, PerformanceMetric
+
+MAGIC = b'OCTOSNP1'
+VERSION = 1
+NULL = -1
+SUFFIX = '.ocs'
+EPOCH = date(1970, 1, 1).toordinal()
+DECIMAL_SCALE = 100
+
+Column = namedtuple('Column', ['name', 'typecode', 'kind'])
+
+INTENSITY_CODES = [choice for choice, _ in ActivityLog._meta.get_field('intensity').choices]
+
+TABLES = {
+    'activity_logs': ((ActivityLog, ArchivedActivityLog), [
+        Column('id', 'q', 'int'),
+        Column('student_id', 'i', 'int'),
+        Column('exercise_id', 'i', 'int'),
+        Column('workout_plan_id', 'i', 'int'),
+        Column('date', 'i', 'date'),
+        Column('duration_minutes', 'i', 'int'),
+        Column('intensity', 'b', 'code'),
+        Column('calories_burned', 'q', 'decimal'),
+    ]),
+    'performance_metrics': ((PerformanceMetric,), [
+        Column('id', 'q', 'int'),
+        Column('student_id', 'i', 'int'),
+        Column('date', 'i', 'date'),
+        Column('weight_kg', 'i', 'decimal'),
+        Column('pushups_count', 'i', 'int'),
+        Column('situps_count', 'i', 'int'),
+        Column('mile_time_seconds', 'i', 'int'),
+        Column('flexibility_cm', 'i', 'decimal'),
+        Column('fitness_score', 'i', 'int'),
+    ]),
+}
+CODES = {'intensity': INTENSITY_CODES}
+
+
+def snapshot_dir():
+    return os.fspath(getattr(settings, 'OCTOFIT_SNAPSHOT_DIR', settings.BASE_DIR / 'snapshots'))
+
+
+def snapshot_path(table, month, directory=None):
+    return os.path.join(directory or snapshot_dir(), table, f'{month:%Y-%m}{SUFFIX}')
+
+
+def next_month(month):
+    return (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def to_day(value):
+    return value.toordinal() - EPOCH
+
+
+def from_day(day):
+    return date.fromordinal(day + EPOCH)
+
+
+def _encode(column, value):
+    if value is None:
+        return NULL
+    if column.kind == 'date':
+        return to_day(value)
+    if column.kind == 'decimal':
+        return int((Decimal(value) * DECIMAL_SCALE).to_integral_value())
+    if column.kind == 'code':
+        return CODES[column.name].index(value)
+    return value
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def write_snapshot(path, table, month, rows, live_state):
+    """Write ``rows`` (tuples in column order) for ``month`` of ``table`` to ``path``"""
+    _, columns = TABLES[table]
+    data = [array(column.typecode) for column in columns]
+    count = 0
+    for row in rows:
+        for values, column, value in zip(data, columns, row):
+            values.append(_encode(column, value))
+        count += 1
+
+    layout = []
+    offset = 0
+    for column, values in zip(columns, data):
+        layout.append({'name': column.name, 'type': column.typecode, 'kind': column.kind, 'offset': offset})
+        offset = _align(offset + len(values) * values.itemsize)
+    header = json.dumps({
+        'version': VERSION,
+        'table': table,
+        'month': month.isoformat(),
+        'rows': count,
+        'byteorder': sys.byteorder,
+        'null': NULL,
+        'decimal_scale': DECIMAL_SCALE,
+        'codes': {column.name: CODES[column.name] for column in columns if column.kind == 'code'},
+        'columns': layout,
+        'live_rows': live_state['rows'],
+        'live_updated_at': live_state['updated_at'].isoformat() if live_state['updated_at'] else None,
+        'created_at': timezone.now().isoformat(),
+    }).encode()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(MAGIC + struct.pack('<I', len(header)) + header)
+        output.write(bytes(_align(output.tell()) - output.tell()))
+        for values in data:
+            values.tofile(output)
+            output.write(bytes(_align(output.tell()) - output.tell()))
+    # Readers never see a half-written file
+    os.replace(temporary, path)
+    return count
+
+
+def read_header(path):
+    with open(path, 'rb') as snapshot:
+        prefix = snapshot.read(12)
+        if prefix[:8] != MAGIC:
+            raise ValueError(f'{path} is not an OctoFit snapshot')
+        (length,) = struct.unpack('<I', prefix[8:])
+        return json.loads(snapshot.read(length))
+
+
+class Snapshot:
+    """A memory-mapped snapshot file whose ``columns`` are typed zero-copy views"""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = read_header(path)
+        if self.header['byteorder'] != sys.byteorder:
+            raise ValueError(f'{path} was written on a {self.header["byteorder"]}-endian machine')
+        self.table = self.header['table']
+        self.month = date.fromisoformat(self.header['month'])
+        self.rows = self.header['rows']
+
+        with open(path, 'rb') as snapshot:
+            self._map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        data_start = _align(12 + struct.unpack('<I', self._map[8:12])[0])
+        buffer = memoryview(self._map)
+        self.columns = {}
+        for column in self.header['columns']:
+            start = data_start + column['offset']
+            size = array(column['type']).itemsize * self.rows
+            self.columns[column['name']] = buffer[start:start + size].cast(column['type'])
+        buffer.release()
+
+    def close(self):
+        for view in self.columns.values():
+            view.release()
+        self.columns = {}
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def live_state(models, month):
+    """Row count and latest change of ``month`` across the tables in ``models``"""
+    state = {'rows': 0, 'updated_at': None}
+    for model in models:
+        values = model.objects.filter(date__gte=month, date__lt=next_month(month)).aggregate(
+            rows=Count('id'), updated_at=Max('updated_at')
+        )
+        state['rows'] += values['rows']
+        latest = values['updated_at']
+        if latest and (state['updated_at'] is None or latest > state['updated_at']):
+            state['updated_at'] = latest
+    return state
+
+
+def closed_months(models, before):
+    """First days of every month with rows, up to but excluding the month of ``before``"""
+    firsts = [
+        first for first in (
+            model.objects.order_by('date').values_list('date', flat=True).first() for model in models
+        ) if first is not None
+    ]
+    if not firsts:
+        return []
+    first = min(firsts)
+    months = []
+    month = first.replace(day=1)
+    while month < before.replace(day=1):
+        months.append(month)
+        month = next_month(month)
+    return months
+
+
+def is_current(path, state):
+    """True when the file at ``path`` still matches the live ``state`` of its month"""
+    if not os.path.exists(path):
+        return False
+    header = read_header(path)
+    updated_at = state['updated_at'].isoformat() if state['updated_at'] else None
+    return header['version'] == VERSION and (header['live_rows'], header['live_updated_at']) == (
+        state['rows'], updated_at
+    )
+
+
+def month_rows(models, columns, month, batch_size=5000):
+    """Rows of ``month`` from every table in ``models``, merged in (date, id) order"""
+    names = [column.name for column in columns]
+    position = names.index('date')
+    return heapq.merge(*[
+        model.objects.filter(date__gte=month, date__lt=next_month(month)).order_by(
+            'date', 'id'
+        ).values_list(*names).iterator(chunk_size=batch_size)
+        for model in models
+    ], key=lambda row: (row[position], row[0]))
+
+
+def export(tables=None, before=None, directory=None, force=False, batch_size=5000):
+    """
+    Snapshot every closed month of ``tables`` (all by default) before ``before``.
+
+    Months whose file is missing or out of date are written; returns a list
+    of ``(table, month, rows, written)`` tuples.
+    """
+    before = before or date.today()
+    results = []
+    for table in tables or TABLES:
+        models, columns = TABLES[table]
+        for month in closed_months(models, before):
+            path = snapshot_path(table, month, directory)
+            state = live_state(models, month)
+            if not force and is_current(path, state):
+                results.append((table, month, read_header(path)['rows'], False))
+                continue
+            if not state['rows']:
+                if os.path.exists(path):
+                    os.remove(path)
+                continue
+            rows = month_rows(models, columns, month, batch_size)
+            results.append((table, month, write_snapshot(path, table, month, rows, state), True))
+    return results
+
+
+def open_snapshots(table, start=None, end=None, directory=None):
+    """Open the snapshots of ``table`` whose month overlaps ``start`` to ``end``, oldest first"""
+    folder = os.path.join(directory or snapshot_dir(), table)
+    if not os.path.isdir(folder):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(SUFFIX):
+            continue
+        month = date.fromisoformat(name[:-len(SUFFIX)] + '-01')
+        if (start and next_month(month) <= start) or (end and month > end):
+            continue
+        snapshots.append(Snapshot(os.path.join(folder, name)))
+    return snapshots
@@ -1,3 +1,1484 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from octofit_tracker.mongodb import pool
+
+from . import admin as fitness_admin, analytics, archive, catalog_cache, history, jobs, leaderboard, loadgen, metrics, pipelines, rollups, snapshots, trends
+from . import views as fitness_views
+from .models import (
+    Student, Teacher, WorkoutPlan, Exercise, WorkoutPlanExercise,
+    StudentWorkoutPlan, ActivityLog, ArchivedActivityLog, PerformanceMetric, ActivityRollup, MetricRollup,
+    Job
+)
+
+
+def create_fixtures(student_count=3, logs_per_student=4):
+    """Create a small school: one teacher, a few plans, students and their logs"""
+    teacher_user = User.objects.create_user(
+        username='teacher', password='teacher123', first_name='Paul', last_name='Octo'
+    )
+    teacher = Teacher.objects.create(user=teacher_user)
+    exercises = [
+        Exercise.objects.create(
+            name=name, description=name, category=category,
+            calories_per_minute=Decimal(rate)
+        )
+        for name, category, rate in [
+            ('Running', 'cardio', '10.00'),
+            ('Push-ups', 'strength', '7.00'),
+            ('Yoga', 'flexibility', '4.00'),
+        ]
+    ]
+    plans = []
+    for i in range(2):
+        plan = WorkoutPlan.objects.create(
+            title=f'Plan {i}', description='Plan', created_by=teacher, duration_weeks=4
+        )
+        for order, exercise in enumerate(exercises):
+            WorkoutPlanExercise.objects.create(
+                workout_plan=plan, exercise=exercise, duration_minutes=10, order=order
+            )
+        plans.append(plan)
+
+    today = date.today()
+    students = []
+    for i in range(student_count):
+        user = User.objects.create_user(
+            username=f'student{i}', password='student123',
+            first_name=f'First{i}', last_name=f'Last{i}'
+        )
+        student = Student.objects.create(user=user, grade=9 + i % 4, age=15)
+        StudentWorkoutPlan.objects.create(
+            student=student, workout_plan=plans[i % len(plans)],
+            assigned_by=teacher, start_date=today
+        )
+        for j in range(logs_per_student):
+            ActivityLog.objects.create(
+                student=student, exercise=exercises[j % len(exercises)],
+                date=today - timedelta(days=j), duration_minutes=20 + j,
+                intensity=['low', 'medium', 'high'][j % 3]
+            )
+        PerformanceMetric.objects.create(
+            student=student, date=today - timedelta(days=7),
+            fitness_score=60 + i, recorded_by=teacher
+        )
+        students.append(student)
+    return teacher, students, exercises, plans
+
+
+class ListQueryCountTests(TestCase):
+    """List endpoints must run a constant number of queries regardless of size"""
+
+    endpoints = [
+        '/api/students/',
+        '/api/teachers/',
+        '/api/workout-plans/',
+        '/api/exercises/',
+        '/api/student-workout-plans/',
+        '/api/activity-logs/',
+        '/api/performance-metrics/',
+    ]
+
+    def setUp(self):
+        self.client = APIClient()
+        catalog_cache.get_cache().clear()
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        create_fixtures(student_count=2)
+        small = {url: self.count_queries(url) for url in self.endpoints}
+        catalog_cache.get_cache().clear()
+
+        teacher = Teacher.objects.get()
+        plan = WorkoutPlan.objects.create(
+            title='Extra', description='Extra', created_by=teacher, duration_weeks=2
+        )
+        exercise = Exercise.objects.first()
+        WorkoutPlanExercise.objects.create(workout_plan=plan, exercise=exercise, order=1)
+        for i in range(2, 8):
+            user = User.objects.create_user(username=f'more{i}', first_name='M', last_name=str(i))
+            student = Student.objects.create(user=user, grade=10, age=15)
+            StudentWorkoutPlan.objects.create(
+                student=student, workout_plan=plan, assigned_by=teacher, start_date=date.today()
+            )
+            ActivityLog.objects.create(
+                student=student, exercise=exercise, date=date.today(), duration_minutes=30
+            )
+            PerformanceMetric.objects.create(student=student, date=date.today(), fitness_score=50)
+
+        for url in self.endpoints:
+            self.assertEqual(self.count_queries(url), small[url], url)
+
+    def test_exercise_count_is_annotated(self):
+        create_fixtures(student_count=1)
+        response = self.client.get('/api/workout-plans/')
+        for plan in response.data['results']:
+            self.assertEqual(plan['exercise_count'], 3)
+            self.assertEqual(len(plan['exercises']), 3)
+
+
+class StudentDashboardTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        _, self.students, _, _ = create_fixtures(student_count=2, logs_per_student=12)
+
+    def test_dashboard_totals(self):
+        student = self.students[0]
+        response = self.client.get(f'/api/students/{student.pk}/dashboard/')
+        self.assertEqual(response.status_code, 200)
+
+        logs = ActivityLog.objects.filter(student=student)
+        self.assertEqual(response.data['total_activities'], 12)
+        self.assertEqual(response.data['total_minutes'], sum(log.duration_minutes for log in logs))
+        self.assertEqual(
+            Decimal(response.data['total_calories']),
+            sum(log.calories_burned for log in logs)
+        )
+        self.assertEqual(response.data['active_plans'], 1)
+        self.assertEqual(len(response.data['recent_activities']), 10)
+        self.assertEqual(response.data['recent_activities'][0]['exercise_name'], 'Running')
+        self.assertNotIn('student', response.data['recent_activities'][0])
+
+    def test_dashboard_query_count(self):
+        student = self.students[0]
+        # One query for the ETag, then the dashboard itself
+        with self.assertNumQueries(5):
+            self.client.get(f'/api/students/{student.pk}/dashboard/')
+
+
+class ActivityRollupTests(TestCase):
+
+    def setUp(self):
+        _, self.students, self.exercises, _ = create_fixtures(student_count=2, logs_per_student=6)
+
+    def assertRollupsMatchLogs(self):
+        for student in self.students:
+            for period in rollups.PERIODS:
+                expected = {}
+                for log in ActivityLog.objects.filter(student=student).select_related('exercise'):
+                    key = (rollups.period_start(period, log.date), log.exercise.category)
+                    count, minutes, calories = expected.get(key, (0, 0, Decimal('0')))
+                    expected[key] = (
+                        count + 1, minutes + log.duration_minutes, calories + log.calories_burned
+                    )
+                actual = {
+                    (row.period_start, row.category): (
+                        row.activity_count, row.total_minutes, row.total_calories
+                    )
+                    for row in ActivityRollup.objects.filter(student=student, period=period)
+                    if row.activity_count
+                }
+                self.assertEqual(actual, expected)
+
+    def test_rollups_follow_create_update_delete(self):
+        self.assertRollupsMatchLogs()
+
+        log = ActivityLog.objects.filter(student=self.students[0]).first()
+        log.exercise = self.exercises[2]
+        log.duration_minutes = 45
+        log.date = log.date - timedelta(days=40)
+        log.calories_burned = None
+        log.save()
+        self.assertRollupsMatchLogs()
+
+        ActivityLog.objects.filter(student=self.students[1]).first().delete()
+        self.assertRollupsMatchLogs()
+
+    def test_rebuild_matches_incremental(self):
+        incremental = sorted(ActivityRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'category',
+            'activity_count', 'total_minutes', 'total_calories'
+        ))
+        rollups.rebuild_rollups()
+        rebuilt = sorted(ActivityRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'category',
+            'activity_count', 'total_minutes', 'total_calories'
+        ))
+        self.assertEqual(rebuilt, incremental)
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.teacher, self.students, self.exercises, _ = create_fixtures(
+            student_count=4, logs_per_student=1
+        )
+
+    def test_ranks_by_minutes_with_caller_rank(self):
+        response = self.client.get('/api/leaderboard/', {
+            'metric': 'minutes', 'window': 'week', 'limit': 2,
+            'student_id': self.students[0].pk,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual([row['rank'] for row in response.data['results']], [1, 1])
+        self.assertEqual(response.data['me']['student_id'], self.students[0].pk)
+
+    def test_new_activity_invalidates_cached_ranking(self):
+        params = {'metric': 'calories', 'window': 'month'}
+        first = self.client.get('/api/leaderboard/', params).data
+        self.assertEqual(first['total'], 4)
+
+        leader = self.students[3]
+        ActivityLog.objects.create(
+            student=leader, exercise=self.exercises[0], date=date.today(), duration_minutes=90
+        )
+        second = self.client.get('/api/leaderboard/', params).data
+        self.assertEqual(second['results'][0]['student_id'], leader.pk)
+        self.assertEqual(second['results'][1]['rank'], 2)
+
+    def test_fitness_score_filtered_by_grade(self):
+        PerformanceMetric.objects.update(date=date.today())
+        response = self.client.get('/api/leaderboard/', {'metric': 'fitness_score', 'grade': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row['student_id'] for row in response.data['results']], [self.students[1].pk]
+        )
+
+    def test_rejects_unknown_metric(self):
+        response = self.client.get('/api/leaderboard/', {'metric': 'steps'})
+        self.assertEqual(response.status_code, 400)
+
+
+class PaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        create_fixtures(student_count=5, logs_per_student=3)
+
+    def test_cursor_walks_every_log_once_in_both_directions(self):
+        expected = list(
+            ActivityLog.objects.order_by('-date', '-logged_at', '-id').values_list('id', flat=True)
+        )
+        pages = []
+        url = '/api/activity-logs/?page_size=4'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            last = response.data
+            url = response.data['next']
+        self.assertEqual([pk for page in pages for pk in page], expected)
+
+        backwards = []
+        url = last['previous']
+        while url:
+            response = self.client.get(url)
+            backwards.insert(0, [row['id'] for row in response.data['results']])
+            url = response.data['previous']
+        self.assertEqual(backwards, pages[:-1])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/performance-metrics/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_page_number_pagination(self):
+        response = self.client.get('/api/students/?page_size=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_students_sharing_grade_and_last_name_page_by_id(self):
+        Student.objects.update(grade=10)
+        User.objects.filter(student_profile__isnull=False).update(last_name='Same')
+        seen = []
+        url = '/api/students/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, list(Student.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_sparse_fields_and_expand(self):
+        response = self.client.get('/api/activity-logs/?fields=id,student,exercise&expand=exercise')
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'student', 'exercise'})
+        self.assertIsInstance(row['student'], int)
+        self.assertEqual(row['exercise']['name'], ActivityLog.objects.get(pk=row['id']).exercise.name)
+
+        response = self.client.get('/api/workout-plans/?expand=')
+        plan = response.data['results'][0]
+        self.assertIsInstance(plan['created_by'], int)
+        self.assertEqual(len(plan['exercises']), 3)
+        self.assertIsInstance(plan['exercises'][0], int)
+
+
+class BulkActivityLogTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        _, self.students, self.exercises, self.plans = create_fixtures(
+            student_count=2, logs_per_student=0
+        )
+
+    def test_bulk_json_matches_single_save(self):
+        rows = [
+            {
+                'student_id': self.students[i % 2].pk,
+                'exercise_id': self.exercises[i % 3].pk,
+                'workout_plan_id': self.plans[0].pk,
+                'date': str(date.today() - timedelta(days=i)),
+                'duration_minutes': 10 + i,
+                'intensity': ['low', 'medium', 'high'][i % 3],
+            }
+            for i in range(30)
+        ]
+        response = self.client.post('/api/activity-logs/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 30)
+        totals = ActivityRollup.objects.filter(period='month').aggregate(Sum('activity_count'))
+        self.assertEqual(totals['activity_count__sum'], 30)
+
+        # Calories must match what the one-at-a-time save() path stores
+        for row, log in zip(rows, ActivityLog.objects.order_by('id')):
+            single = ActivityLog.objects.create(
+                student_id=row['student_id'], exercise_id=row['exercise_id'], date=row['date'],
+                duration_minutes=row['duration_minutes'], intensity=row['intensity'],
+            )
+            single.refresh_from_db()
+            self.assertEqual(log.calories_burned, single.calories_burned)
+
+    def test_rollup_queries_do_not_grow_with_keys(self):
+        def post(days):
+            rows = [
+                {'student_id': student.pk, 'exercise_id': exercise.pk,
+                 'date': str(date.today() - timedelta(days=day)), 'duration_minutes': 20}
+                for student in self.students for exercise in self.exercises for day in range(days)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post('/api/activity-logs/bulk/', rows, format='json')
+            self.assertEqual(response.status_code, 201)
+            return [query['sql'] for query in queries if 'fitness_activityrollup' in query['sql']]
+
+        # One read, then a bulk insert of new keys and a bulk update of existing ones
+        self.assertEqual(len(post(2)), 2)
+        self.assertEqual(len(post(10)), 3)
+
+        columns = ['student_id', 'period', 'period_start', 'category',
+                   'activity_count', 'total_minutes', 'total_calories']
+        applied = set(ActivityRollup.objects.values_list(*columns))
+        rollups.rebuild_rollups()
+        self.assertEqual(set(ActivityRollup.objects.values_list(*columns)), applied)
+
+    def test_bulk_ndjson_reports_row_errors(self):
+        lines = [
+            {'student_id': self.students[0].pk, 'exercise_id': self.exercises[0].pk,
+             'date': str(date.today()), 'duration_minutes': 30},
+            {'student_id': self.students[0].pk, 'exercise_id': 9999,
+             'date': str(date.today()), 'duration_minutes': 30},
+            {'student_id': self.students[0].pk, 'exercise_id': self.exercises[0].pk,
+             'date': 'yesterday', 'duration_minutes': 0},
+        ]
+        body = '\n'.join(json.dumps(line) for line in lines) + '\n'
+        response = self.client.post(
+            '/api/activity-logs/bulk/', body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('exercise_id', response.data['errors'][0]['errors'])
+        self.assertEqual(set(response.data['errors'][1]['errors']), {'date', 'duration_minutes'})
+
+
+class LoadDataGeneratorTests(TestCase):
+
+    def generate(self, prefix):
+        catalog = loadgen.ensure_catalog()
+        result = loadgen.generate_school(
+            school=0, students=5, months=1, seed=7, prefix=prefix, catalog=catalog, batch_size=50
+        )
+        logs = ActivityLog.objects.filter(student__user__username__startswith=f'{prefix}_')
+        return result, sorted(logs.values_list('date', 'duration_minutes', 'intensity', 'calories_burned'))
+
+    def test_same_seed_reproduces_data_and_rollups(self):
+        first, first_logs = self.generate('a')
+        second, second_logs = self.generate('b')
+        self.assertEqual(first['activity_logs'], second['activity_logs'])
+        self.assertEqual(first_logs, second_logs)
+        self.assertEqual(first['performance_metrics'], 5 * 3)
+
+        incremental = sorted(ActivityRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'category', 'activity_count', 'total_calories'
+        ))
+        rollups.rebuild_rollups()
+        rebuilt = sorted(ActivityRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'category', 'activity_count', 'total_calories'
+        ))
+        self.assertEqual(incremental, rebuilt)
+
+        generated = sorted(MetricRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'sample_count', 'weight_kg_sum'
+        ))
+        trends.rebuild_rollups()
+        self.assertEqual(generated, sorted(MetricRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'sample_count', 'weight_kg_sum'
+        )))
+
+
+class ActivityLogCreateTests(TestCase):
+
+    def test_create_calculates_calories(self):
+        _, students, exercises, _ = create_fixtures(student_count=1, logs_per_student=0)
+        response = APIClient().post('/api/activity-logs/', {
+            'student_id': students[0].pk,
+            'exercise_id': exercises[0].pk,
+            'date': str(date.today()),
+            'duration_minutes': 30,
+            'intensity': 'high',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['student']['id'], students[0].pk)
+        self.assertEqual(Decimal(response.data['calories_burned']), Decimal('390.00'))
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        metrics.reset()
+        create_fixtures(student_count=2)
+
+    def test_server_timing_header_and_route_histogram(self):
+        client = APIClient()
+        response = client.get('/api/students/')
+        self.assertIn('db;desc=', response['Server-Timing'])
+        self.assertIn('serialize;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        client.get('/api/students/')
+        routes = client.get('/api/metrics/requests/').data['routes']
+        stats = routes['student-list']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['mean_queries'], 0)
+        self.assertEqual(sum(stats['latency_histogram_ms'].values()), 2)
+
+    @override_settings(OCTOFIT_QUERY_BUDGET=0)
+    def test_over_budget_requests_log_repeated_statements(self):
+        student = Student.objects.first()
+        with self.assertLogs('fitness.performance', level='WARNING') as logs:
+            APIClient().get(f'/api/students/{student.pk}/dashboard/')
+        self.assertIn('student-dashboard', logs.output[0])
+        self.assertIn('over the budget of 0', logs.output[0])
+
+
+class CatalogCacheTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        catalog_cache.reset_stats()
+        _, _, self.exercises, self.plans = create_fixtures(student_count=1, logs_per_student=0)
+        self.client = APIClient()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(context.captured_queries)
+
+    def test_repeated_reads_are_served_from_cache(self):
+        first, queries = self.get('/api/exercises/?page=1')
+        self.assertGreater(queries, 0)
+        second, queries = self.get('/api/exercises/?page=1')
+        self.assertEqual(queries, 0)
+        self.assertEqual(second.data, first.data)
+
+        # Different query parameters are cached separately
+        _, queries = self.get('/api/exercises/?fields=id,name')
+        self.assertGreater(queries, 0)
+        stats = self.client.get('/api/metrics/cache/').data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_edits_invalidate_only_affected_responses(self):
+        plan, other_plan = self.plans
+        plan_url = f'/api/workout-plans/{plan.pk}/'
+        other_url = f'/api/workout-plans/{other_plan.pk}/'
+        for url in [plan_url, other_url, '/api/workout-plans/']:
+            self.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkoutPlanExercise.objects.filter(workout_plan=plan).first().delete()
+
+        response, queries = self.get(plan_url)
+        self.assertGreater(queries, 0)
+        self.assertEqual(response.data['exercise_count'], 2)
+        self.assertEqual(self.get(other_url)[1], 0)
+        self.assertGreater(self.get('/api/workout-plans/')[1], 0)
+
+        # Renaming an exercise reaches every plan that embeds it
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise = self.exercises[2]
+            exercise.name = 'Power Yoga'
+            exercise.save()
+        response, queries = self.get(other_url)
+        self.assertGreater(queries, 0)
+        self.assertIn('Power Yoga', [entry['exercise']['name'] for entry in response.data['exercises']])
+
+    def test_lru_eviction_is_counted(self):
+        backend = catalog_cache.get_cache()
+        backend._max_entries = backend._cull_frequency = 3
+        try:
+            for number in range(5):
+                backend.set(f'entry:{number}', number)
+        finally:
+            backend._max_entries = backend._cull_frequency = 1000
+        self.assertEqual(catalog_cache.stats()['evictions'], 2)
+        self.assertIsNone(backend.get('entry:0'))
+        self.assertEqual(backend.get('entry:4'), 4)
+
+    def test_warm_up_caches_default_list_pages(self):
+        self.assertEqual(catalog_cache.warm_up(['testserver']), 2)
+        self.assertEqual(self.get('/api/workout-plans/')[1], 0)
+
+
+class CatalogWarmUpTests(TransactionTestCase):
+    """The warm-up thread reads through its own connection, so the data has to be committed"""
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        create_fixtures(student_count=1, logs_per_student=0)
+
+    def test_warm_up_runs_off_the_event_loop(self):
+        async def start():
+            # What importing the ASGI application inside a running server amounts to
+            return catalog_cache.warm_up_in_background(['testserver'])
+
+        thread = asyncio.run(start())
+        thread.join()
+        with CaptureQueriesContext(connection) as context:
+            response = APIClient().get('/api/exercises/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertIsNone(catalog_cache.warm_up_in_background([]))
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        catalog_cache.get_cache().clear()
+        _, self.students, self.exercises, self.plans = create_fixtures(student_count=2)
+        self.client = APIClient()
+
+    def revalidate(self, url, etag=None, modified_since=None):
+        headers = {}
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        if modified_since:
+            headers['HTTP_IF_MODIFIED_SINCE'] = modified_since
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, **headers)
+        return response, len(context.captured_queries)
+
+    def test_list_returns_304_until_rows_change(self):
+        url = '/api/students/?page_size=1'
+        response, _ = self.revalidate(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        # The row count and the page's own rows, never an aggregate over the table
+        self.assertEqual(queries, 2)
+
+        # Other pages and filters are different representations
+        self.assertEqual(self.revalidate('/api/students/?page_size=1&page=2', etag)[0].status_code, 200)
+
+        # Rows on other pages do not change this page
+        self.students[1].save()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+        self.students[0].save()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+        etag = self.revalidate(url)[0]['ETag']
+        self.students[1].delete()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+    def test_etag_follows_nested_teacher_and_user(self):
+        metric = PerformanceMetric.objects.first()
+        url = f'/api/performance-metrics/{metric.pk}/'
+        etag = self.revalidate(url)[0]['ETag']
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 304)
+
+        teacher = metric.recorded_by
+        teacher.department = 'Athletics'
+        teacher.save()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+        etag = self.revalidate(url)[0]['ETag']
+        user = metric.student.user
+        user.first_name = 'Renamed'
+        user.save()
+        response = self.revalidate(url, etag)[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['student']['user']['first_name'], 'Renamed')
+
+    def test_keyset_lists_have_no_etag(self):
+        response, _ = self.revalidate('/api/activity-logs/', etag='W/"anything"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    def test_detail_honours_last_modified(self):
+        student = self.students[0]
+        url = f'/api/students/{student.pk}/'
+        response, _ = self.revalidate(url)
+        last_modified = response['Last-Modified']
+
+        response, queries = self.revalidate(url, modified_since=last_modified)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(queries, 1)
+        self.assertEqual(self.revalidate('/api/students/999999/', etag='*')[0].status_code, 404)
+
+    def test_plan_etag_follows_its_exercises(self):
+        url = f'/api/workout-plans/{self.plans[0].pk}/'
+        etag = self.revalidate(url)[0]['ETag']
+        # Served from the catalog cache, revalidated without a query
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual((response.status_code, queries), (304, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exercise = self.exercises[0]
+            exercise.name = 'Trail Running'
+            exercise.save()
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+    def test_dashboard_returns_304_until_activity_is_logged(self):
+        student = self.students[0]
+        url = f'/api/students/{student.pk}/dashboard/'
+        etag = self.revalidate(url)[0]['ETag']
+        response, queries = self.revalidate(url, etag)
+        self.assertEqual((response.status_code, queries), (304, 1))
+
+        ActivityLog.objects.create(
+            student=student, exercise=self.exercises[0], date=date.today(), duration_minutes=15
+        )
+        self.assertEqual(self.revalidate(url, etag)[0].status_code, 200)
+
+
+class FastReadPathTests(TestCase):
+    """The .values() list path must produce exactly the serializer's bytes"""
+
+    def setUp(self):
+        _, self.students, _, _ = create_fixtures(student_count=3, logs_per_student=6)
+        user = self.students[0].user
+        user.first_name, user.last_name = 'Zoë', ''
+        user.save()
+        PerformanceMetric.objects.create(student=self.students[1], date=date.today(), fitness_score=70)
+
+    def fetch_both(self, url):
+        client = APIClient()
+        with override_settings(OCTOFIT_FAST_READS=False):
+            slow = client.get(url)
+        with override_settings(OCTOFIT_FAST_READS=True):
+            fast = client.get(url)
+        self.assertEqual(slow.status_code, 200)
+        return slow.content, fast.content
+
+    def test_responses_are_byte_identical(self):
+        student_id = self.students[1].pk
+        for url in [
+            '/api/activity-logs/',
+            '/api/activity-logs/?page_size=4',
+            f'/api/activity-logs/?student_id={student_id}&expand=exercise',
+            '/api/activity-logs/?fields=id,student,calories_burned,logged_at',
+            '/api/performance-metrics/',
+            '/api/performance-metrics/?expand=',
+        ]:
+            slow, fast = self.fetch_both(url)
+            self.assertEqual(slow, fast, url)
+
+    def test_cursor_links_follow_the_same_pages(self):
+        url = '/api/activity-logs/?page_size=5'
+        while url:
+            slow, fast = self.fetch_both(url)
+            self.assertEqual(slow, fast)
+            url = json.loads(fast)['next']
+
+    def test_unsupported_serializers_fall_back(self):
+        from .fastpath import UnsupportedField, ValuesSerializer
+        from .serializers import WorkoutPlanSerializer
+        with self.assertRaises(UnsupportedField):
+            ValuesSerializer(WorkoutPlanSerializer())
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        _, self.students, _, _ = create_fixtures(student_count=4, logs_per_student=3)
+        self.client = APIClient()
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_every_row(self):
+        response = self.client.get('/api/activity-logs/export/csv/')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="activity-logs-', response['Content-Disposition'])
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'date', 'student_id'])
+        self.assertEqual(len(lines), 1 + ActivityLog.objects.count())
+
+    def test_ndjson_export_applies_filters(self):
+        student = self.students[1]
+        today = date.today()
+        response = self.client.get(
+            f'/api/activity-logs/export/ndjson/?student_id={student.pk}'
+            f'&date_from={today - timedelta(days=1)}&date_to={today}'
+        )
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        expected = ActivityLog.objects.filter(student=student, date__gte=today - timedelta(days=1))
+        self.assertEqual([row['id'] for row in rows], list(expected.order_by('date', 'id').values_list('id', flat=True)))
+        self.assertEqual(rows[0]['first_name'], 'First1')
+        self.assertEqual(rows[0]['calories_burned'], str(expected.order_by('date', 'id')[0].calories_burned))
+
+        response = self.client.get(f'/api/performance-metrics/export/ndjson/?grade={student.grade}')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual({row['student_id'] for row in rows}, {student.pk})
+
+    def test_csv_cells_cannot_run_as_formulas(self):
+        log = ActivityLog.objects.filter(student=self.students[0]).first()
+        ActivityLog.objects.filter(pk=log.pk).update(notes='=HYPERLINK("http://example.com")')
+        user = self.students[0].user
+        user.last_name = '@SUM(A1)'
+        user.save()
+
+        rows = list(csv.DictReader(StringIO(self.read(
+            self.client.get(f'/api/activity-logs/export/csv/?student_id={self.students[0].pk}')
+        ))))
+        row = next(row for row in rows if row['id'] == str(log.pk))
+        self.assertEqual(row['notes'], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row['last_name'], "'@SUM(A1)")
+        self.assertEqual(row['first_name'], 'First0')
+
+        response = self.client.get(f'/api/activity-logs/export/ndjson/?student_id={self.students[0].pk}')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(next(row for row in rows if row['id'] == log.pk)['notes'], '=HYPERLINK("http://example.com")')
+
+    def test_invalid_filters_are_rejected(self):
+        response = self.client.get('/api/activity-logs/export/csv/?date_from=yesterday')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        response = self.client.get('/api/activity-logs/export/xml/')
+        self.assertEqual(response.status_code, 404)
+
+
+class AsyncViewTests(TransactionTestCase):
+    """Async views query from worker threads, so the data has to be committed"""
+
+    def setUp(self):
+        _, self.students, _, _ = create_fixtures(student_count=3, logs_per_student=12)
+        metrics.reset()
+
+    async def test_responses_match_the_sync_endpoints(self):
+        student_id = self.students[1].pk
+        client = AsyncClient()
+        for async_url, sync_url in [
+            (f'/api/async/students/{student_id}/dashboard/', f'/api/students/{student_id}/dashboard/'),
+            ('/api/async/activity-logs/?page_size=5', '/api/activity-logs/?page_size=5'),
+            ('/api/async/leaderboard/?metric=minutes', '/api/leaderboard/?metric=minutes'),
+        ]:
+            response = await client.get(async_url)
+            self.assertEqual(response.status_code, 200, async_url)
+            expected = await client.get(sync_url)
+            # Pagination links point back at the endpoint that was called
+            self.assertEqual(response.content.replace(b'/api/async/', b'/api/'), expected.content, async_url)
+
+    async def test_errors(self):
+        client = AsyncClient()
+        response = await client.get('/api/async/students/999999/dashboard/')
+        self.assertEqual(response.status_code, 404)
+        response = await client.get('/api/async/leaderboard/?metric=height')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+        response = await client.post('/api/async/leaderboard/')
+        self.assertEqual(response.status_code, 405)
+
+    async def test_queries_on_worker_threads_are_counted(self):
+        student_id = self.students[0].pk
+        response = await AsyncClient().get(f'/api/async/students/{student_id}/dashboard/')
+        self.assertIn('db;desc="4 queries"', response['Server-Timing'])
+        self.assertEqual(metrics.snapshot()['async-student-dashboard']['max_queries'], 4)
+
+    async def test_exports_stream_under_asgi(self):
+        # The ASGI handler iterates streaming responses inside the event loop
+        client = AsyncClient()
+        for url, model in [
+            ('/api/activity-logs/export/csv/', ActivityLog),
+            ('/api/activity-logs/export/ndjson/?date_from=2000-01-01', ActivityLog),
+            ('/api/performance-metrics/export/ndjson/', PerformanceMetric),
+        ]:
+            response = await client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            header = 1 if '/csv/' in url else 0
+            self.assertEqual(len(lines), header + await model.objects.acount(), url)
+
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.teacher, self.students, _, _ = create_fixtures(student_count=3)
+        self.client = APIClient()
+
+    def test_jobs_run_to_completion_with_progress(self):
+        ActivityRollup.objects.all().delete()
+        job, created = jobs.enqueue('rebuild_rollups', {'batch_size': 2})
+        self.assertTrue(created)
+        self.assertEqual(jobs.claim('test-worker'), [job.pk])
+        self.assertEqual(jobs.claim('other-worker'), [])
+
+        self.assertEqual(jobs.execute(job.pk), Job.SUCCEEDED)
+        job.refresh_from_db()
+        self.assertEqual((job.progress_current, job.progress_total), (3, 3))
+        self.assertEqual(job.result['students'], 3)
+        self.assertTrue(ActivityRollup.objects.exists())
+
+    def test_failures_are_retried_then_failed(self):
+        calls = []
+
+        @jobs.register('always_fails')
+        def always_fails(context):
+            calls.append(context.job.attempts)
+            raise RuntimeError('boom')
+        self.addCleanup(jobs.JOB_TYPES.pop, 'always_fails')
+
+        job, _ = jobs.enqueue('always_fails', max_attempts=2)
+        jobs.claim('test-worker')
+        with self.assertLogs('fitness.jobs', 'ERROR'):
+            self.assertEqual(jobs.execute(job.pk), Job.QUEUED)
+        job.refresh_from_db()
+        self.assertGreater(job.run_after, job.started_at)
+        self.assertIn('RuntimeError: boom', job.error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.started_at)
+        jobs.claim('test-worker')
+        with self.assertLogs('fitness.jobs', 'ERROR'):
+            self.assertEqual(jobs.execute(job.pk), Job.FAILED)
+        self.assertEqual(calls, [1, 2])
+
+        # A job whose worker disappeared mid-run is retried as well
+        stale, _ = jobs.enqueue('term_report')
+        jobs.claim('lost-worker')
+        self.assertEqual(jobs.requeue_stale(stale_after=-1), 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, Job.QUEUED)
+
+    def test_teachers_enqueue_and_poll_jobs(self):
+        payload = {'kind': 'term_report', 'params': {'grade': self.students[0].grade}}
+        self.assertEqual(self.client.post('/api/jobs/', payload, format='json').status_code, 403)
+        self.client.force_authenticate(self.students[0].user)
+        self.assertEqual(self.client.get('/api/jobs/').status_code, 403)
+
+        self.client.force_authenticate(self.teacher.user)
+        response = self.client.post('/api/jobs/', payload, format='json', HTTP_IDEMPOTENCY_KEY='report-1')
+        self.assertEqual(response.status_code, 201)
+        job_id = response.json()['id']
+        repeated = self.client.post('/api/jobs/', payload, format='json', HTTP_IDEMPOTENCY_KEY='report-1')
+        self.assertEqual((repeated.status_code, repeated.json()['id']), (200, job_id))
+        conflict = self.client.post(
+            '/api/jobs/', {'kind': 'rebuild_rollups'}, format='json', HTTP_IDEMPOTENCY_KEY='report-1'
+        )
+        self.assertEqual(conflict.status_code, 409)
+        invalid = self.client.post('/api/jobs/', {'kind': 'term_report', 'params': {'term': 2}}, format='json')
+        self.assertEqual(invalid.status_code, 400)
+
+        call_command('run_jobs', processes=0, once=True, stdout=StringIO())
+        job = self.client.get(f'/api/jobs/{job_id}/').json()
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(len(job['result']['students']), 1)
+        self.assertEqual(job['result']['students'][0]['student_id'], self.students[0].pk)
+
+
+class CalorieRecalculationTests(TestCase):
+    def setUp(self):
+        _, self.students, self.exercises, _ = create_fixtures(student_count=3, logs_per_student=6)
+        self.running = self.exercises[0]
+        self.running.calories_per_minute = Decimal('12.50')
+        self.running.save()
+
+    def expected(self, log):
+        return rollups.to_calories(ActivityLog.calculate_calories(
+            log.exercise.calories_per_minute, log.duration_minutes, log.intensity
+        ))
+
+    def rollup_totals(self):
+        return sorted(ActivityRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'category', 'activity_count', 'total_calories'
+        ))
+
+    def test_recalculation_updates_logs_and_rollups(self):
+        stale = ActivityLog.objects.filter(exercise=self.running).first()
+        before = stale.updated_at
+        with self.assertLogs('fitness.jobs', 'INFO'):
+            call_command('recalculate_calories', batch_size=4, stdout=StringIO())
+
+        for log in ActivityLog.objects.select_related('exercise'):
+            self.assertEqual(log.calories_burned, self.expected(log))
+        stale.refresh_from_db()
+        self.assertGreater(stale.updated_at, before)
+        # The incremental rollup changes match rebuilding from scratch
+        maintained = self.rollup_totals()
+        rollups.rebuild_rollups()
+        self.assertEqual(maintained, self.rollup_totals())
+
+    def test_archived_logs_are_recalculated(self):
+        newest = ActivityLog.objects.order_by('-date').values_list('date', flat=True).first()
+        archive.archive_logs(newest)
+        stale = ArchivedActivityLog.objects.filter(exercise=self.running).first()
+        self.assertIsNotNone(stale)
+        self.assertNotEqual(stale.calories_burned, self.expected(stale))
+
+        with self.assertLogs('fitness.jobs', 'INFO'):
+            call_command('recalculate_calories', batch_size=4, stdout=StringIO())
+
+        for log in ArchivedActivityLog.objects.select_related('exercise'):
+            self.assertEqual(log.calories_burned, self.expected(log))
+        for log in ActivityLog.objects.select_related('exercise'):
+            self.assertEqual(log.calories_burned, self.expected(log))
+        maintained = self.rollup_totals()
+        rollups.rebuild_rollups()
+        self.assertEqual(maintained, self.rollup_totals())
+
+    def test_interrupted_recalculation_resumes_from_its_checkpoint(self):
+        logs = list(ActivityLog.objects.filter(exercise=self.running).order_by('pk'))
+        job, _ = jobs.enqueue('recalculate_calories', {'exercise_ids': [self.running.pk]})
+        jobs.claim_job(job.pk, 'crashed-worker')
+        Job.objects.filter(pk=job.pk).update(checkpoint={'last_id': logs[0].pk, 'scanned': 1, 'updated': 1})
+
+        with self.assertLogs('fitness.jobs', 'INFO'):
+            call_command('recalculate_calories', resume=job.pk, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.result['scanned'], len(logs))
+        first, *rest = [ActivityLog.objects.get(pk=log.pk) for log in logs]
+        self.assertNotEqual(first.calories_burned, self.expected(first))
+        for log in rest:
+            self.assertEqual(log.calories_burned, self.expected(log))
+
+    def test_admin_action_queues_one_job_per_rate_change(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        self.client.login(username='admin', password='admin123')
+        data = {'action': 'recalculate_calories', '_selected_action': [self.running.pk]}
+        self.client.post('/admin/fitness/exercise/', data)
+        self.client.post('/admin/fitness/exercise/', data)
+        self.assertEqual(Job.objects.filter(kind='recalculate_calories').count(), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.params, {'exercise_ids': [self.running.pk]})
+
+
+class FitnessTrendTests(TransactionTestCase):
+    # Reads go through the analytics alias, a separate connection that only
+    # sees committed rows
+    databases = {'default', 'analytics'}
+
+    def setUp(self):
+        self.teacher, self.students, _, _ = create_fixtures(student_count=2, logs_per_student=1)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher.user)
+        self.student = self.students[0]
+        # Two years of weekly assessments, starting on a Monday
+        self.start = date(2024, 1, 1)
+        for week in range(104):
+            PerformanceMetric.objects.create(
+                student=self.student, date=self.start + timedelta(weeks=week),
+                fitness_score=40 + week % 30, weight_kg=Decimal('60.50'),
+                pushups_count=week if week % 2 else None,
+            )
+
+    def rollup_rows(self):
+        return sorted(MetricRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'sample_count', 'fitness_score_sum',
+            'pushups_count_samples', 'weight_kg_sum',
+        ))
+
+    def test_rollups_follow_metric_edits(self):
+        moved = PerformanceMetric.objects.get(student=self.student, date=self.start)
+        moved.date = date(2023, 12, 20)
+        moved.fitness_score = 99
+        moved.save()
+        PerformanceMetric.objects.filter(student=self.student, date=self.start + timedelta(weeks=5)).get().delete()
+
+        maintained = self.rollup_rows()
+        trends.rebuild_rollups()
+        self.assertEqual(maintained, self.rollup_rows())
+        self.assertFalse(MetricRollup.objects.filter(period='week', period_start=self.start).exists())
+
+    def test_monthly_buckets_average_the_month(self):
+        response = self.client.get(f'/api/students/{self.student.pk}/fitness-trend/', {
+            'start': '2024-01-01', 'end': '2024-12-31', 'bucket': 'month',
+            'metrics': 'fitness_score,pushups_count',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['bucket'], 'month')
+        scores = response.data['series']['fitness_score']
+        self.assertEqual(len(scores), 12)
+        january = PerformanceMetric.objects.filter(
+            student=self.student, date__lt=date(2024, 2, 1)
+        ).values_list('fitness_score', flat=True)
+        self.assertEqual(scores[0], {'date': date(2024, 1, 1), 'value': sum(january) / len(january)})
+        self.assertEqual(set(response.data['series']), {'fitness_score', 'pushups_count'})
+
+    def test_long_ranges_are_downsampled(self):
+        url = f'/api/students/{self.student.pk}/fitness-trend/'
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {
+                'end': '2025-12-31', 'bucket': 'day', 'points': 20, 'metrics': 'fitness_score',
+            })
+        self.assertLessEqual(len(queries), 4)
+        scores = response.data['series']['fitness_score']
+        self.assertEqual(len(scores), 20)
+        self.assertEqual(scores[0]['date'], self.start)
+        self.assertEqual(scores[-1]['date'], self.start + timedelta(weeks=103))
+
+        # Without a bucket, the finest one that fits the requested points is used
+        response = self.client.get(url, {'points': 200})
+        self.assertEqual(response.data['bucket'], 'week')
+        self.assertEqual(len(response.data['series']['weight_kg']), 104)
+        self.assertEqual(response.data['series']['weight_kg'][0]['value'], 60.5)
+
+    def test_class_series_averages_the_grade(self):
+        other = self.students[1]
+        PerformanceMetric.objects.create(student=other, date=self.start, fitness_score=80)
+        response = self.client.get('/api/fitness-trend/', {
+            'start': '2024-01-01', 'end': '2024-01-07', 'bucket': 'week', 'metrics': 'fitness_score',
+        })
+        self.assertEqual(response.data['series']['fitness_score'], [{'date': self.start, 'value': 60.0}])
+        response = self.client.get('/api/fitness-trend/', {
+            'grade': self.student.grade, 'start': '2024-01-01', 'end': '2024-01-07', 'bucket': 'day',
+        })
+        self.assertEqual(response.data['series']['fitness_score'], [{'date': self.start, 'value': 40.0}])
+
+        for params in [{'metrics': 'height'}, {'bucket': 'year'}, {'start': 'soon'},
+                       {'start': '2025-01-01', 'end': '2024-01-01'}, {'grade': 'ninth'}]:
+            self.assertEqual(self.client.get('/api/fitness-trend/', params).status_code, 400)
+
+    def test_lttb_keeps_extremes(self):
+        points = [(self.start + timedelta(days=day), 0.0) for day in range(100)]
+        points[37] = (points[37][0], 10.0)
+        sampled = trends.lttb(points, 10)
+        self.assertEqual(len(sampled), 10)
+        self.assertIn(points[37], sampled)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+
+
+class ClassAnalyticsTests(TransactionTestCase):
+    # Reads go through the analytics alias, a separate connection that only
+    # sees committed rows
+    databases = {'default', 'analytics'}
+
+    def setUp(self):
+        cache.clear()
+        self.teacher, self.students, _, _ = create_fixtures(student_count=5, logs_per_student=3)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher.user)
+        # A ninth grader without any activity this week
+        idle = User.objects.create_user(username='idle', password='idle123')
+        self.idle = Student.objects.create(user=idle, grade=9, age=14, fitness_level='advanced')
+
+    def test_grade_distributions(self):
+        response = self.client.get('/api/class-analytics/', {'window': 'term'})
+        self.assertEqual(response.status_code, 200)
+        grades = {row['grade']: row for row in response.data['by_grade']}
+        self.assertEqual(sorted(grades), [9, 10, 11, 12])
+
+        ninth = Student.objects.filter(grade=9).exclude(pk=self.idle.pk)
+        calories = sorted([0.0] + [
+            float(sum(log.calories_burned for log in ActivityLog.objects.filter(student=student)))
+            for student in ninth
+        ])
+        self.assertEqual(grades[9]['students'], 3)
+        self.assertEqual(grades[9]['participation_rate'], round(2 / 3, 4))
+        self.assertEqual(grades[9]['calories']['median'], calories[1])
+        self.assertEqual(grades[9]['calories']['p90'], round(calories[1] + (calories[2] - calories[1]) * 0.8, 2))
+        self.assertEqual(grades[9]['fitness_score']['count'], 2)
+        self.assertEqual(response.data['overall']['students'], 6)
+        levels = {row['fitness_level']: row['students'] for row in response.data['by_fitness_level']}
+        self.assertEqual(levels, {'advanced': 1, 'beginner': 5})
+
+    def test_results_are_cached_for_the_day(self):
+        self.client.get('/api/class-analytics/')
+        with CaptureQueriesContext(connection) as queries, \
+                CaptureQueriesContext(connections['analytics']) as analytics_queries:
+            response = self.client.get('/api/class-analytics/')
+        self.assertEqual(len(queries) + len(analytics_queries), 0)
+        self.assertEqual(response.data['window'], 'term')
+        self.assertEqual(response.data['date'], date.today())
+
+    def test_teachers_only(self):
+        self.assertEqual(self.client.get('/api/class-analytics/', {'window': 'year'}).status_code, 400)
+        self.client.force_authenticate(user=self.students[0].user)
+        self.assertEqual(self.client.get('/api/class-analytics/').status_code, 403)
+
+
+class BulkAssignmentTests(TestCase):
+    def setUp(self):
+        self.teacher, self.students, _, self.plans = create_fixtures(student_count=8, logs_per_student=0)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.teacher.user)
+        self.url = '/api/student-workout-plans/bulk-assign/'
+
+    def test_skips_active_assignments_in_constant_queries(self):
+        plan = self.plans[0]
+        ninth = [student.pk for student in self.students if student.grade == 9]
+        tenth = [student.pk for student in self.students if student.grade == 10]
+        # The fixtures gave the ninth graders this plan, but not the tenth graders
+        active = set(StudentWorkoutPlan.objects.filter(
+            workout_plan=plan, student_id__in=ninth + tenth
+        ).values_list('student_id', flat=True))
+        self.assertEqual(active, set(ninth))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {
+                'workout_plan_id': plan.pk, 'student_ids': ninth + tenth,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertLessEqual(len(queries), 6)
+        self.assertEqual(response.data, {
+            'workout_plan_id': plan.pk, 'matched': len(ninth + tenth), 'created': len(tenth),
+            'skipped_active': len(ninth), 'unmatched_student_ids': [],
+        })
+        self.assertEqual(StudentWorkoutPlan.objects.filter(
+            workout_plan=plan, student_id__in=ninth + tenth
+        ).count(), len(ninth + tenth))
+
+        # Repeating the request creates nothing new
+        response = self.client.post(self.url, {'workout_plan_id': plan.pk, 'grade': 10}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 0)
+
+    def test_explicit_ids_report_unmatched_students(self):
+        plan = self.plans[1]
+        ids = [self.students[0].pk, self.students[1].pk, 9999]
+        response = self.client.post(self.url, {
+            'workout_plan_id': plan.pk, 'student_ids': ids, 'fitness_level': 'beginner',
+            'start_date': '2024-03-01', 'end_date': '2024-04-01',
+        }, format='json')
+        self.assertEqual(response.data['unmatched_student_ids'], [9999])
+        assignment = StudentWorkoutPlan.objects.filter(workout_plan=plan, start_date=date(2024, 3, 1)).first()
+        self.assertEqual(assignment.assigned_by, self.teacher)
+        self.assertEqual(assignment.end_date, date(2024, 4, 1))
+
+    def test_rejects_unfiltered_and_non_teacher_requests(self):
+        response = self.client.post(self.url, {'workout_plan_id': self.plans[0].pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(user=self.students[0].user)
+        response = self.client.post(self.url, {'workout_plan_id': self.plans[0].pk, 'grade': 9}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        _, self.students, self.exercises, _ = create_fixtures(student_count=3, logs_per_student=2)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.this_month = date.today().replace(day=1)
+        self.last_month = (self.this_month - timedelta(days=1)).replace(day=1)
+        for student in self.students:
+            for index, day in enumerate(range(0, 20, 3)):
+                ActivityLog.objects.create(
+                    student=student, exercise=self.exercises[index % 3],
+                    date=self.last_month - timedelta(days=day), duration_minutes=10 + day,
+                    intensity=['low', 'medium', 'high'][index % 3],
+                )
+            PerformanceMetric.objects.create(
+                student=student, date=self.last_month + timedelta(days=3), fitness_score=50 + student.pk,
+                weight_kg=Decimal('55.25'),
+            )
+
+    def export(self):
+        return snapshots.export(directory=self.directory.name)
+
+    def live_totals(self, logs):
+        totals = logs.aggregate(activities=Count('id'), minutes=Sum('duration_minutes'),
+                                calories=Sum('calories_burned'))
+        return totals['activities'], totals['minutes'], rollups.to_calories(totals['calories'])
+
+    def test_closed_months_match_the_live_tables(self):
+        written = self.export()
+        self.assertTrue(all(changed for *_, changed in written))
+        self.assertNotIn(self.this_month, [month for _, month, _, _ in written])
+
+        by_month = history.activity_totals(directory=self.directory.name)
+        for row in by_month:
+            logs = ActivityLog.objects.filter(date__gte=row['month'], date__lt=snapshots.next_month(row['month']))
+            self.assertEqual((row['activities'], row['minutes'], row['calories']), self.live_totals(logs))
+
+        student = self.students[0]
+        start = self.last_month - timedelta(days=10)
+        [row] = history.activity_totals(
+            start=start, by='student', student_ids=[student.pk], directory=self.directory.name
+        )
+        logs = ActivityLog.objects.filter(student=student, date__gte=start, date__lt=self.this_month)
+        self.assertEqual((row['activities'], row['minutes'], row['calories']), self.live_totals(logs))
+
+        intensities = history.activity_totals(by='intensity', directory=self.directory.name)
+        self.assertEqual({row['intensity'] for row in intensities}, {'low', 'medium', 'high'})
+        [weights] = history.metric_averages('weight_kg', by='year', directory=self.directory.name)
+        self.assertEqual((weights['count'], weights['mean']), (3, 55.25))
+
+    def test_only_changed_months_are_rewritten(self):
+        self.export()
+        self.assertFalse(any(changed for *_, changed in self.export()))
+
+        log = ActivityLog.objects.filter(date=self.last_month).first()
+        log.duration_minutes += 5
+        log.save()
+        rewritten = [(table, month) for table, month, _, changed in self.export() if changed]
+        self.assertEqual(rewritten, [('activity_logs', self.last_month)])
+
+    def test_columns_are_memory_mapped_views(self):
+        self.export()
+        path = snapshots.snapshot_path('activity_logs', self.last_month, self.directory.name)
+        with snapshots.Snapshot(path) as snapshot:
+            days = snapshot.columns['date']
+            self.assertIsInstance(days, memoryview)
+            self.assertEqual(days.format, 'i')
+            self.assertEqual(snapshots.from_day(days[0]), self.last_month)
+            self.assertEqual(len(days), snapshot.rows)
+
+
+class ActivityArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.students, self.exercises, _ = create_fixtures(student_count=3, logs_per_student=2)
+        self.cutoff = date.today() - timedelta(days=200)
+        for student in self.students:
+            for days in (210, 250, 400):
+                ActivityLog.objects.create(
+                    student=student, exercise=self.exercises[days % 3], date=date.today() - timedelta(days=days),
+                    duration_minutes=days // 10, intensity='high',
+                )
+        self.client = APIClient()
+
+    def rollup_rows(self):
+        return sorted(ActivityRollup.objects.values_list(
+            'student_id', 'period', 'period_start', 'category',
+            'activity_count', 'total_minutes', 'total_calories'
+        ))
+
+    def test_archiving_moves_old_logs_and_keeps_rollups(self):
+        before = self.rollup_rows()
+        old_ids = set(ActivityLog.objects.filter(date__lt=self.cutoff).values_list('id', flat=True))
+        self.assertEqual(archive.archive_logs(self.cutoff, batch_size=4), 9)
+
+        self.assertFalse(ActivityLog.objects.filter(date__lt=self.cutoff).exists())
+        self.assertEqual(set(ArchivedActivityLog.objects.values_list('id', flat=True)), old_ids)
+        self.assertEqual(ActivityLog.objects.count(), 6)
+        self.assertEqual(self.rollup_rows(), before)
+        self.assertEqual(archive.boundary(), date.today() - timedelta(days=210))
+
+        rollups.rebuild_rollups()
+        self.assertEqual(self.rollup_rows(), before)
+
+    def test_boundary_sees_archival_by_other_processes(self):
+        self.assertIsNone(archive.boundary())
+        # Rows written by an archiving worker, which clears nothing in this process
+        ArchivedActivityLog.objects.bulk_create([
+            ArchivedActivityLog(**row) for row in archive.pending(self.cutoff).values(*archive.FIELDS)
+        ])
+        self.assertEqual(archive.boundary(), date.today() - timedelta(days=210))
+        self.assertTrue(archive.includes_archive(date.today() - timedelta(days=300)))
+
+    def test_export_reads_the_archive_only_when_the_range_needs_it(self):
+        everything = list(ActivityLog.objects.order_by('date', 'id').values_list('id', flat=True))
+        archive.archive_logs(self.cutoff)
+
+        response = self.client.get('/api/activity-logs/export/ndjson/')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], everything)
+        self.assertEqual(rows[0]['first_name'], 'First0')
+
+        recent = date.today() - timedelta(days=30)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/activity-logs/export/csv/?date_from={recent}')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + 6)
+        # Only the one-row boundary lookup touches the archive
+        archive_queries = [query['sql'] for query in queries if ArchivedActivityLog._meta.db_table in query['sql']]
+        self.assertEqual(len(archive_queries), 1)
+        self.assertIn('LIMIT 1', archive_queries[0])
+
+    def test_snapshots_and_cutoff_follow_the_archive(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        snapshots.export(directory=directory.name)
+        archive.archive_logs(self.cutoff)
+        self.assertFalse(any(changed for *_, changed in snapshots.export(directory=directory.name)))
+
+        with override_settings(OCTOFIT_ARCHIVE_AFTER_DAYS=0):
+            self.assertEqual(archive.default_cutoff(), leaderboard.window_start('term'))
+        out = StringIO()
+        call_command('archive_activity_logs', '--before', date.today().isoformat(), '--dry-run', stdout=out)
+        self.assertIn('3 logs dated before', out.getvalue())
+        self.assertEqual(ActivityLog.objects.count(), 6)
+
+    def test_queued_archival_stops_at_the_cutoff(self):
+        self.client.force_authenticate(Teacher.objects.first().user)
+        cutoff = archive.default_cutoff()
+        for before, expected in [(date.today(), 400), (cutoff + timedelta(days=1), 400), ('soon', 400),
+                                 (cutoff, 201), (None, 201)]:
+            params = {} if before is None else {'before': str(before)}
+            response = self.client.post(
+                '/api/jobs/', {'kind': 'archive_activity_logs', 'params': params}, format='json'
+            )
+            self.assertEqual(response.status_code, expected, before)
+        with self.assertRaisesMessage(CommandError, 'later than the archive cutoff'):
+            call_command('archive_activity_logs', '--before', date.today().isoformat(), '--background')
+        self.assertEqual(Job.objects.count(), 2)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        _, self.students, self.exercises, _ = create_fixtures(student_count=3, logs_per_student=3)
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+        self.client.login(username='admin', password='admin123')
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = ['/admin/fitness/activitylog/', '/admin/fitness/performancemetric/',
+                f'/admin/fitness/activitylog/?date__year={date.today().year}', '/admin/fitness/activitylog/?q=Last']
+        before = [self.changelist_queries(url) for url in urls]
+        for index in range(30):
+            student = Student.objects.create(
+                user=User.objects.create_user(f'extra{index}', first_name='Extra', last_name=f'Last{index}'),
+                grade=10, age=15,
+            )
+            ActivityLog.objects.create(student=student, exercise=self.exercises[index % 3], date=date.today(),
+                                       duration_minutes=15)
+            PerformanceMetric.objects.create(student=student, date=date.today(), fitness_score=70)
+        after = [self.changelist_queries(url) for url in urls]
+        self.assertEqual(after, before)
+        self.assertLessEqual(max(after), 10)
+
+    def test_search_and_date_navigation(self):
+        response = self.client.get('/admin/fitness/activitylog/?q=first1+last')
+        self.assertEqual(
+            {log.student_id for log in response.context['cl'].result_list}, {self.students[1].pk}
+        )
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+        ActivityLog.objects.create(student=self.students[0], exercise=self.exercises[0],
+                                   date=date.today() - timedelta(days=400), duration_minutes=10)
+        response = self.client.get('/admin/fitness/activitylog/')
+        self.assertContains(response, f'date__year={date.today().year}')
+        self.assertContains(response, f'date__year={date.today().year - 1}')
+
+    def test_forms_use_autocomplete(self):
+        response = self.client.get('/admin/fitness/activitylog/add/')
+        content = response.content.decode()
+        self.assertIn('admin-autocomplete', content)
+        self.assertNotIn(str(self.students[0]), content)
+
+    def test_unfiltered_count_is_estimated_for_large_tables(self):
+        with mock.patch.object(fitness_admin, 'estimated_count', return_value=250000):
+            response = self.client.get('/admin/fitness/activitylog/')
+            self.assertContains(response, '250000 activity logs')
+            response = self.client.get('/admin/fitness/activitylog/?intensity__exact=high')
+            self.assertContains(response, '3 activity logs')
+        response = self.client.get('/admin/fitness/activitylog/')
+        self.assertContains(response, '9 activity logs')
+
+
+class HealthTests(TestCase):
+    # The health check pings every alias
+    databases = {'default', 'analytics'}
+
+    def test_reports_databases_and_pools(self):
+        response = APIClient().get('/api/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'ok')
+        self.assertEqual(set(response.data['databases']), {'default', 'analytics'})
+        self.assertTrue(all(database['ok'] for database in response.data['databases'].values()))
+        self.assertIsInstance(response.data['pools'], list)
+        self.assertEqual(analytics.database(), 'analytics')
+        # Without the configured alias the analytics reads use the default database
+        with override_settings(OCTOFIT_ANALYTICS_DATABASE='replica'):
+            self.assertEqual(analytics.database(), 'default')
+
+    def test_unreachable_database_is_503(self):
+        with mock.patch.object(fitness_views, '_ping', side_effect=OSError('No servers found')):
+            response = APIClient().get('/api/health/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.data['databases']['default'], {'ok': False, 'error': 'No servers found'})
+
+    def test_pool_stats(self):
+        stats = pool.PoolStats(max_pool_size=4)
+        address = ('db1', 27017)
+        stats.change(address, open=1, waiting=1)
+        stats.change(address, waiting=-1, in_use=1, checkouts=1)
+        stats.change(address, open=1, waiting=1)
+        stats.change(address, waiting=-1, in_use=1, checkouts=1)
+        stats.change(address, in_use=-1)
+        server = stats.as_dict()['servers']['db1:27017']
+        self.assertEqual(
+            (server['open'], server['in_use'], server['idle'], server['peak_in_use'], server['checkouts']),
+            (2, 1, 1, 2, 2)
+        )
+        self.assertEqual(server['utilization'], 0.25)
+
+
+@skipUnless(connection.vendor == 'djongo', 'the native pipelines run on MongoDB only')
+class NativeAggregationTests(TestCase):
+    """The pymongo pipelines answer exactly like the ORM queries they replace"""
+
+    databases = {'default', 'analytics'}
+
+    def setUp(self):
+        cache.clear()
+        _, self.students, _, _ = create_fixtures(student_count=6, logs_per_student=5)
+        today = date.today()
+        for index, student in enumerate(self.students):
+            # An older assessment and one without a score, neither of which is the latest
+            PerformanceMetric.objects.create(student=student, date=today - timedelta(days=40),
+                                             fitness_score=90 - index)
+            PerformanceMetric.objects.create(student=student, date=today - timedelta(days=2), weight_kg=50)
+            ActivityLog.objects.create(student=student, exercise_id=ActivityLog.objects.first().exercise_id,
+                                       date=today - timedelta(days=45), duration_minutes=10 * index)
+
+    def assertSameAnswer(self, function, *args):
+        with override_settings(OCTOFIT_NATIVE_AGGREGATION=False):
+            expected = function(*args)
+        with override_settings(OCTOFIT_NATIVE_AGGREGATION=True):
+            self.assertTrue(pipelines.enabled())
+            self.assertEqual(function(*args), expected)
+
+    def test_dashboard_totals(self):
+        for student in self.students:
+            self.assertSameAnswer(fitness_views.dashboard_totals, student.pk)
+        self.assertSameAnswer(fitness_views.dashboard_totals, 0)
+
+    def test_leaderboards(self):
+        for metric in leaderboard.METRICS:
+            for window in leaderboard.WINDOWS:
+                for grade in (None, 9, 13):
+                    self.assertSameAnswer(leaderboard.build_ranking, metric, window, grade)
+
+    def test_class_analytics(self):
+        for window in leaderboard.WINDOWS:
+            self.assertSameAnswer(analytics.build_analytics, window)
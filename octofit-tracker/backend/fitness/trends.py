@@ -0,0 +1,243 @@
+"""
+Performance metric time series over arbitrary date ranges.
+
+Week and month buckets are read from MetricRollup rows, which hold per
+student sums and sample counts and are refreshed whenever a
+PerformanceMetric is written, so a multi-year series costs one indexed range
+scan of a few hundred rows. Day buckets come straight from PerformanceMetric,
+which already holds at most one row per student and day. Series longer than
+the requested number of points are downsampled with Largest-Triangle-Three-
+Buckets, which keeps the peaks and dips a chart needs to show. Series are
+read from the analytics database alias.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, Sum
+
+from . import analytics, rollups
+from .models import MetricRollup, PerformanceMetric
+
+METRICS = [
+    'fitness_score', 'weight_kg', 'pushups_count', 'situps_count', 'mile_time_seconds',
+    'flexibility_cm',
+]
+BUCKETS = ['day', 'week', 'month']
+PERIODS = [period for period, _ in MetricRollup.PERIOD_CHOICES]
+
+_BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 30}
+
+
+def next_period_start(period, start):
+    """Return the first day after the period that begins on ``start``"""
+    if period == 'week':
+        return start + timedelta(days=7)
+    if period == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+def _empty_totals():
+    totals = {'sample_count': 0}
+    for metric in METRICS:
+        totals[f'{metric}_sum'] = 0
+        totals[f'{metric}_samples'] = 0
+    return totals
+
+
+def collect_totals(rows, totals=None):
+    """
+    Accumulate week and month bucket totals for ``rows``.
+
+    Each row is a mapping with ``student_id``, ``date`` and the metric
+    fields, any of which may be None.
+    """
+    if totals is None:
+        totals = defaultdict(_empty_totals)
+    for row in rows:
+        for period in PERIODS:
+            total = totals[(row['student_id'], period, rollups.period_start(period, row['date']))]
+            total['sample_count'] += 1
+            for metric in METRICS:
+                if row[metric] is not None:
+                    total[f'{metric}_sum'] += row[metric]
+                    total[f'{metric}_samples'] += 1
+    return totals
+
+
+def metric_row(metric):
+    """Build a totals row from a PerformanceMetric instance"""
+    row = {
+        'student_id': metric.student_id,
+        # Instances may still hold raw assigned values such as ISO date strings
+        'date': PerformanceMetric._meta.get_field('date').to_python(metric.date),
+    }
+    for name in METRICS:
+        row[name] = PerformanceMetric._meta.get_field(name).to_python(getattr(metric, name))
+    return row
+
+
+def insert_rollups(totals, batch_size=1000):
+    """Bulk insert accumulated totals; only valid when none of the buckets exist yet"""
+    MetricRollup.objects.bulk_create(
+        (
+            MetricRollup(student_id=student_id, period=period, period_start=start, **values)
+            for (student_id, period, start), values in totals.items()
+        ),
+        batch_size=batch_size,
+    )
+
+
+def rebuild_rollups(student_ids=None, batch_size=1000):
+    """Recompute metric rollups from scratch; returns the number of rows written"""
+    metrics = PerformanceMetric.objects.all()
+    existing = MetricRollup.objects.all()
+    if student_ids is not None:
+        metrics = metrics.filter(student_id__in=student_ids)
+        existing = existing.filter(student_id__in=student_ids)
+
+    totals = collect_totals(metrics.order_by().values('student_id', 'date', *METRICS).iterator())
+    with transaction.atomic():
+        existing.delete()
+        insert_rollups(totals, batch_size=batch_size)
+    return len(totals)
+
+
+def refresh_buckets(student_id, day):
+    """Recompute the week and month buckets of one student that contain ``day``"""
+    aggregates = {'sample_count': Count('id')}
+    for metric in METRICS:
+        aggregates[f'{metric}_sum'] = Sum(metric)
+        aggregates[f'{metric}_samples'] = Count(metric)
+
+    for period in PERIODS:
+        start = rollups.period_start(period, day)
+        lookup = {'student_id': student_id, 'period': period, 'period_start': start}
+        values = PerformanceMetric.objects.filter(
+            student_id=student_id, date__gte=start, date__lt=next_period_start(period, start)
+        ).aggregate(**aggregates)
+        values = {name: value or 0 for name, value in values.items()}
+
+        with transaction.atomic():
+            if not values['sample_count']:
+                MetricRollup.objects.filter(**lookup).delete()
+            elif not MetricRollup.objects.filter(**lookup).update(**values):
+                try:
+                    with transaction.atomic():
+                        MetricRollup.objects.create(**lookup, **values)
+                except IntegrityError:
+                    # Another writer created the bucket first
+                    MetricRollup.objects.filter(**lookup).update(**values)
+
+
+def choose_bucket(start, end, points):
+    """The finest bucket that covers ``start`` to ``end`` in at most ``points`` buckets"""
+    days = (end - start).days + 1
+    for bucket in BUCKETS:
+        if days / _BUCKET_DAYS[bucket] <= points:
+            return bucket
+    return BUCKETS[-1]
+
+
+def first_date(student_id=None, grade=None):
+    """Date of the earliest metric in scope, or None if there is none"""
+    queryset = _scope(PerformanceMetric.objects.using(analytics.database()), student_id, grade)
+    return queryset.order_by('date').values_list('date', flat=True).first()
+
+
+def _scope(queryset, student_id, grade):
+    if student_id is not None:
+        queryset = queryset.filter(student_id=student_id)
+    if grade is not None:
+        queryset = queryset.filter(student__grade=grade)
+    return queryset
+
+
+def _value(total, samples):
+    if not samples:
+        return None
+    return round(float(Decimal(total) / samples), 2)
+
+
+def get_series(metrics, start, end, bucket, student_id=None, grade=None):
+    """
+    Return ``{metric: [(date, value), ...]}`` for one student, or averaged over a grade.
+
+    Week and month values are the mean of every metric recorded in buckets
+    overlapping ``start`` to ``end``; buckets without a value are left out.
+    """
+    if bucket == 'day':
+        queryset = _scope(
+            PerformanceMetric.objects.using(analytics.database()), student_id, grade
+        ).filter(date__gte=start, date__lte=end).order_by('date')
+        if student_id is not None:
+            # Unique per student and day, so each row is already a bucket
+            rows = list(queryset.values_list('date', *metrics))
+            return {
+                metric: [(row[0], _value(row[index], 1)) for row in rows if row[index] is not None]
+                for index, metric in enumerate(metrics, start=1)
+            }
+        rows = list(queryset.values('date').annotate(**{
+            f'{metric}_avg': Avg(metric) for metric in metrics
+        }).values_list('date', *[f'{metric}_avg' for metric in metrics]))
+        return {
+            metric: [(row[0], round(float(row[index]), 2)) for row in rows if row[index] is not None]
+            for index, metric in enumerate(metrics, start=1)
+        }
+
+    columns = [f'{metric}_{part}' for metric in metrics for part in ('sum', 'samples')]
+    queryset = _scope(MetricRollup.objects.using(analytics.database()), student_id, grade).filter(
+        period=bucket,
+        period_start__gte=rollups.period_start(bucket, start),
+        period_start__lte=end,
+    ).order_by('period_start')
+    if student_id is None:
+        queryset = queryset.values('period_start').annotate(**{
+            f'{column}_total': Sum(column) for column in columns
+        })
+        columns = [f'{column}_total' for column in columns]
+    rows = list(queryset.values_list('period_start', *columns))
+
+    series = {}
+    for index, metric in enumerate(metrics):
+        total, samples = 1 + index * 2, 2 + index * 2
+        series[metric] = [
+            (row[0], _value(row[total], row[samples])) for row in rows if row[samples]
+        ]
+    return series
+
+
+def lttb(points, threshold):
+    """
+    Downsample ``(date, value)`` points to ``threshold`` with Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; every other bucket keeps the
+    point forming the largest triangle with the previous pick and the mean
+    of the next bucket.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+    xs = [day.toordinal() for day, _ in points]
+    ys = [value for _, value in points]
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    previous = 0
+    for bucket in range(threshold - 2):
+        next_start = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, len(points))
+        mean_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        mean_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        ax, ay = xs[previous], ys[previous]
+        best, best_area = None, -1
+        for index in range(int(bucket * every) + 1, next_start):
+            area = abs((ax - mean_x) * (ys[index] - ay) - (ax - xs[index]) * (mean_y - ay))
+            if area > best_area:
+                best, best_area = index, area
+        sampled.append(points[best])
+        previous = best
+    sampled.append(points[-1])
+    return sampled
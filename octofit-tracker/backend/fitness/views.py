@@ -1,22 +1,215 @@
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, SAFE_METHODS
+from django.conf import settings
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
-from django.db.models import Sum, Count, Q
-from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Sum, Count, Max, OuterRef, Q, Subquery
+from django.utils.http import parse_http_date_safe
+import time
+from datetime import date, datetime, timedelta
+from octofit_tracker.mongodb import pool
+from .fastpath import UnsupportedField, ValuesSerializer
+from .ingest import ingest_activity_logs
+from . import (
+    analytics, archive, assignments, catalog_cache, conditional, exports, jobs, metrics, pipelines, trends
+)
+from .leaderboard import METRICS, WINDOWS, get_ranking
 from .models import (
     Student, Teacher, WorkoutPlan, Exercise, WorkoutPlanExercise,
-    StudentWorkoutPlan, ActivityLog, PerformanceMetric
+    StudentWorkoutPlan, ActivityLog, ArchivedActivityLog, PerformanceMetric, ActivityRollup, Job
 )
+from .pagination import ActivityLogCursorPagination, PerformanceMetricCursorPagination
+from .parsers import NDJSONParser
+from .permissions import IsTeacher
 from .serializers import (
     StudentSerializer, StudentRegistrationSerializer, TeacherSerializer,
     WorkoutPlanSerializer, ExerciseSerializer, WorkoutPlanExerciseSerializer,
     StudentWorkoutPlanSerializer, ActivityLogSerializer, PerformanceMetricSerializer,
-    DashboardStatsSerializer
+    DashboardStatsSerializer, DynamicFieldsMixin, JobSerializer
 )
 
+BULK_MAX_ROWS = 10000
+
+
+class EagerLoadingMixin:
+    """Apply the serializer's declared select/prefetch plan to the queryset"""
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        if hasattr(serializer_class, 'setup_eager_loading'):
+            queryset = serializer_class.setup_eager_loading(queryset)
+        return queryset
+
+
+class SparseFieldsetMixin:
+    """Pass ``?fields=`` and ``?expand=`` through to serializers that support them"""
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = self.get_serializer_class()
+        if self.request.method in SAFE_METHODS and issubclass(serializer_class, DynamicFieldsMixin):
+            params = self.request.query_params
+            if params.get('fields'):
+                kwargs['fields'] = params['fields'].split(',')
+            if 'expand' in params:
+                kwargs['expand'] = [name for name in params['expand'].split(',') if name]
+        request_metrics = getattr(self.request, 'metrics', None)
+        if request_metrics is not None:
+            request_metrics.start_serialization()
+        return super().get_serializer(*args, **kwargs)
+
+
+class ConditionalGetMixin:
+    """Answer conditional GETs with 304 before anything is serialized"""
+    conditional_timestamp_fields = ['updated_at']
+    # Pages of page-number lists get ETags; keyset-paginated lists opt out
+    conditional_list = True
+
+    def list(self, request, *args, **kwargs):
+        etag = self.list_etag(request) if self.conditional_list else None
+        if etag is None:
+            return super().list(request, *args, **kwargs)
+        # A delete can leave the latest timestamp as it was, so lists are validated by ETag only
+        return self.conditional_response(request, (etag, None), super().list, *args, **kwargs)
+
+    def list_etag(self, request):
+        """ETag from the row count and the rows of the requested page, or None"""
+        paginator = self.paginator
+        page_size = paginator.get_page_size(request) if isinstance(paginator, PageNumberPagination) else None
+        if not page_size:
+            return None
+        try:
+            number = int(request.query_params.get(paginator.page_query_param, 1))
+        except ValueError:
+            # 'last' and invalid page numbers are answered without validators
+            return None
+        if number < 1:
+            return None
+        row_count, rows = conditional.page_state(
+            self.filter_queryset(self.get_queryset()), (number - 1) * page_size, page_size,
+            self.conditional_timestamp_fields
+        )
+        return conditional.make_etag(request, row_count, rows)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = {self.lookup_field: kwargs[self.lookup_url_kwarg or self.lookup_field]}
+        try:
+            row_count, latest = conditional.queryset_state(
+                self.filter_queryset(self.get_queryset()).filter(**lookup),
+                self.conditional_timestamp_fields
+            )
+        except (TypeError, ValueError, ValidationError):
+            row_count = 0
+        if not row_count:
+            return super().retrieve(request, *args, **kwargs)
+        validators = (conditional.make_etag(request, latest), conditional.to_timestamp(latest))
+        return self.conditional_response(request, validators, super().retrieve, *args, **kwargs)
+
+    def conditional_response(self, request, validators, view, *args, **kwargs):
+        etag, last_modified = validators
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            conditional.set_validators(response, etag, last_modified)
+        return response
+
+
+class ValuesListMixin:
+    """
+    Build list responses from ``.values()`` rows instead of model instances.
+
+    The output is identical to the regular serializer path, which is still
+    used when ``OCTOFIT_FAST_READS`` is off or a serializer cannot be read
+    from value rows.
+    """
+
+    def list(self, request, *args, **kwargs):
+        values_serializer = self.get_values_serializer()
+        if values_serializer is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = values_serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(values_serializer.represent(page))
+        return Response(values_serializer.represent(queryset))
+
+    def get_values_serializer(self):
+        if not getattr(settings, 'OCTOFIT_FAST_READS', True):
+            return None
+        # Cursor pagination reads the ordering columns of the boundary rows
+        ordering = getattr(self.paginator, 'ordering', ())
+        try:
+            return ValuesSerializer(
+                self.get_serializer(), extra_columns=[name.lstrip('-') for name in ordering]
+            )
+        except UnsupportedField:
+            return None
+
+
+class StreamingExportMixin:
+    """
+    Stream every matching row as CSV or NDJSON from ``export/<format>/``.
+
+    Unlike the paginated list, the export is not limited to a page; rows are
+    fetched in chunks and written out as they arrive.
+    """
+    export_columns = ()
+    export_filename = 'export'
+
+    def export_querysets(self, params):
+        """The filtered querysets whose rows make up the export"""
+        return [exports.filter_export(self.queryset.all(), params)]
+
+    @action(detail=False, methods=['get'], url_path=r'export/(?P<export_format>csv|ndjson)',
+            url_name='export')
+    def export(self, request, export_format):
+        try:
+            querysets = self.export_querysets(request.query_params)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        filename = f'{self.export_filename}-{date.today().isoformat()}'
+        return exports.streaming_export(querysets, self.export_columns, export_format, filename)
+
+
+class CachedResponseMixin:
+    """
+    Serve list and retrieve responses from the catalog cache.
+
+    Goes before ``ConditionalGetMixin``, whose validators are cached with the
+    response so that cache hits can be revalidated without a query.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, None, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        if not lookup.isdigit() or str(int(lookup)) != lookup:
+            # Only canonical ids match the keys that invalidation clears
+            return super().retrieve(request, *args, **kwargs)
+        return self.cached_response(request, lookup, super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, lookup, view, *args, **kwargs):
+        key = catalog_cache.response_key(self.cache_resource, request, lookup)
+        cached = catalog_cache.get(key)
+        if cached is not None:
+            data, validators = cached
+            return self.conditional_response(request, validators, lambda *args, **kwargs: Response(data))
+        response = view(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            validators = (response.get('ETag'), parse_http_date_safe(response.get('Last-Modified')))
+            catalog_cache.store(key, (response.data, validators))
+        return response
+
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -77,59 +270,294 @@ def logout_view(request):
     return Response({'message': 'Logged out successfully'})
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+def leaderboard(request):
+    """Ranked students by fitness score, calories or minutes over a time window"""
+    try:
+        metric, window, grade, limit, student_id = parse_leaderboard_params(request.query_params)
+    except ValueError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Default to the logged-in student's own position
+    if student_id is None:
+        student = getattr(request.user, 'student_profile', None)
+        student_id = student.pk if student else None
+
+    start_date, ranking = get_ranking(metric, window, grade)
+    return Response(leaderboard_data(metric, window, grade, limit, student_id, start_date, ranking))
+
+
+def parse_leaderboard_params(query_params):
+    """Return ``(metric, window, grade, limit, student_id)``; raises ValueError for bad input"""
+    metric = query_params.get('metric', 'fitness_score')
+    window = query_params.get('window', 'term')
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    if window not in WINDOWS:
+        raise ValueError(f"window must be one of: {', '.join(WINDOWS)}")
+
+    try:
+        grade = query_params.get('grade')
+        grade = int(grade) if grade else None
+        limit = min(max(int(query_params.get('limit', 10)), 1), 100)
+        student_id = query_params.get('student_id')
+        student_id = int(student_id) if student_id else None
+    except ValueError:
+        raise ValueError('grade, limit and student_id must be integers')
+    return metric, window, grade, limit, student_id
+
+
+def leaderboard_data(metric, window, grade, limit, student_id, start_date, ranking):
+    me = next((row for row in ranking if row['student_id'] == student_id), None)
+    return {
+        'metric': metric,
+        'window': window,
+        'start_date': start_date,
+        'grade': grade,
+        'total': len(ranking),
+        'results': ranking[:limit],
+        'me': me,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsTeacher])
+def class_analytics(request):
+    """Activity and fitness distributions per grade and fitness level, refreshed daily"""
+    window = request.query_params.get('window', 'term')
+    if window not in WINDOWS:
+        return Response(
+            {'error': f"window must be one of: {', '.join(WINDOWS)}"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    return Response(analytics.get_analytics(window))
+
+
+@api_view(['GET'])
+def class_fitness_trend(request):
+    """Performance metric series averaged over a grade, or over every student"""
+    try:
+        params = parse_trend_params(request.query_params)
+    except ValueError as error:
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+    grade = request.query_params.get('grade')
+    if grade and not grade.isdigit():
+        return Response({'error': 'grade must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(fitness_trend_data(*params, grade=int(grade) if grade else None))
+
+
+def parse_trend_params(query_params):
+    """Return ``(metrics, start, end, bucket, points, downsample)``; raises ValueError for bad input"""
+    metrics = query_params.get('metrics')
+    metrics = metrics.split(',') if metrics else list(trends.METRICS)
+    if any(metric not in trends.METRICS for metric in metrics):
+        raise ValueError(f"metrics must be a comma-separated list of: {', '.join(trends.METRICS)}")
+    bucket = query_params.get('bucket', 'auto')
+    if bucket not in ['auto', *trends.BUCKETS]:
+        raise ValueError(f"bucket must be one of: auto, {', '.join(trends.BUCKETS)}")
+    downsample = query_params.get('downsample', 'lttb')
+    if downsample not in ['lttb', 'none']:
+        raise ValueError('downsample must be one of: lttb, none')
+
+    try:
+        start = query_params.get('start')
+        start = date.fromisoformat(start) if start else None
+        end = query_params.get('end')
+        end = date.fromisoformat(end) if end else date.today()
+    except ValueError:
+        raise ValueError('start and end must be dates in YYYY-MM-DD format')
+    if start and start > end:
+        raise ValueError('start must not be after end')
+    try:
+        points = min(max(int(query_params.get('points', 300)), 3), 2000)
+    except ValueError:
+        raise ValueError('points must be an integer')
+    return metrics, start, end, bucket, points, downsample
+
+
+def fitness_trend_data(metrics, start, end, bucket, points, downsample, student_id=None, grade=None):
+    # Without a start date the series covers the whole history
+    start = start or trends.first_date(student_id, grade) or end
+    if bucket == 'auto':
+        bucket = trends.choose_bucket(start, end, points)
+    series = trends.get_series(metrics, start, end, bucket, student_id=student_id, grade=grade)
+    data = {}
+    for metric, values in series.items():
+        if downsample == 'lttb':
+            values = trends.lttb(values, points)
+        data[metric] = [{'date': day, 'value': value} for day, value in values]
+
+    scope = {'student_id': student_id} if student_id is not None else {'grade': grade}
+    return {
+        **scope,
+        'start_date': start,
+        'end_date': end,
+        'bucket': bucket,
+        'downsample': downsample,
+        'points': points,
+        'series': data,
+    }
+
+
+@api_view(['GET'])
+def request_metrics(request):
+    """Per-route query counts and latency histograms for this server process"""
+    return Response({
+        'buckets_ms': [str(bound) for bound in metrics.LATENCY_BUCKETS_MS[:-1]] + ['+Inf'],
+        'routes': metrics.snapshot(),
+    })
+
+
+@api_view(['GET'])
+def cache_metrics(request):
+    """Hit, miss and eviction counters of the catalog response cache"""
+    return Response(catalog_cache.stats())
+
+
+def _ping(connection):
+    connection.ensure_connection()
+    if connection.vendor == 'djongo':
+        # The MongoClient connects lazily; ping makes it select a server
+        connection.connection.command('ping')
+    else:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
+@api_view(['GET'])
+def health(request):
+    """Reachability of every database and the MongoDB connection pool counters of this process"""
+    databases = {}
+    for alias in connections:
+        started = time.perf_counter()
+        try:
+            _ping(connections[alias])
+        except Exception as error:
+            # pymongo's server selection errors are not DatabaseErrors
+            databases[alias] = {'ok': False, 'error': str(error)}
+        else:
+            databases[alias] = {'ok': True, 'latency_ms': round((time.perf_counter() - started) * 1000, 2)}
+    healthy = all(database['ok'] for database in databases.values())
+    return Response(
+        {'status': 'ok' if healthy else 'unavailable', 'databases': databases, 'pools': pool.snapshot()},
+        status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+class StudentViewSet(ConditionalGetMixin, EagerLoadingMixin, SparseFieldsetMixin,
+                     viewsets.ModelViewSet):
     """ViewSet for Student model"""
-    queryset = Student.objects.all()
+    # The pk breaks ties, so students sharing a grade and last name keep their page
+    queryset = Student.objects.order_by('grade', 'user__last_name', 'pk')
     serializer_class = StudentSerializer
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'dashboard':
+            # Count active plans alongside the student lookup itself
+            queryset = queryset.annotate(active_plan_count=Count(
+                'assigned_plans', filter=Q(assigned_plans__status='active')
+            ))
+        return queryset
+
     @action(detail=True, methods=['get'])
     def dashboard(self, request, pk=None):
         """Get dashboard statistics for a student"""
+        etag = self.get_dashboard_etag(request, pk)
+        if etag is None:
+            return self.build_dashboard(request)
+        return self.conditional_response(request, (etag, None), self.build_dashboard)
+
+    @action(detail=True, methods=['get'], url_path='fitness-trend')
+    def fitness_trend(self, request, pk=None):
+        """Performance metric series for a student over any date range"""
+        try:
+            params = parse_trend_params(request.query_params)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
         student = self.get_object()
-        
-        # Calculate statistics
-        activities = ActivityLog.objects.filter(student=student)
-        total_activities = activities.count()
-        total_calories = activities.aggregate(Sum('calories_burned'))['calories_burned__sum'] or 0
-        total_minutes = activities.aggregate(Sum('duration_minutes'))['duration_minutes__sum'] or 0
-        active_plans = StudentWorkoutPlan.objects.filter(
-            student=student, 
-            status='active'
-        ).count()
-        
-        # Recent activities (last 10)
-        recent_activities = activities[:10]
-        
-        # Fitness trend (last 30 days)
-        thirty_days_ago = datetime.now().date() - timedelta(days=30)
-        fitness_trend = PerformanceMetric.objects.filter(
-            student=student,
-            date__gte=thirty_days_ago
-        ).values('date', 'fitness_score').order_by('date')
-        
-        stats_data = {
-            'total_activities': total_activities,
-            'total_calories': total_calories,
-            'total_minutes': total_minutes,
-            'active_plans': active_plans,
-            'recent_activities': recent_activities,
-            'fitness_trend': list(fitness_trend)
-        }
-        
-        serializer = DashboardStatsSerializer(stats_data)
-        return Response(serializer.data)
+        return Response(fitness_trend_data(*params, student_id=student.pk))
+
+    def get_dashboard_etag(self, request, pk):
+        """ETag from the row counts and latest changes behind everything the dashboard shows"""
+        columns = {}
+        for name, model in [('logs', ActivityLog), ('metrics', PerformanceMetric),
+                            ('plans', StudentWorkoutPlan)]:
+            rows = model.objects.filter(student=OuterRef('pk')).order_by().values('student')
+            columns[f'{name}_count'] = Subquery(rows.annotate(value=Count('pk')).values('value'))
+            columns[f'{name}_latest'] = Subquery(rows.annotate(value=Max('updated_at')).values('value'))
+        try:
+            state = Student.objects.filter(pk=pk).order_by().annotate(**columns).values_list(
+                'updated_at', *columns
+            ).first()
+        except (TypeError, ValueError, ValidationError):
+            return None
+        if state is None:
+            return None
+        # The fitness trend covers the last 30 days, so it also changes with the date
+        return conditional.make_etag(request, date.today(), *state)
+
+    def build_dashboard(self, request, *args, **kwargs):
+        student = self.get_object()
+        return Response(dashboard_data(
+            student.active_plan_count,
+            dashboard_totals(student.pk),
+            dashboard_recent_activities(student.pk),
+            dashboard_fitness_trend(student.pk),
+        ))
+
+
+def dashboard_totals(student_id):
+    """All-time totals from the monthly rollups in a single aggregation"""
+    if pipelines.enabled():
+        return pipelines.dashboard_totals(student_id)
+    return ActivityRollup.objects.filter(student_id=student_id, period='month').aggregate(
+        total_activities=Sum('activity_count'),
+        total_calories=Sum('total_calories'),
+        total_minutes=Sum('total_minutes'),
+    )
+
+
+def dashboard_recent_activities(student_id):
+    """Last 10 activities with their exercise joined in"""
+    return list(ActivityLog.objects.filter(student_id=student_id).select_related('exercise')[:10])
+
+
+def dashboard_fitness_trend(student_id):
+    """Fitness scores of the last 30 days"""
+    thirty_days_ago = datetime.now().date() - timedelta(days=30)
+    return list(PerformanceMetric.objects.filter(
+        student_id=student_id,
+        date__gte=thirty_days_ago
+    ).values('date', 'fitness_score').order_by('date'))
+
+
+def dashboard_data(active_plans, totals, recent_activities, fitness_trend):
+    stats_data = {
+        'total_activities': totals['total_activities'] or 0,
+        'total_calories': totals['total_calories'] or 0,
+        'total_minutes': totals['total_minutes'] or 0,
+        'active_plans': active_plans,
+        'recent_activities': recent_activities,
+        'fitness_trend': fitness_trend,
+    }
+    return DashboardStatsSerializer(stats_data).data
 
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(ConditionalGetMixin, EagerLoadingMixin, SparseFieldsetMixin,
+                     viewsets.ModelViewSet):
     """ViewSet for Teacher model"""
-    queryset = Teacher.objects.all()
+    queryset = Teacher.objects.order_by('id')
     serializer_class = TeacherSerializer
 
 
-class WorkoutPlanViewSet(viewsets.ModelViewSet):
+class WorkoutPlanViewSet(CachedResponseMixin, ConditionalGetMixin, EagerLoadingMixin,
+                         SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for WorkoutPlan model"""
     queryset = WorkoutPlan.objects.all()
     serializer_class = WorkoutPlanSerializer
+    cache_resource = 'workout-plan'
+    # Changes to a plan's exercises touch the plan itself, see signals
+    conditional_timestamp_fields = ['updated_at', 'created_by__updated_at']
     
     def perform_create(self, serializer):
         # Assign the teacher creating the plan
@@ -151,17 +579,24 @@ class WorkoutPlanViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ExerciseViewSet(viewsets.ModelViewSet):
+class ExerciseViewSet(CachedResponseMixin, ConditionalGetMixin, EagerLoadingMixin,
+                      SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for Exercise model"""
     queryset = Exercise.objects.all()
     serializer_class = ExerciseSerializer
+    cache_resource = 'exercise'
 
 
-class StudentWorkoutPlanViewSet(viewsets.ModelViewSet):
+class StudentWorkoutPlanViewSet(ConditionalGetMixin, EagerLoadingMixin, SparseFieldsetMixin,
+                                viewsets.ModelViewSet):
     """ViewSet for StudentWorkoutPlan model"""
     queryset = StudentWorkoutPlan.objects.all()
     serializer_class = StudentWorkoutPlanSerializer
-    
+    conditional_timestamp_fields = [
+        'updated_at', 'student__updated_at', 'workout_plan__updated_at',
+        'workout_plan__created_by__updated_at', 'assigned_by__updated_at',
+    ]
+
     def perform_create(self, serializer):
         # Assign the teacher assigning the plan
         try:
@@ -170,26 +605,88 @@ class StudentWorkoutPlanViewSet(viewsets.ModelViewSet):
         except Teacher.DoesNotExist:
             raise ValueError("Only teachers can assign workout plans")
 
+    @action(detail=False, methods=['post'], url_path='bulk-assign', permission_classes=[IsTeacher])
+    def bulk_assign(self, request):
+        """Assign one plan to every student matching a grade, fitness level or id list"""
+        serializer = assignments.BulkAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        summary = assignments.assign_plan(
+            data['workout_plan_id'],
+            assigned_by=request.user.teacher_profile,
+            start_date=data['start_date'],
+            end_date=data['end_date'],
+            grade=data.get('grade'),
+            fitness_level=data.get('fitness_level'),
+            student_ids=data.get('student_ids'),
+        )
+        return Response(
+            summary, status=status.HTTP_201_CREATED if summary['created'] else status.HTTP_200_OK
+        )
+
 
-class ActivityLogViewSet(viewsets.ModelViewSet):
+class ActivityLogViewSet(ConditionalGetMixin, ValuesListMixin, StreamingExportMixin,
+                         EagerLoadingMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for ActivityLog model"""
     queryset = ActivityLog.objects.all()
     serializer_class = ActivityLogSerializer
-    
+    pagination_class = ActivityLogCursorPagination
+    # Counting the whole filtered table for a list ETag would undo keyset paging
+    conditional_list = False
+    conditional_timestamp_fields = ['updated_at', 'student__updated_at', 'exercise__updated_at']
+    export_columns = exports.ACTIVITY_LOG_COLUMNS
+    export_filename = 'activity-logs'
+
     def get_queryset(self):
         """Filter activities by student if student_id is provided"""
-        queryset = ActivityLog.objects.all()
+        queryset = super().get_queryset()
         student_id = self.request.query_params.get('student_id', None)
         if student_id:
             queryset = queryset.filter(student_id=student_id)
         return queryset
 
+    def export_querysets(self, params):
+        """Live logs, plus archived ones when the date range reaches back into the archive"""
+        querysets = super().export_querysets(params)
+        date_from = params.get('date_from')
+        if archive.includes_archive(date.fromisoformat(date_from) if date_from else None):
+            querysets.append(exports.filter_export(ArchivedActivityLog.objects.all(), params))
+        return querysets
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create many activity logs from a JSON array or an NDJSON stream"""
+        rows = request.data
+        if not isinstance(rows, list):
+            return Response(
+                {'error': 'Expected a JSON array or NDJSON body of activity logs'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > BULK_MAX_ROWS:
+            return Response(
+                {'error': f'At most {BULK_MAX_ROWS} activity logs can be sent per request'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        created, errors = ingest_activity_logs(rows)
+        return Response(
+            {'created': created, 'failed': len(errors), 'errors': errors},
+            status=status.HTTP_207_MULTI_STATUS if errors else status.HTTP_201_CREATED
+        )
 
-class PerformanceMetricViewSet(viewsets.ModelViewSet):
+
+class PerformanceMetricViewSet(ConditionalGetMixin, ValuesListMixin, StreamingExportMixin,
+                               EagerLoadingMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """ViewSet for PerformanceMetric model"""
     queryset = PerformanceMetric.objects.all()
     serializer_class = PerformanceMetricSerializer
-    
+    pagination_class = PerformanceMetricCursorPagination
+    # Counting the whole filtered table for a list ETag would undo keyset paging
+    conditional_list = False
+    conditional_timestamp_fields = ['updated_at', 'student__updated_at', 'recorded_by__updated_at']
+    export_columns = exports.PERFORMANCE_METRIC_COLUMNS
+    export_filename = 'performance-metrics'
+
     def perform_create(self, serializer):
         # Assign the teacher recording the metric
         try:
@@ -197,3 +694,41 @@ class PerformanceMetricViewSet(viewsets.ModelViewSet):
             serializer.save(recorded_by=teacher)
         except Teacher.DoesNotExist:
             serializer.save()  # Allow saving without teacher for now
+
+
+class JobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                 viewsets.GenericViewSet):
+    """Enqueue background jobs and poll their progress; teachers only"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsTeacher]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        for name in ('status', 'kind'):
+            value = self.request.query_params.get(name)
+            if value:
+                queryset = queryset.filter(**{name: value})
+        return queryset
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            job, created = jobs.enqueue(
+                data['kind'], data.get('params', {}),
+                idempotency_key=data.get('idempotency_key') or request.headers.get('Idempotency-Key'),
+                created_by=request.user.teacher_profile,
+                max_attempts=data.get('max_attempts', 3),
+            )
+        except jobs.IdempotencyConflict:
+            return Response(
+                {'error': 'This idempotency key was already used for a different job'},
+                status=status.HTTP_409_CONFLICT
+            )
+        # Repeating a request returns the job it queued the first time
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
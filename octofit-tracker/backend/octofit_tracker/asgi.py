@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
 application = get_asgi_application()
+
+from fitness import catalog_cache  # noqa: E402
+
+catalog_cache.warm_up_in_background()
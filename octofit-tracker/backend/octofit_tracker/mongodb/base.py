@@ -0,0 +1,101 @@
+"""
+djongo backend that shares one pooled MongoClient per process.
+
+djongo closes its MongoClient whenever Django closes a connection, which is
+after every request while CONN_MAX_AGE is 0. The client is shared by every
+thread, so that drops every pooled socket and the server monitors, and the
+next query connects and discovers the servers again. djongo also caches
+clients by database name alone, so two aliases of one database could not
+use different read preferences.
+
+Here clients are cached by their full options, closing a Django connection
+leaves the client and its pool alone, and pool events are counted in
+``pool`` for the health endpoint.
+"""
+import threading
+from collections import OrderedDict
+
+from djongo import base
+from pymongo import MongoClient, monitoring
+
+from . import pool
+
+# pymongo's own default
+DEFAULT_MAX_POOL_SIZE = 100
+
+_clients = {}
+_lock = threading.Lock()
+
+
+class PoolListener(monitoring.ConnectionPoolListener):
+    """Counts pymongo's connection pool events in a ``pool.PoolStats``"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.stats.change(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.stats.change(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.stats.change(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self.stats.change(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self.stats.change(event.address, waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self.stats.change(event.address, waiting=-1, in_use=1, checkouts=1)
+
+    def connection_checked_in(self, event):
+        self.stats.change(event.address, in_use=-1)
+
+
+def get_client(alias, options):
+    """The process-wide MongoClient for ``options``, created on first use"""
+    key = repr(sorted(options.items()))
+    with _lock:
+        if key not in _clients:
+            # pymongo option names are case-insensitive
+            max_pool_size = {name.lower(): value for name, value in options.items()}.get(
+                'maxpoolsize', DEFAULT_MAX_POOL_SIZE
+            )
+            stats = pool.stats_for(key, max_pool_size)
+            client = MongoClient(connect=False, event_listeners=[PoolListener(stats)], **options)
+            _clients[key] = (client, stats)
+        client, stats = _clients[key]
+        stats.aliases.add(alias)
+    return client
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, connection_params):
+        name = connection_params.pop('name')
+        enforce_schema = connection_params.pop('enforce_schema')
+        connection_params['document_class'] = OrderedDict
+        self.client_connection = get_client(self.alias, connection_params)
+        database = self.client_connection[name]
+        self.djongo_connection = base.DjongoClient(database, enforce_schema)
+        return database
+
+    def _close(self):
+        # Sockets go back to the shared pool after every operation, so there
+        # is nothing of this connection's own to close
+        pass
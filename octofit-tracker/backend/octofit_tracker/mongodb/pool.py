@@ -0,0 +1,61 @@
+"""
+Connection pool counters for the MongoDB backend.
+
+pymongo reports every pool event of a client to its ``PoolStats``; counts
+are kept per server address. Like the request metrics they live in process
+memory, so every worker process reports its own pools.
+"""
+import threading
+from collections import defaultdict
+
+COUNTERS = ['open', 'in_use', 'waiting', 'checkouts', 'checkout_failures', 'cleared']
+
+_stats = {}
+_lock = threading.Lock()
+
+
+class PoolStats:
+    """Open, in-use and waiting connections of one MongoClient's pools"""
+
+    def __init__(self, max_pool_size):
+        self.max_pool_size = max_pool_size
+        self.aliases = set()
+        self._lock = threading.Lock()
+        self._servers = defaultdict(lambda: dict.fromkeys(COUNTERS + ['peak_in_use', 'peak_waiting'], 0))
+
+    def change(self, address, **deltas):
+        with self._lock:
+            server = self._servers[address]
+            for name, delta in deltas.items():
+                server[name] += delta
+            server['peak_in_use'] = max(server['peak_in_use'], server['in_use'])
+            server['peak_waiting'] = max(server['peak_waiting'], server['waiting'])
+
+    def as_dict(self):
+        with self._lock:
+            servers = {
+                f'{host}:{port}': {
+                    **counts,
+                    'idle': counts['open'] - counts['in_use'],
+                    'utilization': (
+                        round(counts['in_use'] / self.max_pool_size, 4) if self.max_pool_size else None
+                    ),
+                }
+                for (host, port), counts in sorted(self._servers.items())
+            }
+        return {'aliases': sorted(self.aliases), 'max_pool_size': self.max_pool_size, 'servers': servers}
+
+
+def stats_for(key, max_pool_size):
+    """The stats of the client created with options ``key``, registered on first use"""
+    with _lock:
+        if key not in _stats:
+            _stats[key] = PoolStats(max_pool_size)
+        return _stats[key]
+
+
+def snapshot():
+    """Pool counters of every MongoClient this process has created"""
+    with _lock:
+        stats = list(_stats.values())
+    return [pool_stats.as_dict() for pool_stats in stats]
@@ -0,0 +1,16 @@
+class PrimaryRouter:
+    """
+    Sends every write and migration to the default database.
+
+    Other aliases are the same database with different client options, such
+    as the analytics alias's read preference, so they are only ever read.
+    """
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'fitness.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,17 +83,52 @@ WSGI_APPLICATION = 'octofit_tracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# One pooled MongoClient is shared by every thread of a server process, and
+# the 'octofit_tracker.mongodb' engine keeps it open between requests (djongo
+# itself closes it, and with it the whole pool, whenever a request ends).
+# maxPoolSize caps the sockets each process opens per server, so size it as
+# worker processes x maxPoolSize within the server's connection limit.
+MONGODB_CLIENT = {
+    'host': os.environ.get('OCTOFIT_MONGODB_URI', 'mongodb://localhost:27017/'),
+    'maxPoolSize': int(os.environ.get('OCTOFIT_MONGODB_MAX_POOL_SIZE', 50)),
+    'minPoolSize': int(os.environ.get('OCTOFIT_MONGODB_MIN_POOL_SIZE', 0)),
+    # Idle sockets above minPoolSize are closed after five minutes
+    'maxIdleTimeMS': 5 * 60 * 1000,
+    # Fail fast instead of pymongo's 30 second default when no server is up
+    'serverSelectionTimeoutMS': int(os.environ.get('OCTOFIT_MONGODB_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+    'connectTimeoutMS': 10 * 1000,
+    # Requests wait at most this long for a free socket once the pool is full
+    'waitQueueTimeoutMS': int(os.environ.get('OCTOFIT_MONGODB_WAIT_QUEUE_TIMEOUT_MS', 10000)),
+    'appname': 'octofit-tracker',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'djongo',
+        'ENGINE': 'octofit_tracker.mongodb',
+        'NAME': 'octofit_db',
+        'ENFORCE_SCHEMA': False,
+        # Seconds a request thread keeps its djongo connection (and its
+        # cached collection list); the MongoClient pool outlives it either way
+        'CONN_MAX_AGE': int(os.environ.get('OCTOFIT_DB_CONN_MAX_AGE', 600)),
+        'CLIENT': MONGODB_CLIENT,
+    },
+    # The same database read through secondaries when the deployment is a
+    # replica set; class analytics and fitness trends read from here
+    'analytics': {
+        'ENGINE': 'octofit_tracker.mongodb',
         'NAME': 'octofit_db',
         'ENFORCE_SCHEMA': False,
+        'CONN_MAX_AGE': int(os.environ.get('OCTOFIT_DB_CONN_MAX_AGE', 600)),
         'CLIENT': {
-            'host': 'mongodb://localhost:27017/',
-        }
-    }
+            **MONGODB_CLIENT,
+            'readPreference': os.environ.get('OCTOFIT_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred'),
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
-
+DATABASE_ROUTERS = ['octofit_tracker.mongodb.routers.PrimaryRouter']
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -135,6 +171,28 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caches
+# The catalog cache holds exercise and workout plan API responses. It is local
+# to each process; with several worker processes use
+# 'fitness.cache_backends.FileBasedCache' and a directory as LOCATION so
+# invalidations reach every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'fitness.cache_backends.LocMemCache',
+        'LOCATION': 'octofit-catalog',
+        # Teacher names are embedded in plans but do not invalidate them
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+            # Evict one least recently used entry at a time
+            'CULL_FREQUENCY': 1000,
+        },
+    },
+}
+
 # CORS Settings
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
@@ -151,4 +209,60 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'fitness.pagination.StandardPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_RENDERER_CLASSES': [
+        'fitness.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# OctoFit Settings
+# Months (1-12) in which a school term starts, used by term-based leaderboards
+OCTOFIT_TERM_START_MONTHS = [1, 8]
+# Requests running more database queries than this are logged with their
+# repeated statements; set to None to turn the check off
+OCTOFIT_QUERY_BUDGET = 25
+
+# Build activity log and performance metric lists from .values() rows instead
+# of model instances; the responses are the same either way
+OCTOFIT_FAST_READS = True
+
+# Host names (as sent in the Host header) whose catalog list pages are cached
+# when a server process starts
+OCTOFIT_CATALOG_CACHE_WARM_HOSTS = []
+
+# Where manage.py export_snapshots writes columnar files of closed months
+OCTOFIT_SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+
+# manage.py archive_activity_logs moves activity logs from terms that ended
+# more than this many days ago into the archive table
+OCTOFIT_ARCHIVE_AFTER_DAYS = 365
+
+# Database alias that class analytics and fitness trends read from; the
+# default database is used when it is not configured
+OCTOFIT_ANALYTICS_DATABASE = 'analytics'
+
+# On MongoDB, answer dashboard totals, leaderboards and class analytics with
+# native aggregation pipelines instead of djongo's SQL translation
+OCTOFIT_NATIVE_AGGREGATION = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'fitness.performance': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+        },
+        'fitness.jobs': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
 }
@@ -18,7 +18,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from fitness import views
+from fitness import async_views, views
 import os
 
 codespace_name = os.environ.get('CODESPACE_NAME')
@@ -36,6 +36,7 @@ router.register(r'exercises', views.ExerciseViewSet)
 router.register(r'student-workout-plans', views.StudentWorkoutPlanViewSet)
 router.register(r'activity-logs', views.ActivityLogViewSet)
 router.register(r'performance-metrics', views.PerformanceMetricViewSet)
+router.register(r'jobs', views.JobViewSet)
 
 
 @api_view(['GET'])
@@ -57,6 +58,17 @@ def api_root(request):
             'student_workout_plans': f'{base_url}/api/student-workout-plans/',
             'activity_logs': f'{base_url}/api/activity-logs/',
             'performance_metrics': f'{base_url}/api/performance-metrics/',
+            'leaderboard': f'{base_url}/api/leaderboard/',
+            'fitness_trend': f'{base_url}/api/fitness-trend/',
+            'class_analytics': f'{base_url}/api/class-analytics/',
+            'jobs': f'{base_url}/api/jobs/',
+            'request_metrics': f'{base_url}/api/metrics/requests/',
+            'cache_metrics': f'{base_url}/api/metrics/cache/',
+            'health': f'{base_url}/api/health/',
+            'async': {
+                'activity_logs': f'{base_url}/api/async/activity-logs/',
+                'leaderboard': f'{base_url}/api/async/leaderboard/',
+            },
         }
     })
 
@@ -64,6 +76,16 @@ def api_root(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', api_root, name='api-root'),
+    path('api/leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/fitness-trend/', views.class_fitness_trend, name='fitness-trend'),
+    path('api/class-analytics/', views.class_analytics, name='class-analytics'),
+    path('api/metrics/requests/', views.request_metrics, name='request-metrics'),
+    path('api/metrics/cache/', views.cache_metrics, name='cache-metrics'),
+    path('api/health/', views.health, name='health'),
+    path('api/async/students/<int:pk>/dashboard/', async_views.student_dashboard,
+         name='async-student-dashboard'),
+    path('api/async/activity-logs/', async_views.activity_logs, name='async-activity-logs'),
+    path('api/async/leaderboard/', async_views.leaderboard, name='async-leaderboard'),
     path('api/', include(router.urls)),
     path('api/auth/teacher-login/', views.teacher_login, name='teacher-login'),
     path('api/auth/student-register/', views.student_register, name='student-register'),
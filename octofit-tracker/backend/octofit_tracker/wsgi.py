@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
 application = get_wsgi_application()
+
+from fitness import catalog_cache  # noqa: E402
+
+catalog_cache.warm_up_in_background()
@@ -20,6 +20,11 @@ const apiClient = axios.create({
   },
 });
 
+// Follows a `next`/`previous` link from a paginated list response
+export const getPage = (url) => {
+  return apiClient.get(url);
+};
+
 // Authentication API
 export const teacherLogin = (credentials) => {
   return apiClient.post('/auth/teacher-login/', credentials);
@@ -137,4 +142,9 @@ export const getPerformanceMetric = (id) => {
   return apiClient.get(`/performance-metrics/${id}/`);
 };
 
+// Class Analytics API
+export const getClassAnalytics = (window = 'term') => {
+  return apiClient.get('/class-analytics/', { params: { window } });
+};
+
 export default apiClient;
@@ -1,29 +1,37 @@
 import React, { useEffect, useMemo, useState } from 'react';
 
+const METRIC_LABELS = {
+  fitness_score: 'Fitness Score',
+  calories: 'Calories',
+  minutes: 'Minutes',
+};
+
 const getLeaderboardEndpoint = () => {
   const codespaceName = process.env.REACT_APP_CODESPACE_NAME || window.CODESPACE_NAME;
   if (codespaceName) {
     return `https://${codespaceName}-8000.app.github.dev/api/leaderboard/`;
   }
-  return 'http://localhost:8000/api/performance-metrics/';
+  return 'http://localhost:8000/api/leaderboard/';
 };
 
 function Leaderboard() {
   const [rows, setRows] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [metric, setMetric] = useState('fitness_score');
+  const [timeWindow, setTimeWindow] = useState('term');
+  const [me, setMe] = useState(null);
   const endpoint = useMemo(() => getLeaderboardEndpoint(), []);
 
   useEffect(() => {
     const load = async () => {
       try {
         setLoading(true);
-        console.log('[Leaderboard] endpoint:', endpoint);
-        const response = await fetch(endpoint);
+        const params = new URLSearchParams({ metric, window: timeWindow, limit: '25' });
+        const response = await fetch(`${endpoint}?${params}`, { credentials: 'include' });
         const data = await response.json();
-        const normalized = Array.isArray(data) ? data : (data?.results || []);
-        console.log('[Leaderboard] fetched data:', data);
-        setRows(normalized);
+        setRows(data?.results || []);
+        setMe(data?.me || null);
       } catch (fetchError) {
         console.error('[Leaderboard] fetch error:', fetchError);
         setError('Failed to load leaderboard');
@@ -33,11 +41,24 @@ function Leaderboard() {
     };
 
     load();
-  }, [endpoint]);
+  }, [endpoint, metric, timeWindow]);
 
   return (
     <div className="container mt-4">
       <h2 className="mb-3">Leaderboard</h2>
+      <div className="d-flex gap-2 mb-3">
+        <select className="form-select w-auto" value={metric} onChange={(e) => setMetric(e.target.value)}>
+          {Object.entries(METRIC_LABELS).map(([value, label]) => (
+            <option key={value} value={value}>{label}</option>
+          ))}
+        </select>
+        <select className="form-select w-auto" value={timeWindow} onChange={(e) => setTimeWindow(e.target.value)}>
+          <option value="week">This Week</option>
+          <option value="month">This Month</option>
+          <option value="term">This Term</option>
+        </select>
+      </div>
+      {me && <p className="text-muted">Your rank: {me.rank}</p>}
       {loading && <p>Loading leaderboard...</p>}
       {error && <div className="alert alert-danger">{error}</div>}
       {!loading && !error && (
@@ -47,15 +68,15 @@ function Leaderboard() {
               <tr>
                 <th>Rank</th>
                 <th>Student</th>
-                <th>Fitness Score</th>
+                <th>{METRIC_LABELS[metric]}</th>
               </tr>
             </thead>
             <tbody>
-              {rows.map((item, index) => (
-                <tr key={item.id || index}>
-                  <td>{index + 1}</td>
-                  <td>{item.student?.full_name || item.user_name || '-'}</td>
-                  <td>{item.fitness_score ?? '-'}</td>
+              {rows.map((item) => (
+                <tr key={item.student_id}>
+                  <td>{item.rank}</td>
+                  <td>{item.full_name || '-'}</td>
+                  <td>{item.value ?? '-'}</td>
                 </tr>
               ))}
             </tbody>
@@ -0,0 +1,31 @@
+import React from 'react';
+
+// Previous/next controls for the API's paginated lists; hidden when everything fits on one page
+const Pager = ({ previous, next, onPage }) => {
+  if (!previous && !next) {
+    return null;
+  }
+
+  return (
+    <nav className="d-flex justify-content-between mt-3" aria-label="Pages">
+      <button
+        type="button"
+        className="btn btn-outline-primary"
+        disabled={!previous}
+        onClick={() => onPage(previous)}
+      >
+        Previous
+      </button>
+      <button
+        type="button"
+        className="btn btn-outline-primary"
+        disabled={!next}
+        onClick={() => onPage(next)}
+      >
+        Next
+      </button>
+    </nav>
+  );
+};
+
+export default Pager;
@@ -1,17 +1,22 @@
 import React, { useState, useEffect } from 'react';
-import { getExercises } from '../api';
+import { getExercises, getPage } from '../api';
+import Pager from '../components/Pager';
 
 const Exercises = () => {
   const [exercises, setExercises] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [pageUrl, setPageUrl] = useState(null);
+  const [links, setLinks] = useState({ next: null, previous: null });
   const [filter, setFilter] = useState('all');
 
   useEffect(() => {
     const fetchExercises = async () => {
       try {
-        const response = await getExercises();
-        setExercises(response.data);
+        setLoading(true);
+        const response = pageUrl ? await getPage(pageUrl) : await getExercises();
+        setExercises(response.data.results);
+        setLinks({ next: response.data.next, previous: response.data.previous });
       } catch (err) {
         setError('Failed to load exercises');
         console.error('Error:', err);
@@ -21,7 +26,7 @@ const Exercises = () => {
     };
 
     fetchExercises();
-  }, []);
+  }, [pageUrl]);
 
   const filteredExercises = filter === 'all' 
     ? exercises 
@@ -88,6 +93,8 @@ const Exercises = () => {
           No exercises found
         </div>
       )}
+
+      <Pager previous={links.previous} next={links.next} onPage={setPageUrl} />
     </div>
   );
 };
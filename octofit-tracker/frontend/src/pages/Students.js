@@ -1,16 +1,21 @@
 import React, { useState, useEffect } from 'react';
-import { getStudents } from '../api';
+import { getStudents, getPage } from '../api';
+import Pager from '../components/Pager';
 
 const Students = () => {
   const [students, setStudents] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [pageUrl, setPageUrl] = useState(null);
+  const [links, setLinks] = useState({ next: null, previous: null });
 
   useEffect(() => {
     const fetchStudents = async () => {
       try {
-        const response = await getStudents();
-        setStudents(response.data);
+        setLoading(true);
+        const response = pageUrl ? await getPage(pageUrl) : await getStudents();
+        setStudents(response.data.results);
+        setLinks({ next: response.data.next, previous: response.data.previous });
       } catch (err) {
         setError('Failed to load students');
         console.error('Error:', err);
@@ -20,7 +25,7 @@ const Students = () => {
     };
 
     fetchStudents();
-  }, []);
+  }, [pageUrl]);
 
   if (loading) {
     return (
@@ -81,6 +86,8 @@ const Students = () => {
               No students registered yet
             </div>
           )}
+
+          <Pager previous={links.previous} next={links.next} onPage={setPageUrl} />
         </div>
       </div>
     </div>
@@ -1,28 +1,31 @@
 import React, { useState, useEffect } from 'react';
-import { getStudents, getWorkoutPlans, getActivityLogs } from '../api';
+import { getStudents, getWorkoutPlans, getClassAnalytics } from '../api';
 
 const TeacherDashboard = () => {
   const [stats, setStats] = useState({
     totalStudents: 0,
     totalWorkoutPlans: 0,
-    totalActivities: 0
+    participationRate: 0
   });
+  const [gradeStats, setGradeStats] = useState([]);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     const fetchData = async () => {
       try {
-        const [studentsRes, plansRes, activitiesRes] = await Promise.all([
+        const [studentsRes, plansRes, analyticsRes] = await Promise.all([
           getStudents(),
           getWorkoutPlans(),
-          getActivityLogs()
+          getClassAnalytics()
         ]);
 
         setStats({
-          totalStudents: studentsRes.data.length,
-          totalWorkoutPlans: plansRes.data.length,
-          totalActivities: activitiesRes.data.length
+          totalStudents: studentsRes.data.count,
+          totalWorkoutPlans: plansRes.data.count,
+          // Distributions are computed on the server, so no activity logs are downloaded
+          participationRate: Math.round(analyticsRes.data.overall.participation_rate * 100)
         });
+        setGradeStats(analyticsRes.data.by_grade);
       } catch (error) {
         console.error('Error fetching dashboard data:', error);
       } finally {
@@ -69,8 +72,42 @@ const TeacherDashboard = () => {
         <div className="col-md-4 mb-4">
           <div className="card shadow-sm">
             <div className="card-body text-center">
-              <h5 className="card-title text-muted">Total Activities</h5>
-              <p className="display-4 text-warning">{stats.totalActivities}</p>
+              <h5 className="card-title text-muted">Active This Term</h5>
+              <p className="display-4 text-warning">{stats.participationRate}%</p>
+            </div>
+          </div>
+        </div>
+      </div>
+
+      <div className="row mt-4">
+        <div className="col-12">
+          <div className="card shadow-sm">
+            <div className="card-body">
+              <h5 className="card-title">Grades This Term</h5>
+              <table className="table table-sm mb-0">
+                <thead>
+                  <tr>
+                    <th>Grade</th>
+                    <th>Students</th>
+                    <th>Active</th>
+                    <th>Median Minutes</th>
+                    <th>Median Calories</th>
+                    <th>Median Fitness Score</th>
+                  </tr>
+                </thead>
+                <tbody>
+                  {gradeStats.map((row) => (
+                    <tr key={row.grade}>
+                      <td>{row.grade}</td>
+                      <td>{row.students}</td>
+                      <td>{Math.round(row.participation_rate * 100)}%</td>
+                      <td>{row.minutes.median}</td>
+                      <td>{row.calories.median}</td>
+                      <td>{row.fitness_score.median ?? '-'}</td>
+                    </tr>
+                  ))}
+                </tbody>
+              </table>
             </div>
           </div>
         </div>
@@ -1,16 +1,21 @@
 import React, { useState, useEffect } from 'react';
-import { getWorkoutPlans } from '../api';
+import { getWorkoutPlans, getPage } from '../api';
+import Pager from '../components/Pager';
 
 const WorkoutPlans = () => {
   const [plans, setPlans] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [pageUrl, setPageUrl] = useState(null);
+  const [links, setLinks] = useState({ next: null, previous: null });
 
   useEffect(() => {
     const fetchPlans = async () => {
       try {
-        const response = await getWorkoutPlans();
-        setPlans(response.data);
+        setLoading(true);
+        const response = pageUrl ? await getPage(pageUrl) : await getWorkoutPlans();
+        setPlans(response.data.results);
+        setLinks({ next: response.data.next, previous: response.data.previous });
       } catch (err) {
         setError('Failed to load workout plans');
         console.error('Error:', err);
@@ -20,7 +25,7 @@ const WorkoutPlans = () => {
     };
 
     fetchPlans();
-  }, []);
+  }, [pageUrl]);
 
   if (loading) {
     return (
@@ -75,6 +80,8 @@ const WorkoutPlans = () => {
           No workout plans created yet
         </div>
       )}
+
+      <Pager previous={links.previous} next={links.next} onPage={setPageUrl} />
     </div>
   );
 };